@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+"""Backfill script - processes past daily files that were never processed.
+
+Usage: backfill.py [days]  (how many days back to look, default 7)
+"""
+
+import asyncio
+import logging
+import sys
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from d_brain.config import get_settings
+from d_brain.services.backfill import DEFAULT_LOOKBACK_DAYS, backfill
+from d_brain.services.git import VaultGit
+from d_brain.services.processor import ClaudeProcessor
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+
+async def main() -> None:
+    """Backfill missed days, commit once and print the aggregated report."""
+    settings = get_settings()
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_LOOKBACK_DAYS
+    processor = ClaudeProcessor(
+        settings.vault_path,
+        settings.todoist_api_key,
+        max_concurrency=settings.claude_max_concurrency,
+        chunk_chars=settings.daily_chunk_chars,
+        chunk_parallelism=settings.daily_chunk_parallelism,
+        structured_reports=settings.structured_reports,
+        context_digest=settings.context_digest,
+        preclassify_threshold=(
+            settings.preclassify_threshold if settings.preclassifier_enabled else 0
+        ),
+        claude_bin=settings.claude_bin,
+    )
+
+    logger.info("Starting backfill over the last %d days...", days)
+    result = await backfill(
+        processor, lookback_days=days, parallelism=settings.backfill_parallelism
+    )
+
+    if "error" in result:
+        logger.error("Backfill failed: %s", result["error"])
+        print(f"❌ <b>Ошибка backfill:</b> {result['error']}")
+        sys.exit(1)
+
+    if result["days"]:
+        git = VaultGit(settings.vault_path)
+        git.commit_and_push(f"chore: backfill {len(result['days'])} day(s)")
+
+    print(result.get("report", ""))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
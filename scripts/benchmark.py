@@ -0,0 +1,306 @@
+#!/usr/bin/env python
+"""Benchmark d-brain's own overhead against scripts/fake_claude.py.
+
+Runs process_daily (single and chunked), execute_prompt, generate_weekly,
+the handler progress loop (ProgressReporter + deliver_report with a stub
+bot) and the market digest (prices from a fixture provider) on a throwaway
+copy of the vault, then /do at increasing concurrency. The fake CLI takes
+a fixed time per answer, so everything above it is prompt assembly,
+process spawn, stream parsing and file I/O.
+
+Usage: benchmark.py [--iterations N] [--latency S] [--concurrency 1,2,4]
+"""
+
+import argparse
+import asyncio
+import logging
+import math
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from collections.abc import Awaitable, Callable
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from d_brain.bot.progress import ProgressReporter, deliver_report
+from d_brain.services import runner
+from d_brain.services.market import (
+    ASSETS,
+    DXY_SYMBOL,
+    compute_market_signals,
+    fetch_market_data,
+    format_market_table,
+)
+from d_brain.services.market_providers import FixtureProvider, write_fixture
+from d_brain.services.processor import ClaudeProcessor
+from d_brain.services.storage import VaultStorage, chunk_entries, split_entries
+from d_brain.services.worker_pool import ClaudeWorkerPool, set_worker_pool
+
+logger = logging.getLogger(__name__)
+
+FAKE_CLAUDE = Path(__file__).parent / "fake_claude.py"
+REPO_VAULT = Path(__file__).parent.parent / "vault"
+
+DO_PROMPT = "Создай задачу позвонить маме завтра в 10"
+ENTRY_TEXTS = [
+    "Надо купить продукты и позвонить в банк насчёт карты",
+    "Идея: сделать еженедельный обзор расходов автоматически",
+    "Прочитал статью про интервальные повторения https://example.com/srs",
+    "Понял что утренние созвоны съедают лучшие часы, стоит перенести",
+    "Проект d-brain: закончить этап с отчётами до пятницы",
+]
+# First day used for synthetic daily files, far from real data
+BENCH_DAY = date(2000, 1, 1)
+MARKET_DAYS = 260
+
+
+class StubBot:
+    """Accepts the Bot calls the progress loop makes and counts them."""
+
+    def __init__(self) -> None:
+        self.edits = 0
+        self.sends = 0
+
+    async def edit_message_text(self, text: str, **kwargs: Any) -> None:
+        self.edits += 1
+
+    async def send_message(self, chat_id: int, text: str, **kwargs: Any) -> None:
+        self.sends += 1
+
+
+class Bench:
+    """Scenario runner over a temporary vault."""
+
+    def __init__(self, root: Path, args: argparse.Namespace) -> None:
+        self.vault_path = root / "vault"
+        self.args = args
+        self._next_day = BENCH_DAY
+        self.rows: list[tuple[str, list[float], int]] = []
+
+    def processor(self, **kwargs: Any) -> ClaudeProcessor:
+        options: dict[str, Any] = {
+            "max_concurrency": self.args.max_concurrency,
+            "chunk_chars": 0,
+            "structured_reports": self.args.structured,
+            "claude_bin": str(FAKE_CLAUDE),
+        }
+        options.update(kwargs)
+        return ClaudeProcessor(self.vault_path, **options)
+
+    def seed_day(self, entries: int) -> date:
+        """Write a fresh daily file with synthetic entries."""
+        day = self._next_day
+        self._next_day += timedelta(days=1)
+        storage = VaultStorage(self.vault_path)
+        for i in range(entries):
+            stamp = datetime.combine(day, datetime.min.time()) + timedelta(minutes=i)
+            text = f"{ENTRY_TEXTS[i % len(ENTRY_TEXTS)]} (#{i})"
+            storage.append_to_daily(text, stamp, "[text]")
+        return day
+
+    async def measure(
+        self,
+        name: str,
+        job: Callable[[], Awaitable[dict[str, Any]]],
+        rounds: int = 1,
+    ) -> None:
+        """Time a scenario; rounds is how many sequential model waits it has."""
+        durations = []
+        for _ in range(self.args.iterations):
+            started = time.perf_counter()
+            result = await job()
+            durations.append(time.perf_counter() - started)
+            if "error" in result:
+                logger.warning("%s failed: %s", name, result["error"])
+        self.rows.append((name, durations, rounds))
+
+    async def run_all(self) -> None:
+        args = self.args
+
+        def daily_job(processor: ClaudeProcessor) -> Callable[[], Awaitable[Any]]:
+            return lambda: processor.process_daily(self.seed_day(args.entries))
+
+        await self.measure("process_daily", daily_job(self.processor()))
+
+        chunk_chars = args.chunk_chars
+        parallelism = args.chunk_parallelism
+        sample = split_entries(
+            (self.vault_path / "daily" / f"{BENCH_DAY}.md").read_text(encoding="utf-8")
+        )
+        chunks = len(chunk_entries(sample, chunk_chars))
+        await self.measure(
+            f"process_daily chunked ({chunks} chunks)",
+            daily_job(
+                self.processor(chunk_chars=chunk_chars, chunk_parallelism=parallelism)
+            ),
+            rounds=math.ceil(chunks / parallelism),
+        )
+
+        processor = self.processor()
+        await self.measure(
+            "execute_prompt", lambda: processor.execute_prompt(DO_PROMPT)
+        )
+        await self.measure("generate_weekly", processor.generate_weekly)
+
+        bot = StubBot()
+
+        async def progress_job() -> dict[str, Any]:
+            reporter = ProgressReporter(
+                bot, chat_id=1, message_id=1, title="⏳ Processing...", min_interval=0.1
+            )
+            report = await reporter.run(
+                processor.execute_prompt(DO_PROMPT, on_event=reporter.on_event)
+            )
+            await deliver_report(bot, 1, 1, report)
+            return report
+
+        await self.measure("progress loop (/do)", progress_job)
+        logger.info("Progress loop: %d edits, %d sends", bot.edits, bot.sends)
+
+        fixture = self.write_market_fixture()
+        db_path = self.vault_path / ".cache" / "prices.sqlite3"
+
+        async def market_job() -> dict[str, Any]:
+            quotes = await asyncio.to_thread(
+                fetch_market_data, db_path, 0, [FixtureProvider(fixture)]
+            )
+            signals = await asyncio.to_thread(compute_market_signals, db_path)
+            return await processor.generate_market_digest(
+                format_market_table(quotes, signals)
+            )
+
+        await self.measure("generate_market_digest (fixture)", market_job)
+
+    def write_market_fixture(self) -> Path:
+        """Random-walk closes for every tracked symbol."""
+        path = self.vault_path.parent / "market-fixture.json"
+        rng = random.Random(0)
+        days = [BENCH_DAY + timedelta(days=i) for i in range(MARKET_DAYS)]
+        bars = {}
+        for symbol in [*(info["symbol"] for info in ASSETS.values()), DXY_SYMBOL]:
+            close = 100.0
+            rows = []
+            for day in days:
+                close *= 1 + rng.gauss(0, 0.015)
+                rows.append((day, round(close, 4)))
+            bars[symbol] = rows
+        write_fixture(path, bars)
+        return path
+
+    async def run_scaling(self) -> list[tuple[int, float]]:
+        """Wall time of N simultaneous /do requests at concurrency N."""
+        results = []
+        for level in self.args.concurrency:
+            # The subprocess cap is process-wide; size it for this level
+            runner._slots = None
+            processor = self.processor(max_concurrency=level)
+            started = time.perf_counter()
+            await asyncio.gather(
+                *(processor.execute_prompt(f"{DO_PROMPT} #{i}") for i in range(level))
+            )
+            results.append((level, time.perf_counter() - started))
+        return results
+
+
+def percentile(values: list[float], share: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+
+def print_report(
+    bench: Bench, scaling: list[tuple[int, float]], latency: float
+) -> None:
+    print(f"\nfake model time per answer: {latency:.2f}s\n")
+    print(f"{'scenario':<36}{'p50':>8}{'p95':>8}{'overhead p50':>14}")
+    for name, durations, rounds in bench.rows:
+        p50 = statistics.median(durations)
+        overhead = p50 - rounds * latency
+        print(
+            f"{name:<36}{p50:>7.2f}s{percentile(durations, 0.95):>7.2f}s"
+            f"{overhead * 1000:>12.0f}ms"
+        )
+
+    if scaling:
+        print(f"\n{'concurrency':<14}{'wall':>8}{'req/s':>8}{'efficiency':>12}")
+        for level, wall in scaling:
+            # 1.0 = all requests overlapped perfectly
+            print(
+                f"{level:<14}{wall:>7.2f}s{level / wall:>8.2f}{latency / wall:>12.2f}"
+            )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=1.0)
+    parser.add_argument("--ttfo", type=float, default=0.2)
+    parser.add_argument("--tool-calls", type=int, default=2)
+    parser.add_argument("--entries", type=int, default=30)
+    parser.add_argument("--chunk-chars", type=int, default=600)
+    parser.add_argument(
+        "--max-concurrency", type=int, default=runner.DEFAULT_MAX_CONCURRENCY
+    )
+    parser.add_argument("--chunk-parallelism", type=int, default=2)
+    parser.add_argument(
+        "--concurrency",
+        type=lambda s: [int(n) for n in s.split(",")],
+        default=[1, 2, 4, 8],
+    )
+    parser.add_argument("--pool", type=int, default=0, help="warm workers (0 = off)")
+    parser.add_argument("--structured", action="store_true")
+    parser.add_argument("--vault", type=Path, default=REPO_VAULT)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    os.environ.update(
+        {
+            "FAKE_CLAUDE_LATENCY": str(args.latency),
+            "FAKE_CLAUDE_TTFO": str(args.ttfo),
+            "FAKE_CLAUDE_TOOL_CALLS": str(args.tool_calls),
+        }
+    )
+
+    with tempfile.TemporaryDirectory(prefix="dbrain-bench-") as tmp:
+        root = Path(tmp)
+        shutil.copytree(
+            args.vault, root / "vault", ignore=shutil.ignore_patterns(".git")
+        )
+        (root / "mcp-config.json").write_text("{}", encoding="utf-8")
+
+        pool = None
+        if args.pool > 0:
+            pool = ClaudeWorkerPool(
+                cwd=root,
+                mcp_config_path=root / "mcp-config.json",
+                size=args.pool,
+                claude_bin=str(FAKE_CLAUDE),
+            )
+            await pool.start()
+            set_worker_pool(pool)
+
+        bench = Bench(root, args)
+        try:
+            await bench.run_all()
+            scaling = await bench.run_scaling()
+        finally:
+            if pool is not None:
+                set_worker_pool(None)
+                await pool.close()
+
+    print_report(bench, scaling, args.latency)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
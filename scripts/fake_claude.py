@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+"""Stand-in for the Claude CLI, for benchmarks and offline runs.
+
+Accepts the flags d-brain passes (--print, --verbose, --output-format,
+--input-format, --mcp-config, --dangerously-skip-permissions, -p) and
+replays a canned answer as stream-json, without any API calls. Point
+CLAUDE_BIN at this file to use it.
+
+With --input-format stream-json it behaves like a pooled worker: one
+answer per user message read from stdin, until EOF.
+
+Behaviour is configured with environment variables:
+    FAKE_CLAUDE_TTFO        seconds before the first assistant event (0.2)
+    FAKE_CLAUDE_LATENCY     total seconds per answer (1.0)
+    FAKE_CLAUDE_TOOL_CALLS  tool_use events streamed per answer (2)
+    FAKE_CLAUDE_FAIL_RATE   share of answers returned as errors (0)
+    FAKE_CLAUDE_HANG        "1": never answer (to exercise timeouts)
+    FAKE_CLAUDE_SEED        random seed for FAKE_CLAUDE_FAIL_RATE
+    FAKE_CLAUDE_RESPONSES   JSON file: [{"match": regex, "response": template}]
+
+Templates may use {date}, {entries} (number of "## HH:MM" entries in the
+prompt) and {prompt_chars}. Without a matching template the answer is
+chosen by prompt kind (daily, weekly, market, /do), as HTML or as a JSON
+report when the prompt asks for one.
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+from datetime import date
+
+DAILY_HTML = """📊 <b>Обработка за {date}</b>
+
+<b>📥 Записей:</b> {entries}
+• fake: задачи созданы, заметки разложены
+<rollup>{{"decisions": ["fake decision"], "created_tasks": ["fake task"]}}</rollup>"""
+
+DAILY_JSON = """{{"emoji": "📊", "title": "Обработка за {date}",
+ "sections": [{{"emoji": "📥", "title": "Записей: {entries}",
+   "items": [{{"text": "fake task", "task_id": "1", "done": false}}]}}],
+ "errors": [], "rollup": {{"decisions": ["fake decision"]}}}}"""
+
+WEEKLY_HTML = """📅 <b>Недельный дайджест</b>
+
+<b>🏆 Победы:</b>
+• fake: неделя прошла по плану"""
+
+MARKET_HTML = """📊 <b>Аналитика {date}</b>
+
+<b>Рынки сегодня:</b>
+fake: рынки без изменений"""
+
+DO_HTML = """✅ <b>Готово</b>
+
+fake: запрос выполнен ({prompt_chars} симв.)"""
+
+GENERIC_JSON = """{{"emoji": "✅", "title": "Готово",
+ "sections": [{{"title": "", "items": ["fake: запрос выполнен"]}}]}}"""
+
+TOOL_NAMES = [
+    "mcp__todoist__user-info",
+    "mcp__todoist__find-tasks",
+    "mcp__todoist__add-tasks",
+    "Read",
+    "Write",
+]
+
+ENTRY_RE = re.compile(r"^## \d{1,2}:\d{2} ", re.MULTILINE)
+
+
+def env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def pick_template(prompt: str) -> str:
+    path = os.environ.get("FAKE_CLAUDE_RESPONSES")
+    if path:
+        with open(path, encoding="utf-8") as f:
+            for rule in json.load(f):
+                if re.search(rule.get("match", ""), prompt):
+                    return rule["response"]
+
+    structured = "Return ONLY one JSON object" in prompt
+    if "ежедневная обработка" in prompt:
+        return DAILY_JSON if structured else DAILY_HTML
+    if "недельный дайджест" in prompt:
+        return GENERIC_JSON if structured else WEEKLY_HTML
+    if "финансовый аналитик" in prompt:
+        return MARKET_HTML
+    return GENERIC_JSON if structured else DO_HTML
+
+
+def emit(message: dict) -> None:
+    print(json.dumps(message, ensure_ascii=False), flush=True)
+
+
+def answer(prompt: str, rng: random.Random) -> None:
+    """Stream one answer: init, tool calls, partial text, result."""
+    if os.environ.get("FAKE_CLAUDE_HANG") == "1":
+        while True:
+            time.sleep(3600)
+
+    started = time.monotonic()
+    ttfo = env_float("FAKE_CLAUDE_TTFO", 0.2)
+    latency = max(env_float("FAKE_CLAUDE_LATENCY", 1.0), ttfo)
+    tool_calls = int(env_float("FAKE_CLAUDE_TOOL_CALLS", 2))
+
+    emit({"type": "system", "subtype": "init", "tools": TOOL_NAMES})
+    time.sleep(ttfo)
+
+    steps = tool_calls + 1
+    for step in range(steps):
+        if step < tool_calls:
+            block = {"type": "tool_use", "name": TOOL_NAMES[step % len(TOOL_NAMES)]}
+        else:
+            block = {"type": "text", "text": "fake: формирую отчёт..."}
+        emit({"type": "assistant", "message": {"content": [block]}})
+        remaining = latency - (time.monotonic() - started)
+        time.sleep(max(0.0, remaining / (steps - step)))
+
+    failed = rng.random() < env_float("FAKE_CLAUDE_FAIL_RATE", 0)
+    text = (
+        "fake: simulated failure"
+        if failed
+        else pick_template(prompt).format(
+            date=date.today().isoformat(),
+            entries=len(ENTRY_RE.findall(prompt)),
+            prompt_chars=len(prompt),
+        )
+    )
+    emit(
+        {
+            "type": "result",
+            "subtype": "error_during_execution" if failed else "success",
+            "is_error": failed,
+            "result": text,
+            "num_turns": tool_calls + 1,
+            "total_cost_usd": 0.0,
+            "usage": {
+                "input_tokens": len(prompt) // 4,
+                "output_tokens": len(text) // 4,
+                "cache_read_input_tokens": 0,
+                "cache_creation_input_tokens": 0,
+            },
+        }
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="claude")
+    parser.add_argument("-p", "--prompt", dest="prompt", default=None)
+    parser.add_argument("--print", action="store_true")
+    parser.add_argument("--verbose", action="store_true")
+    parser.add_argument("--output-format", default="text")
+    parser.add_argument("--input-format", default="text")
+    parser.add_argument("--mcp-config", default=None)
+    parser.add_argument("--dangerously-skip-permissions", action="store_true")
+    args, _ = parser.parse_known_args()
+
+    seed = os.environ.get("FAKE_CLAUDE_SEED")
+    rng = random.Random(int(seed) if seed else None)
+
+    if args.input_format == "stream-json":
+        # Pooled worker: one answer per user message
+        for line in sys.stdin:
+            try:
+                message = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            content = (message.get("message") or {}).get("content", "")
+            answer(content if isinstance(content, str) else json.dumps(content), rng)
+        return
+
+    answer(args.prompt or sys.stdin.read(), rng)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,7 @@
 import asyncio
 import logging
 import sys
+from datetime import date
 from pathlib import Path
 
 # Add project root to path
@@ -14,8 +15,14 @@ from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
 
 from d_brain.config import get_settings
-from d_brain.services.market import fetch_market_data, format_market_table
+from d_brain.services.market import (
+    compute_market_signals,
+    fetch_market_data,
+    format_market_table,
+)
+from d_brain.services.market_providers import make_providers
 from d_brain.services.processor import ClaudeProcessor
+from d_brain.services.singleflight import SingleFlight
 
 logging.basicConfig(
     level=logging.INFO,
@@ -29,13 +36,25 @@ async def main() -> None:
     settings = get_settings()
 
     logger.info("Fetching market data...")
-    quotes = fetch_market_data()
-    market_table = format_market_table(quotes)
+    db_path = settings.vault_path / ".cache" / "prices.sqlite3"
+    quotes = fetch_market_data(
+        db_path,
+        settings.market_cache_ttl,
+        make_providers(settings.market_providers, settings.market_fixture_path),
+        settings.market_fetch_deadline,
+    )
+    market_table = format_market_table(quotes, compute_market_signals(db_path))
     logger.info("Market data fetched:\n%s", market_table)
 
     logger.info("Generating market digest with Claude...")
-    processor = ClaudeProcessor(settings.vault_path, settings.todoist_api_key)
-    result = processor.generate_market_digest(market_table)
+    processor = ClaudeProcessor(
+        settings.vault_path, settings.todoist_api_key, claude_bin=settings.claude_bin
+    )
+    flight = SingleFlight(settings.vault_path)
+    result = await flight.run(
+        f"market:{date.today().isoformat()}",
+        lambda: processor.generate_market_digest(market_table),
+    )
 
     if "error" in result:
         report = f"❌ <b>Ошибка рыночной аналитики:</b>\n{result['error']}"
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+"""Daily processing script - runs process_daily and prints the report.
+
+Used by scripts/process.sh so the systemd timer shares the bot's
+processing path (including the per-day watermark).
+"""
+
+import asyncio
+import logging
+import sys
+from datetime import date
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from d_brain.config import get_settings
+from d_brain.services.processor import ClaudeProcessor
+from d_brain.services.singleflight import SingleFlight
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+
+async def main() -> None:
+    """Process the given day (default: today) and print the HTML report."""
+    settings = get_settings()
+    day = date.fromisoformat(sys.argv[1]) if len(sys.argv) > 1 else date.today()
+    processor = ClaudeProcessor(
+        settings.vault_path,
+        settings.todoist_api_key,
+        max_concurrency=settings.claude_max_concurrency,
+        chunk_chars=settings.daily_chunk_chars,
+        chunk_parallelism=settings.daily_chunk_parallelism,
+        structured_reports=settings.structured_reports,
+        context_digest=settings.context_digest,
+        preclassify_threshold=(
+            settings.preclassify_threshold if settings.preclassifier_enabled else 0
+        ),
+        claude_bin=settings.claude_bin,
+    )
+
+    logger.info("Starting daily processing for %s...", day)
+    # Joins the bot's run instead of starting a second one for the same day
+    flight = SingleFlight(settings.vault_path)
+    result = await flight.run(
+        f"process:{day.isoformat()}", lambda: processor.process_daily(day)
+    )
+
+    if "error" in result:
+        logger.error("Daily processing failed: %s", result["error"])
+        print(f"❌ <b>Ошибка обработки:</b> {result['error']}")
+        sys.exit(1)
+
+    print(result.get("report", ""))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
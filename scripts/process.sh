@@ -31,24 +31,9 @@ CHAT_ID="${ALLOWED_USER_IDS//[\[\]]/}"  # remove brackets from [123456]
 
 echo "=== d-brain processing for $TODAY ==="
 
-# Run Claude from vault/ for context (reads vault/.claude/CLAUDE.md)
-cd "$VAULT_DIR"
-REPORT=$(claude --print --dangerously-skip-permissions \
-    --mcp-config "$PROJECT_DIR/mcp-config.json" \
-    -p "Today is $TODAY. Execute daily processing according to dbrain-processor skill.
-
-CRITICAL: MCP loads in 10-30 seconds. You are NOT in subprocess — MCP IS running, just initializing.
-
-Algorithm:
-1. Call mcp__todoist__find-tasks-by-date
-2. Error? Wait 10 sec, read goals/, daily/ files
-3. Call again
-4. Error again? Wait 20 more sec
-5. Third call — GUARANTEED to work
-
-DO NOT say MCP unavailable. It is available. Just wait and call." \
-    2>&1) || true
+# Process only entries added since the last run (per-day watermark)
 cd "$PROJECT_DIR"
+REPORT=$(uv run python scripts/process.py "$TODAY") || true
 
 echo "=== Claude output ==="
 echo "$REPORT"
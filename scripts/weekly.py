@@ -4,6 +4,7 @@
 import asyncio
 import logging
 import sys
+from datetime import date
 from pathlib import Path
 
 # Add project root to path
@@ -16,6 +17,7 @@ from aiogram.enums import ParseMode
 from d_brain.config import get_settings
 from d_brain.services.git import VaultGit
 from d_brain.services.processor import ClaudeProcessor
+from d_brain.services.singleflight import SingleFlight
 
 logging.basicConfig(
     level=logging.INFO,
@@ -27,12 +29,19 @@ logger = logging.getLogger(__name__)
 async def main() -> None:
     """Generate weekly digest and send to Telegram."""
     settings = get_settings()
-    processor = ClaudeProcessor(settings.vault_path, settings.todoist_api_key)
+    processor = ClaudeProcessor(
+        settings.vault_path,
+        settings.todoist_api_key,
+        structured_reports=settings.structured_reports,
+        claude_bin=settings.claude_bin,
+    )
     git = VaultGit(settings.vault_path)
 
     logger.info("Starting weekly digest generation...")
 
-    result = processor.generate_weekly()
+    year, week, _ = date.today().isocalendar()
+    flight = SingleFlight(settings.vault_path)
+    result = await flight.run(f"weekly:{year}-W{week:02d}", processor.generate_weekly)
 
     if "error" in result:
         report = f"Error: {result['error']}"
@@ -150,6 +150,7 @@ def format_process_report(report: dict[str, Any]) -> str:
 
     The report from Claude is expected to be in HTML format.
     We sanitize it to ensure only Telegram-safe tags are used.
+    Structured reports are rendered locally and are valid already.
 
     Args:
         report: Processing report from ClaudeProcessor
@@ -164,6 +165,9 @@ def format_process_report(report: dict[str, Any]) -> str:
     if "report" in report:
         raw_report = report["report"]
 
+        if report.get("structured"):
+            return truncate_html(raw_report, max_length=4096)
+
         # Sanitize HTML, keeping allowed tags
         sanitized = sanitize_telegram_html(raw_report)
 
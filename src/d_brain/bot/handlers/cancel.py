@@ -0,0 +1,55 @@
+"""Handlers for cancelling queued and running jobs."""
+
+import logging
+
+from aiogram import F, Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import CallbackQuery, Message
+
+from d_brain.bot.jobs import get_job_dispatcher
+from d_brain.bot.keyboards import CANCEL_PREFIX
+
+router = Router(name="cancel")
+logger = logging.getLogger(__name__)
+
+
+@router.message(Command("cancel"))
+async def cmd_cancel(message: Message, command: CommandObject) -> None:
+    """Handle /cancel [job_id] - cancel a job (latest one in this chat)."""
+    dispatcher = get_job_dispatcher()
+
+    if command.args:
+        try:
+            job_id = int(command.args.strip().lstrip("#"))
+        except ValueError:
+            await message.answer("❌ Укажи номер задачи: /cancel 42")
+            return
+    else:
+        active = dispatcher.active_jobs(message.chat.id)
+        if not active:
+            await message.answer("📭 Нет активных задач")
+            return
+        job_id = active[0].id
+
+    if await dispatcher.cancel(job_id, chat_id=message.chat.id):
+        logger.info("Job %d cancelled via /cancel", job_id)
+        await message.answer(f"🛑 Задача #{job_id} отменена")
+    else:
+        await message.answer(f"❌ Задача #{job_id} не найдена или уже завершена")
+
+
+@router.callback_query(F.data.startswith(CANCEL_PREFIX))
+async def cb_cancel(callback: CallbackQuery) -> None:
+    """Handle the cancel button on a job's status message."""
+    try:
+        job_id = int((callback.data or "").removeprefix(CANCEL_PREFIX))
+    except ValueError:
+        await callback.answer()
+        return
+
+    chat_id = callback.message.chat.id if callback.message else None
+    if await get_job_dispatcher().cancel(job_id, chat_id=chat_id):
+        logger.info("Job %d cancelled via button", job_id)
+        await callback.answer("🛑 Отменяю...")
+    else:
+        await callback.answer("Задача уже завершена")
@@ -1,13 +1,18 @@
-"""Command handlers for /start, /help, /status."""
+"""Command handlers for /start, /help, /status, /queue, /perf."""
 
+import html
 from datetime import date
 
 from aiogram import Router
-from aiogram.filters import Command
+from aiogram.filters import Command, CommandObject
 from aiogram.types import Message
 
+from d_brain.bot.jobs import get_job_dispatcher
 from d_brain.bot.keyboards import get_main_keyboard
 from d_brain.config import get_settings
+from d_brain.services.intents import CLAUDE, routing_stats
+from d_brain.services.ledger import RunLedger
+from d_brain.services.runner import DEFAULT_TIMEOUT
 from d_brain.services.session import SessionStore
 from d_brain.services.storage import VaultStorage
 
@@ -28,9 +33,13 @@ async def cmd_start(message: Message) -> None:
         "<b>Команды:</b>\n"
         "/status - статус сегодняшнего дня\n"
         "/process - обработать записи\n"
+        "/backfill - обработать пропущенные дни\n"
         "/do - выполнить произвольный запрос\n"
         "/weekly - недельный дайджест\n"
         "/market - аналитика рынков (США + KZ)\n"
+        "/queue - очередь задач\n"
+        "/cancel - отменить задачу\n"
+        "/perf - скорость и стоимость Claude\n"
         "/help - справка",
         reply_markup=get_main_keyboard(),
     )
@@ -50,9 +59,13 @@ async def cmd_help(message: Message) -> None:
         "<b>Команды:</b>\n"
         "/status - сколько записей сегодня\n"
         "/process - обработать записи\n"
+        "/backfill - обработать пропущенные дни\n"
         "/do - выполнить произвольный запрос\n"
         "/weekly - недельный дайджест\n"
-        "/market - аналитика рынков (США + KZ)\n\n"
+        "/market - аналитика рынков (США + KZ)\n"
+        "/queue - очередь задач\n"
+        "/cancel - отменить задачу\n"
+        "/perf - скорость и стоимость Claude\n\n"
         "<i>Пример: /do перенеси просроченные задачи на понедельник</i>"
     )
 
@@ -102,3 +115,68 @@ async def cmd_status(message: Message) -> None:
         f"- ↩️ Пересланных: {forward_count}"
         f"{week_stats}"
     )
+
+
+@router.message(Command("queue"))
+async def cmd_queue(message: Message) -> None:
+    """Handle /queue command - show job queue depth and wait times."""
+    dispatcher = get_job_dispatcher()
+    running = dispatcher.running()
+    lines = ["📋 <b>Очередь задач</b>\n"]
+    for job_class, stats in dispatcher.stats().items():
+        slots = dispatcher.class_slots.get(job_class, 0)
+        lines.append(
+            f"<b>{job_class}</b>: выполняется {running.get(job_class, 0)}/{slots}, "
+            f"в очереди {stats.pending}"
+        )
+        if stats.pending:
+            lines.append(f"  ожидает до {stats.oldest_wait:.0f}s")
+        if stats.started:
+            lines.append(
+                f"  среднее ожидание за 24ч: {stats.avg_wait:.1f}s "
+                f"({stats.started} задач)"
+            )
+    await message.answer("\n".join(lines))
+
+
+@router.message(Command("perf"))
+async def cmd_perf(message: Message, command: CommandObject) -> None:
+    """Handle /perf [days] command - Claude run timings, tokens and cost."""
+    try:
+        days = int(command.args) if command.args else 7
+    except ValueError:
+        await message.answer("❌ Укажи число дней: /perf 7")
+        return
+
+    settings = get_settings()
+    ledger = RunLedger(settings.vault_path / ".cache" / "runs.jsonl")
+    summary = ledger.summary(days)
+
+    lines = [f"⏱ <b>Claude за {days} дн.</b>"]
+    if not summary:
+        lines.append("\nЗапусков не было.")
+    for job, perf in summary.items():
+        timeout: float = DEFAULT_TIMEOUT
+        if settings.adaptive_timeouts:
+            timeout = ledger.timeout_for(job, DEFAULT_TIMEOUT)
+        lines.append(
+            f"\n<b>{html.escape(job)}</b>: {perf.runs} запусков, "
+            f"ошибок {perf.failures}\n"
+            f"  время p50/p95: {perf.wall_p50:.0f}s / {perf.wall_p95:.0f}s\n"
+            f"  первый вывод p50/p95: {perf.ttfo_p50:.0f}s / {perf.ttfo_p95:.0f}s\n"
+            f"  токены: {perf.avg_input_tokens:.0f} in "
+            f"({perf.cache_hit_ratio:.0%} из кэша) / "
+            f"{perf.avg_output_tokens:.0f} out\n"
+            f"  tool calls: {perf.avg_tool_calls:.1f}, "
+            f"стоимость: ${perf.cost_usd:.2f}\n"
+            f"  таймаут: {timeout:.0f}s"
+        )
+
+    routed = routing_stats()
+    total = sum(routed.values())
+    if total:
+        local = total - routed.get(CLAUDE, 0)
+        lines.append(
+            f"\n⚡ <b>/do без Claude</b>: {local} из {total} ({local / total:.0%})"
+        )
+    await message.answer("\n".join(lines))
@@ -1,6 +1,5 @@
 """Handler for /do command - arbitrary Claude requests."""
 
-import asyncio
 import logging
 
 from aiogram import Bot, Router
@@ -8,10 +7,10 @@ from aiogram.filters import Command, CommandObject
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message
 
-from d_brain.bot.formatters import format_process_report
+from d_brain.bot.jobs import submit_job
 from d_brain.bot.states import DoCommandState
 from d_brain.config import get_settings
-from d_brain.services.processor import ClaudeProcessor
+from d_brain.services.intents import IntentRouter
 from d_brain.services.transcription import DeepgramTranscriber
 
 router = Router(name="do")
@@ -87,36 +86,14 @@ async def handle_do_input(message: Message, bot: Bot, state: FSMContext) -> None
 
 
 async def process_request(message: Message, prompt: str, user_id: int = 0) -> None:
-    """Process the user's request with Claude."""
+    """Answer the request locally if possible, otherwise queue it for Claude."""
+    settings = get_settings()
+    if settings.intent_router_enabled:
+        reply = IntentRouter(settings.vault_path).route(prompt, user_id)
+        if reply is not None:
+            await message.answer(reply)
+            return
+
     status_msg = await message.answer("⏳ Выполняю...")
 
-    settings = get_settings()
-    processor = ClaudeProcessor(settings.vault_path, settings.todoist_api_key)
-
-    async def run_with_progress() -> dict:
-        task = asyncio.create_task(
-            asyncio.to_thread(processor.execute_prompt, prompt, user_id)
-        )
-
-        elapsed = 0
-        while not task.done():
-            await asyncio.sleep(30)
-            elapsed += 30
-            if not task.done():
-                try:
-                    await status_msg.edit_text(
-                        f"⏳ Выполняю... ({elapsed // 60}m {elapsed % 60}s)"
-                    )
-                except Exception:
-                    pass
-
-        return await task
-
-    report = await run_with_progress()
-
-    formatted = format_process_report(report)
-    try:
-        await status_msg.edit_text(formatted)
-    except Exception:
-        # Fallback: send without HTML parsing
-        await status_msg.edit_text(formatted, parse_mode=None)
+    await submit_job(status_msg, "do", {"prompt": prompt, "user_id": user_id})
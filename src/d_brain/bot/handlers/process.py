@@ -1,17 +1,14 @@
-"""Process command handler."""
+"""Process and backfill command handlers."""
 
-import asyncio
 import logging
 from datetime import date
 
 from aiogram import Router
-from aiogram.filters import Command
+from aiogram.filters import Command, CommandObject
 from aiogram.types import Message
 
-from d_brain.bot.formatters import format_process_report
-from d_brain.config import get_settings
-from d_brain.services.git import VaultGit
-from d_brain.services.processor import ClaudeProcessor
+from d_brain.bot.jobs import submit_job
+from d_brain.services.backfill import DEFAULT_LOOKBACK_DAYS, MAX_LOOKBACK_DAYS
 
 router = Router(name="process")
 logger = logging.getLogger(__name__)
@@ -19,47 +16,27 @@ logger = logging.getLogger(__name__)
 
 @router.message(Command("process"))
 async def cmd_process(message: Message) -> None:
-    """Handle /process command - trigger Claude processing."""
+    """Handle /process command - queue Claude processing."""
     user_id = message.from_user.id if message.from_user else "unknown"
     logger.info("Process command triggered by user %s", user_id)
 
     status_msg = await message.answer("⏳ Processing... (may take up to 10 min)")
 
-    settings = get_settings()
-    processor = ClaudeProcessor(settings.vault_path, settings.todoist_api_key)
-    git = VaultGit(settings.vault_path)
+    await submit_job(status_msg, "process", {"day": date.today().isoformat()})
 
-    # Run subprocess in thread to avoid blocking event loop
-    async def process_with_progress() -> dict:
-        task = asyncio.create_task(
-            asyncio.to_thread(processor.process_daily, date.today())
-        )
 
-        elapsed = 0
-        while not task.done():
-            await asyncio.sleep(30)
-            elapsed += 30
-            if not task.done():
-                try:
-                    await status_msg.edit_text(
-                        f"⏳ Processing... ({elapsed // 60}m {elapsed % 60}s)"
-                    )
-                except Exception:
-                    pass  # Ignore edit errors
-
-        return await task
-
-    report = await process_with_progress()
+@router.message(Command("backfill"))
+async def cmd_backfill(message: Message, command: CommandObject) -> None:
+    """Handle /backfill [days] - process past days that were never processed."""
+    try:
+        days = int(command.args) if command.args else DEFAULT_LOOKBACK_DAYS
+    except ValueError:
+        await message.answer("❌ Укажи число дней: /backfill 7")
+        return
+    days = max(1, min(days, MAX_LOOKBACK_DAYS))
 
-    # Commit and push changes
-    if "error" not in report:
-        today = date.today().isoformat()
-        await asyncio.to_thread(git.commit_and_push, f"chore: process daily {today}")
+    user_id = message.from_user.id if message.from_user else "unknown"
+    logger.info("Backfill (%d days) triggered by user %s", days, user_id)
 
-    # Format and send report
-    formatted = format_process_report(report)
-    try:
-        await status_msg.edit_text(formatted)
-    except Exception:
-        # Fallback: send without HTML parsing
-        await status_msg.edit_text(formatted, parse_mode=None)
+    status_msg = await message.answer(f"⏳ Ищу необработанные дни за {days} дн...")
+    await submit_job(status_msg, "backfill", {"days": days})
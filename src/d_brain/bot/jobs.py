@@ -0,0 +1,466 @@
+"""Durable execution of long-running Claude jobs for bot handlers.
+
+Handlers only post a status message and submit a job; the dispatcher
+claims jobs from the persistent queue by priority, runs them within
+per-class and total concurrency caps, streams progress into the status
+message and delivers the final report there. Jobs interrupted by a
+restart are resumed at startup. Queued and running jobs can be cancelled
+from /cancel or the button on their status message.
+"""
+
+import asyncio
+import logging
+from collections.abc import Callable, Coroutine
+from dataclasses import dataclass
+from datetime import date
+from typing import Any
+
+from aiogram import Bot
+from aiogram.types import Message
+
+from d_brain.bot.keyboards import get_cancel_keyboard
+from d_brain.bot.progress import ProgressReporter, deliver_report
+from d_brain.config import Settings
+from d_brain.services.backfill import DEFAULT_LOOKBACK_DAYS, backfill
+from d_brain.services.git import VaultGit
+from d_brain.services.jobs import (
+    BATCH,
+    INTERACTIVE,
+    PENDING,
+    RUNNING,
+    SCHEDULED,
+    ClassStats,
+    Job,
+    JobQueue,
+)
+from d_brain.services.market import (
+    compute_market_signals,
+    fetch_market_data,
+    format_market_table,
+)
+from d_brain.services.market_providers import make_providers
+from d_brain.services.processor import ClaudeProcessor
+from d_brain.services.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Fallback poll in case a wakeup is missed
+IDLE_POLL_INTERVAL = 5.0
+
+JOINED_TITLE = "⏳ Already running, joined..."
+
+JobFunc = Callable[
+    [Job, Settings, ProgressReporter], Coroutine[Any, Any, dict[str, Any]]
+]
+
+
+@dataclass
+class JobKind:
+    """How to run one kind of job and what its status message says."""
+
+    title: str
+    run: JobFunc
+    job_class: str = BATCH
+    # Safe to restart after a bot restart (guarded by the daily watermark)
+    resumable: bool = False
+
+
+def _make_processor(settings: Settings) -> ClaudeProcessor:
+    return ClaudeProcessor(
+        settings.vault_path,
+        settings.todoist_api_key,
+        max_concurrency=settings.claude_max_concurrency,
+        prompt_token_budget=settings.prompt_token_budget,
+        chunk_chars=settings.daily_chunk_chars,
+        chunk_parallelism=settings.daily_chunk_parallelism,
+        response_cache_ttl=settings.response_cache_ttl,
+        adaptive_timeouts=settings.adaptive_timeouts,
+        structured_reports=settings.structured_reports,
+        context_digest=settings.context_digest,
+        preclassify_threshold=(
+            settings.preclassify_threshold if settings.preclassifier_enabled else 0
+        ),
+        claude_bin=settings.claude_bin,
+    )
+
+
+async def _run_process(
+    job: Job, settings: Settings, reporter: ProgressReporter
+) -> dict[str, Any]:
+    day = date.fromisoformat(job.args["day"])
+    background = bool(job.args.get("background"))
+    processor = _make_processor(settings)
+    flight = SingleFlight(settings.vault_path)
+    key = f"process:{day.isoformat()}"
+
+    report = await flight.run(
+        key,
+        lambda: processor.process_daily(
+            day, on_event=reporter.on_event, background=background
+        ),
+        on_join=lambda: reporter.set_title(JOINED_TITLE),
+    )
+    if report.get("joined") and report.get("background") and not background:
+        # Joined a micro-batch: run again to get the day's summary
+        report = await flight.run(
+            key, lambda: processor.process_daily(day, on_event=reporter.on_event)
+        )
+
+    # Commit and push changes; micro-batch edits are left in the working
+    # tree and go into the commit of the day's final run
+    if "error" not in report and not background:
+        git = VaultGit(settings.vault_path)
+        message = f"chore: process daily {day.isoformat()}"
+        await asyncio.to_thread(git.commit_and_push, message)
+    return report
+
+
+async def _run_backfill(
+    job: Job, settings: Settings, reporter: ProgressReporter
+) -> dict[str, Any]:
+    processor = _make_processor(settings)
+    report = await backfill(
+        processor,
+        lookback_days=job.args.get("days", DEFAULT_LOOKBACK_DAYS),
+        parallelism=settings.backfill_parallelism,
+        on_event=reporter.on_event,
+    )
+
+    # One commit for all backfilled days
+    if "error" not in report and report["days"]:
+        git = VaultGit(settings.vault_path)
+        await asyncio.to_thread(
+            git.commit_and_push, f"chore: backfill {len(report['days'])} day(s)"
+        )
+    return report
+
+
+async def _run_weekly(
+    job: Job, settings: Settings, reporter: ProgressReporter
+) -> dict[str, Any]:
+    year, week, _ = date.fromisoformat(job.args["day"]).isocalendar()
+    processor = _make_processor(settings)
+    flight = SingleFlight(settings.vault_path)
+
+    report = await flight.run(
+        f"weekly:{year}-W{week:02d}",
+        lambda: processor.generate_weekly(on_event=reporter.on_event),
+        on_join=lambda: reporter.set_title(JOINED_TITLE),
+    )
+
+    # Commit any changes (weekly goal updates, etc)
+    if "error" not in report:
+        git = VaultGit(settings.vault_path)
+        await asyncio.to_thread(git.commit_and_push, "chore: weekly digest")
+    return report
+
+
+async def _run_market(
+    job: Job, settings: Settings, reporter: ProgressReporter
+) -> dict[str, Any]:
+    # Fetch prices and compute indicators in a thread (blocking I/O)
+    db_path = settings.vault_path / ".cache" / "prices.sqlite3"
+    quotes = await asyncio.to_thread(
+        fetch_market_data,
+        db_path,
+        settings.market_cache_ttl,
+        make_providers(settings.market_providers, settings.market_fixture_path),
+        settings.market_fetch_deadline,
+    )
+    signals = await asyncio.to_thread(compute_market_signals, db_path)
+    market_table = format_market_table(quotes, signals)
+
+    await reporter.set_title("🤖 Анализирую тренды...")
+    processor = _make_processor(settings)
+    flight = SingleFlight(settings.vault_path)
+    return await flight.run(
+        f"market:{job.args['day']}",
+        lambda: processor.generate_market_digest(
+            market_table, on_event=reporter.on_event
+        ),
+        on_join=lambda: reporter.set_title("🤖 Already running, joined..."),
+    )
+
+
+async def _run_do(
+    job: Job, settings: Settings, reporter: ProgressReporter
+) -> dict[str, Any]:
+    processor = _make_processor(settings)
+    return await processor.execute_prompt(
+        job.args["prompt"], job.args.get("user_id", 0), on_event=reporter.on_event
+    )
+
+
+JOB_KINDS: dict[str, JobKind] = {
+    "process": JobKind("⏳ Processing...", _run_process, resumable=True),
+    "backfill": JobKind(
+        "⏳ Обрабатываю пропущенные дни...", _run_backfill, resumable=True
+    ),
+    "weekly": JobKind("⏳ Генерирую дайджест...", _run_weekly),
+    "market": JobKind("📡 Собираю данные рынков...", _run_market),
+    "do": JobKind("⏳ Выполняю...", _run_do, job_class=INTERACTIVE),
+}
+
+
+class JobDispatcher:
+    """Schedules queued jobs by priority within concurrency caps.
+
+    At most `workers` jobs run at once, and each job class has its own cap
+    (`class_slots`). With `preempt_batch`, pending interactive jobs are
+    claimed ahead of queued batch and scheduled work; otherwise jobs start
+    in FIFO order within the caps.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        settings: Settings,
+        queue: JobQueue,
+        workers: int = 2,
+        class_slots: dict[str, int] | None = None,
+        preempt_batch: bool = True,
+    ) -> None:
+        self.bot = bot
+        self.settings = settings
+        self.queue = queue
+        self.workers = max(1, workers)
+        self.class_slots = class_slots or {INTERACTIVE: 2, BATCH: 1, SCHEDULED: 1}
+        self.preempt_batch = preempt_batch
+        self._running: dict[str, int] = dict.fromkeys(self.class_slots, 0)
+        self._wakeup = asyncio.Event()
+        self._scheduler: asyncio.Task[None] | None = None
+        self._tasks: set[asyncio.Task[None]] = set()
+        self._job_tasks: dict[int, asyncio.Task[None]] = {}
+        self._cancel_requested: set[int] = set()
+
+    async def start(self) -> None:
+        """Resume interrupted jobs and start scheduling.
+
+        Interrupted jobs that aren't resumable (e.g. /do, which may have
+        created Todoist tasks already) are failed and their status message
+        says so.
+        """
+        resumed, failed = self.queue.requeue_interrupted(
+            [kind for kind, spec in JOB_KINDS.items() if spec.resumable]
+        )
+        if resumed:
+            logger.info("Resuming %d interrupted job(s)", resumed)
+        for job in failed:
+            logger.info("Job %d (%s) was interrupted, not resuming", job.id, job.kind)
+            if not job.message_id or job.result is None:
+                continue
+            try:
+                await deliver_report(self.bot, job.chat_id, job.message_id, job.result)
+            except Exception:
+                logger.exception("Failed to notify about job %d", job.id)
+        self._scheduler = asyncio.create_task(self._schedule(), name="job-scheduler")
+
+    async def stop(self) -> None:
+        """Stop scheduling; running jobs stay queued for the next start."""
+        tasks = [*self._tasks]
+        if self._scheduler is not None:
+            tasks.append(self._scheduler)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+        self._job_tasks.clear()
+        self._scheduler = None
+        self.queue.close()
+
+    def submit(
+        self,
+        kind: str,
+        args: dict[str, Any],
+        chat_id: int,
+        message_id: int,
+        job_class: str | None = None,
+    ) -> Job:
+        """Queue a job whose progress and result go to the given message.
+
+        The job class defaults to the one registered for its kind.
+        """
+        if job_class is None:
+            job_class = JOB_KINDS[kind].job_class if kind in JOB_KINDS else BATCH
+        job = self.queue.enqueue(kind, args, chat_id, message_id, job_class)
+        self._wakeup.set()
+        return job
+
+    async def cancel(self, job_id: int, chat_id: int | None = None) -> bool:
+        """Cancel a queued or running job.
+
+        A running job's task is cancelled, which kills its Claude process
+        tree and frees its slot; its status message then shows the partial
+        progress.
+
+        Args:
+            job_id: Job to cancel
+            chat_id: Only cancel if the job belongs to this chat
+
+        Returns:
+            True if the job was pending or running and is being cancelled
+        """
+        job = self.queue.get(job_id)
+        if job is None or (chat_id is not None and job.chat_id != chat_id):
+            return False
+
+        if self.queue.cancel_pending(job_id):
+            logger.info("Job %d (%s) cancelled before start", job.id, job.kind)
+            await deliver_report(
+                self.bot,
+                job.chat_id,
+                job.message_id,
+                {"report": "🛑 <b>Отменено</b>", "cancelled": True},
+            )
+            return True
+
+        task = self._job_tasks.get(job_id)
+        if task is None or task.done():
+            return False
+        self._cancel_requested.add(job_id)
+        task.cancel()
+        return True
+
+    def active_jobs(self, chat_id: int | None = None) -> list[Job]:
+        """Pending and running jobs, newest first."""
+        return self.queue.active_jobs(chat_id)
+
+    def stats(self) -> dict[str, ClassStats]:
+        """Queue depth and wait times per job class."""
+        return self.queue.stats()
+
+    def running(self) -> dict[str, int]:
+        """Number of running jobs per job class."""
+        return dict(self._running)
+
+    def _free_classes(self) -> list[str]:
+        if sum(self._running.values()) >= self.workers:
+            return []
+        return [
+            job_class
+            for job_class, slots in self.class_slots.items()
+            if self._running.get(job_class, 0) < slots
+        ]
+
+    async def _schedule(self) -> None:
+        while True:
+            self._wakeup.clear()
+            while job := self.queue.claim(
+                self._free_classes(), by_priority=self.preempt_batch
+            ):
+                self._launch(job)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), IDLE_POLL_INTERVAL)
+            except TimeoutError:
+                pass
+
+    def _launch(self, job: Job) -> None:
+        wait = (job.started_at or job.created_at) - job.created_at
+        logger.info(
+            "Job %d (%s, %s) started after %.1fs in queue",
+            job.id,
+            job.kind,
+            job.job_class,
+            wait,
+        )
+        self._running[job.job_class] = self._running.get(job.job_class, 0) + 1
+        task = asyncio.create_task(self._execute(job), name=f"job-{job.id}")
+        self._tasks.add(task)
+        self._job_tasks[job.id] = task
+
+        def _done(t: asyncio.Task[None]) -> None:
+            self._tasks.discard(t)
+            self._job_tasks.pop(job.id, None)
+            self._running[job.job_class] -= 1
+            self._wakeup.set()
+
+        task.add_done_callback(_done)
+
+    async def _execute(self, job: Job) -> None:
+        kind = JOB_KINDS.get(job.kind)
+        reporter = ProgressReporter(
+            self.bot,
+            job.chat_id,
+            job.message_id,
+            kind.title if kind else job.kind,
+            reply_markup=get_cancel_keyboard(job.id),
+        )
+        try:
+            if kind is None:
+                result: dict[str, Any] = {
+                    "error": f"Unknown job kind: {job.kind}",
+                    "processed_entries": 0,
+                }
+            else:
+                result = await reporter.run(kind.run(job, self.settings, reporter))
+        except asyncio.CancelledError:
+            if job.id not in self._cancel_requested:
+                raise  # Shutdown: the job stays running until the next start
+            current = asyncio.current_task()
+            if current is not None:
+                current.uncancel()
+            logger.info("Job %d (%s) cancelled", job.id, job.kind)
+            result = reporter.cancelled_report()
+        except Exception as e:
+            logger.exception("Job %d (%s) crashed", job.id, job.kind)
+            result = {"error": str(e), "processed_entries": 0}
+        finally:
+            self._cancel_requested.discard(job.id)
+
+        self.queue.complete(job.id, result)
+        logger.info("Job %d (%s) finished", job.id, job.kind)
+        if not job.message_id:
+            return  # Background job without a status message
+        try:
+            await deliver_report(self.bot, job.chat_id, job.message_id, result)
+        except Exception:
+            logger.exception("Failed to deliver result of job %d", job.id)
+
+
+_dispatcher: JobDispatcher | None = None
+
+
+def get_job_dispatcher() -> JobDispatcher:
+    """Get the running job dispatcher."""
+    if _dispatcher is None:
+        raise RuntimeError("Job dispatcher is not running")
+    return _dispatcher
+
+
+def set_job_dispatcher(dispatcher: JobDispatcher | None) -> None:
+    """Install (or clear) the process-wide job dispatcher."""
+    global _dispatcher
+    _dispatcher = dispatcher
+
+
+async def submit_job(status_msg: Message, kind: str, args: dict[str, Any]) -> Job:
+    """Queue a job reporting to status_msg and give it a cancel button."""
+    dispatcher = get_job_dispatcher()
+    job = dispatcher.submit(kind, args, status_msg.chat.id, status_msg.message_id)
+    current = dispatcher.queue.get(job.id)
+    if current is not None and current.state in (PENDING, RUNNING):
+        try:
+            await status_msg.edit_reply_markup(reply_markup=get_cancel_keyboard(job.id))
+        except Exception:
+            pass  # Ignore edit errors (message replaced by the report, etc.)
+    return job
+
+
+def submit_micro_batch(day: date) -> None:
+    """Queue a background /process run for day, unless one is already waiting.
+
+    Micro-batches have no status message; their reports are merged into the
+    next regular /process summary.
+    """
+    dispatcher = get_job_dispatcher()
+    for job in dispatcher.active_jobs(chat_id=0):
+        waiting = job.state == PENDING and job.args.get("day") == day.isoformat()
+        if job.kind == "process" and waiting:
+            return
+    dispatcher.submit(
+        "process",
+        {"day": day.isoformat(), "background": True},
+        chat_id=0,
+        message_id=0,
+        job_class=SCHEDULED,
+    )
@@ -1,7 +1,9 @@
-"""Reply keyboards for Telegram bot."""
+"""Keyboards for Telegram bot."""
 
-from aiogram.types import ReplyKeyboardMarkup
-from aiogram.utils.keyboard import ReplyKeyboardBuilder
+from aiogram.types import InlineKeyboardMarkup, ReplyKeyboardMarkup
+from aiogram.utils.keyboard import InlineKeyboardBuilder, ReplyKeyboardBuilder
+
+CANCEL_PREFIX = "cancel:"
 
 
 def get_main_keyboard() -> ReplyKeyboardMarkup:
@@ -17,3 +19,10 @@ def get_main_keyboard() -> ReplyKeyboardMarkup:
     builder.button(text="❓ Помощь")
     builder.adjust(3, 3)  # 3 in first row, 3 in second
     return builder.as_markup(resize_keyboard=True, is_persistent=True)
+
+
+def get_cancel_keyboard(job_id: int) -> InlineKeyboardMarkup:
+    """Inline keyboard with a cancel button for a queued or running job."""
+    builder = InlineKeyboardBuilder()
+    builder.button(text="🛑 Отменить", callback_data=f"{CANCEL_PREFIX}{job_id}")
+    return builder.as_markup()
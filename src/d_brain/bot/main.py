@@ -10,7 +10,13 @@ from aiogram.enums import ParseMode
 from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.types import BotCommand, Update
 
+from d_brain.bot.jobs import JobDispatcher, set_job_dispatcher, submit_micro_batch
 from d_brain.config import Settings
+from d_brain.services.classifier import EntryClassifier
+from d_brain.services.jobs import BATCH, INTERACTIVE, SCHEDULED, JobQueue
+from d_brain.services.microbatch import MicroBatcher
+from d_brain.services.storage import set_entry_tagger
+from d_brain.services.worker_pool import ClaudeWorkerPool, set_worker_pool
 
 logger = logging.getLogger(__name__)
 
@@ -25,13 +31,14 @@ def create_bot(settings: Settings) -> Bot:
 
 def create_dispatcher() -> Dispatcher:
     """Create and configure the dispatcher with routers."""
-    from d_brain.bot.handlers import buttons, commands, do, forward, market, photo, process, text, voice, weekly
+    from d_brain.bot.handlers import buttons, cancel, commands, do, forward, market, photo, process, text, voice, weekly
 
     # Use memory storage for FSM (required for /do command state)
     dp = Dispatcher(storage=MemoryStorage())
 
     # Register routers - ORDER MATTERS
     dp.include_router(commands.router)
+    dp.include_router(cancel.router)
     dp.include_router(process.router)
     dp.include_router(weekly.router)
     dp.include_router(market.router)
@@ -93,14 +100,72 @@ async def run_bot(settings: Settings) -> None:
     await bot.set_my_commands([
         BotCommand(command="status", description="Статус сегодняшнего дня"),
         BotCommand(command="process", description="Обработать записи"),
+        BotCommand(command="backfill", description="Обработать пропущенные дни"),
         BotCommand(command="weekly", description="Недельный дайджест"),
         BotCommand(command="market", description="Аналитика рынков (США + KZ)"),
         BotCommand(command="do", description="Выполнить произвольный запрос"),
+        BotCommand(command="queue", description="Очередь задач"),
+        BotCommand(command="cancel", description="Отменить задачу"),
+        BotCommand(command="perf", description="Скорость и стоимость Claude"),
         BotCommand(command="help", description="Справка"),
     ])
 
+    # Keep warm Claude/MCP workers so requests skip the CLI cold start
+    pool = None
+    if settings.claude_pool_size > 0:
+        pool = ClaudeWorkerPool(
+            cwd=settings.vault_path.parent,
+            mcp_config_path=(settings.vault_path.parent / "mcp-config.json").resolve(),
+            todoist_api_key=settings.todoist_api_key,
+            size=settings.claude_pool_size,
+            idle_ttl=settings.claude_pool_idle_ttl,
+            health_interval=settings.claude_pool_health_interval,
+            max_jobs_per_worker=settings.claude_pool_max_jobs,
+            claude_bin=settings.claude_bin,
+        )
+        await pool.start()
+        set_worker_pool(pool)
+
+    # Durable job queue: resumes jobs interrupted by a restart
+    jobs = JobDispatcher(
+        bot,
+        settings,
+        JobQueue(settings.vault_path / ".cache" / "jobs.sqlite3"),
+        workers=settings.job_workers,
+        class_slots={
+            INTERACTIVE: settings.scheduler_interactive_slots,
+            BATCH: settings.scheduler_batch_slots,
+            SCHEDULED: settings.scheduler_scheduled_slots,
+        },
+        preempt_batch=settings.scheduler_preempt_batch,
+    )
+    await jobs.start()
+    set_job_dispatcher(jobs)
+
+    # Opt-in: tag new entries with a local category guess
+    if settings.preclassifier_enabled:
+        set_entry_tagger(EntryClassifier(settings.vault_path).tag)
+
+    # Opt-in: process fresh entries in the background during the day
+    batcher = None
+    if settings.microbatch_enabled:
+        batcher = MicroBatcher(
+            submit_micro_batch,
+            min_entries=settings.microbatch_entries,
+            idle_minutes=settings.microbatch_idle_minutes,
+        )
+        batcher.start()
+
     logger.info("Starting bot polling...")
     try:
         await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
     finally:
+        if batcher is not None:
+            batcher.stop()
+        set_entry_tagger(None)
+        set_job_dispatcher(None)
+        await jobs.stop()
+        if pool is not None:
+            set_worker_pool(None)
+            await pool.close()
         await bot.session.close()
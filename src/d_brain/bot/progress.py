@@ -0,0 +1,162 @@
+"""Live progress updates for long-running Claude jobs."""
+
+import asyncio
+import html
+import logging
+import time
+from collections.abc import Coroutine
+from typing import Any
+
+from aiogram import Bot
+from aiogram.types import InlineKeyboardMarkup
+
+from d_brain.bot.formatters import format_process_report
+from d_brain.services.runner import ClaudeEvent
+
+logger = logging.getLogger(__name__)
+
+# Telegram rate-limits message edits; don't edit more often than this
+MIN_EDIT_INTERVAL = 5.0
+# Refresh the elapsed-time counter even when nothing new was streamed
+HEARTBEAT_INTERVAL = 30.0
+MAX_TOOL_LINES = 5
+MAX_PARTIAL_CHARS = 600
+
+
+class ProgressReporter:
+    """Throttled status-message updater fed by Claude stream events.
+
+    Shows the last tool calls and the tail of the partial answer instead of
+    a bare elapsed-time counter, and hands back the job result as soon as
+    the stream closes.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        chat_id: int,
+        message_id: int,
+        title: str,
+        min_interval: float = MIN_EDIT_INTERVAL,
+        reply_markup: InlineKeyboardMarkup | None = None,
+    ) -> None:
+        self.bot = bot
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.title = title
+        self.min_interval = min_interval
+        self.reply_markup = reply_markup  # kept on every progress edit
+        self._tools: list[str] = []
+        self._partial = ""
+        self._dirty = False
+        self._started = time.monotonic()
+        self._last_edit = self._started
+
+    async def set_title(self, title: str) -> None:
+        """Change the status headline and show it right away."""
+        self.title = title
+        await self._edit()
+
+    def on_event(self, event: ClaudeEvent) -> None:
+        """Record a streamed event; the next tick renders it."""
+        if event.kind == "tool":
+            self._tools.append(event.text)
+            self._tools = self._tools[-MAX_TOOL_LINES:]
+        elif event.kind == "text":
+            self._partial = event.text
+        self._dirty = True
+
+    def render(self, title: str | None = None) -> str:
+        """Render current progress as Telegram HTML.
+
+        Args:
+            title: Headline to show instead of the current title
+        """
+        elapsed = int(time.monotonic() - self._started)
+        lines = [f"{title or self.title} ({elapsed // 60}m {elapsed % 60}s)"]
+        if self._tools:
+            lines.append("")
+            lines.extend(
+                f"🔧 called <code>{html.escape(tool)}</code>" for tool in self._tools
+            )
+        if self._partial:
+            partial = self._partial.strip()
+            if len(partial) > MAX_PARTIAL_CHARS:
+                partial = "…" + partial[-MAX_PARTIAL_CHARS:]
+            lines.append("")
+            lines.append(f"<i>{html.escape(partial)}</i>")
+        return "\n".join(lines)
+
+    async def _edit(self) -> None:
+        self._dirty = False
+        self._last_edit = time.monotonic()
+        if not self.message_id:
+            return  # Background job without a status message
+        try:
+            await self.bot.edit_message_text(
+                self.render(),
+                chat_id=self.chat_id,
+                message_id=self.message_id,
+                reply_markup=self.reply_markup,
+            )
+        except Exception:
+            pass  # Ignore edit errors (not modified, rate limit, etc.)
+
+    async def run(self, job: Coroutine[Any, Any, dict[str, Any]]) -> dict[str, Any]:
+        """Run job, updating the status message until it finishes.
+
+        Args:
+            job: Job coroutine; it should stream events into on_event
+
+        Returns:
+            The job's result dict, returned the moment the job completes
+
+        Raises:
+            asyncio.CancelledError: If the caller is cancelled; the job is
+                cancelled too and awaited, so its subprocesses are gone by
+                the time this returns
+        """
+        task = asyncio.create_task(job)
+        try:
+            while True:
+                done, _ = await asyncio.wait({task}, timeout=self.min_interval)
+                if done:
+                    break
+                since_edit = time.monotonic() - self._last_edit
+                if self._dirty or since_edit >= HEARTBEAT_INTERVAL:
+                    await self._edit()
+        finally:
+            if not task.done():
+                task.cancel()
+                await asyncio.wait({task})
+        return task.result()
+
+    def cancelled_report(self) -> dict[str, Any]:
+        """Result for a job cancelled by the user, with its partial progress."""
+        return {
+            "report": self.render("🛑 <b>Отменено</b>"),
+            "cancelled": True,
+            "processed_entries": 0,
+        }
+
+
+async def deliver_report(
+    bot: Bot, chat_id: int, message_id: int, report: dict[str, Any]
+) -> None:
+    """Replace the status message with the formatted final report."""
+    formatted = format_process_report(report)
+    try:
+        await bot.edit_message_text(formatted, chat_id=chat_id, message_id=message_id)
+    except Exception:
+        if report.get("structured"):
+            # Locally rendered HTML is valid: the status message is gone
+            await bot.send_message(chat_id, formatted)
+            return
+        try:
+            # Fallback: send without HTML parsing
+            await bot.edit_message_text(
+                formatted, chat_id=chat_id, message_id=message_id, parse_mode=None
+            )
+        except Exception:
+            # Status message is gone (deleted, too old): send a new one
+            await bot.send_message(chat_id, formatted, parse_mode=None)
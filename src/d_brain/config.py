@@ -30,6 +30,122 @@ class Settings(BaseSettings):
         default=False,
         description="Whether to allow access to all users (security risk!)",
     )
+    claude_bin: str = Field(
+        default="claude",
+        description="Claude CLI executable (scripts/fake_claude.py for benchmarks)",
+    )
+    claude_max_concurrency: int = Field(
+        default=3,
+        description="Claude CLI processes at once (one is kept free for /do)",
+    )
+    intent_router_enabled: bool = Field(
+        default=True,
+        description="Answer known read-only /do requests locally without Claude",
+    )
+    response_cache_ttl: float = Field(
+        default=0,
+        description="Seconds to reuse answers to read-only /do requests (0 = off)",
+    )
+    prompt_token_budget: int = Field(
+        default=12000,
+        description="Estimated token budget for /do prompts; context is trimmed to fit",
+    )
+    daily_chunk_chars: int = Field(
+        default=12000,
+        description="Split /process into parallel chunks above this size (0 = off)",
+    )
+    daily_chunk_parallelism: int = Field(
+        default=2,
+        description="Maximum number of daily chunks processed at once",
+    )
+    backfill_parallelism: int = Field(
+        default=2,
+        description="Maximum number of days /backfill processes at once",
+    )
+    microbatch_enabled: bool = Field(
+        default=False,
+        description="Process new entries in the background during the day",
+    )
+    microbatch_entries: int = Field(
+        default=5,
+        description="Start a background batch after this many new entries",
+    )
+    microbatch_idle_minutes: float = Field(
+        default=20,
+        description="Start a background batch after this many idle minutes",
+    )
+    preclassifier_enabled: bool = Field(
+        default=False,
+        description="Tag new daily entries with a locally classified category",
+    )
+    preclassify_threshold: float = Field(
+        default=0.85,
+        description="File tagged thoughts at this confidence without Claude",
+    )
+    adaptive_timeouts: bool = Field(
+        default=False,
+        description="Derive Claude timeouts per job type from the run ledger",
+    )
+    context_digest: bool = Field(
+        default=True,
+        description="Inline an incrementally built vault digest into prompts",
+    )
+    structured_reports: bool = Field(
+        default=False,
+        description="Ask Claude for JSON reports and render them locally",
+    )
+    market_cache_ttl: float = Field(
+        default=300,
+        description="Seconds fetched market prices stay fresh (0 = always download)",
+    )
+    market_providers: list[str] = Field(
+        default_factory=lambda: ["yfinance"],
+        description="Market data providers in fallback order (yfinance, fixture)",
+    )
+    market_fixture_path: Path | None = Field(
+        default=None,
+        description="JSON price fixture for the fixture provider",
+    )
+    market_fetch_deadline: float = Field(
+        default=20,
+        description="Seconds a market data download may take in total",
+    )
+    job_workers: int = Field(
+        default=2,
+        description="Maximum number of queued Claude jobs running at once",
+    )
+    scheduler_interactive_slots: int = Field(
+        default=2,
+        description="Concurrent interactive jobs (/do)",
+    )
+    scheduler_batch_slots: int = Field(
+        default=1,
+        description="Concurrent batch jobs (/process, /weekly, /market)",
+    )
+    scheduler_scheduled_slots: int = Field(
+        default=1,
+        description="Concurrent scheduled background jobs",
+    )
+    scheduler_preempt_batch: bool = Field(
+        default=True,
+        description="Queued batch work waits while interactive jobs are pending",
+    )
+    claude_pool_size: int = Field(
+        default=1,
+        description="Warm Claude/MCP workers kept ready by the bot (0 disables)",
+    )
+    claude_pool_idle_ttl: float = Field(
+        default=1800,
+        description="Seconds an idle worker may live before it is recycled",
+    )
+    claude_pool_health_interval: float = Field(
+        default=60,
+        description="Seconds between worker pool health checks",
+    )
+    claude_pool_max_jobs: int = Field(
+        default=1,
+        description="Prompts a worker serves before retiring (>1 shares context)",
+    )
 
     @property
     def daily_path(self) -> Path:
@@ -0,0 +1,99 @@
+"""Backfill of daily files that were never processed.
+
+Used by /backfill and scripts/backfill.py after downtime or failed timer
+runs: every past day with entries past its watermark, or with micro-batch
+reports that never made it into a summary, is processed a few days at a
+time into one aggregated report. Days from before the first watermark was
+written are left alone (see VaultStorage.unprocessed_days).
+"""
+
+import asyncio
+import logging
+from datetime import date
+from typing import Any
+
+from d_brain.services.processor import (
+    ClaudeProcessor,
+    all_structured,
+    merge_reports,
+)
+from d_brain.services.runner import EventCallback
+from d_brain.services.singleflight import SingleFlight
+from d_brain.services.storage import VaultStorage
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOOKBACK_DAYS = 7
+MAX_LOOKBACK_DAYS = 90
+
+
+async def backfill(
+    processor: ClaudeProcessor,
+    lookback_days: int = DEFAULT_LOOKBACK_DAYS,
+    parallelism: int = 2,
+    on_event: EventCallback | None = None,
+) -> dict[str, Any]:
+    """Process past days with unprocessed entries or unsummarized batches.
+
+    Args:
+        processor: Processor to run process_daily with
+        lookback_days: How many days before today to look at
+        parallelism: Maximum number of days processed at once
+        on_event: Optional callback for streamed progress events
+
+    Returns:
+        Aggregated report dict with 'days' (processed dates)
+    """
+    storage = VaultStorage(processor.vault_path)
+    lookback = min(lookback_days, MAX_LOOKBACK_DAYS)
+    today = date.today()
+    # process_daily merges leftover micro-batch reports into the day's report
+    leftover = {
+        day
+        for day in processor.pending_batch_days()
+        if 0 < (today - day).days <= lookback
+    }
+    days = sorted(leftover.union(storage.unprocessed_days(lookback, today)))
+    if not days:
+        return {
+            "report": f"✅ <b>Все дни за последние {lookback_days} дн. обработаны</b>",
+            "processed_entries": 0,
+            "days": [],
+        }
+
+    logger.info("Backfilling %d day(s): %s", len(days), ", ".join(map(str, days)))
+    flight = SingleFlight(processor.vault_path)
+    slots = asyncio.Semaphore(max(1, parallelism))
+
+    async def process(day: date) -> dict[str, Any]:
+        async with slots:
+            try:
+                return await flight.run(
+                    f"process:{day.isoformat()}",
+                    lambda: processor.process_daily(day, on_event=on_event),
+                )
+            except Exception as e:
+                logger.exception("Backfill of %s failed", day)
+                return {"error": str(e), "processed_entries": 0}
+
+    results = await asyncio.gather(*(process(day) for day in days))
+
+    failed = sum(1 for result in results if "error" in result)
+    if failed == len(days):
+        return {"error": results[0]["error"], "processed_entries": 0, "days": []}
+
+    header = f"🗂 <b>Backfill: {len(days)} дн.</b>"
+    if failed:
+        header += f" (ошибок: {failed})"
+    return {
+        "report": merge_reports(
+            header, [(day.isoformat(), r) for day, r in zip(days, results, strict=True)]
+        ),
+        "processed_entries": sum(r.get("processed_entries", 0) for r in results),
+        "structured": all_structured(results),
+        "days": [
+            day.isoformat()
+            for day, r in zip(days, results, strict=True)
+            if "error" not in r
+        ],
+    }
@@ -0,0 +1,264 @@
+"""Local preclassifier for daily entries.
+
+Entries are tagged when they are appended to the daily file with a
+category and confidence, as an HTML comment ("<!-- class: ideas 0.91 -->")
+that entry hashes ignore. The score blends keyword rules with a
+multinomial naive Bayes model trained on the notes already filed in
+vault/thoughts/<category>/; the model alone never reaches a high
+confidence, so only entries where rules and model agree qualify for
+being filed without Claude.
+"""
+
+import logging
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+from datetime import date
+from pathlib import Path
+
+from d_brain.services.context import keywords
+from d_brain.services.intents import normalize
+from d_brain.services.storage import HTML_COMMENT_RE
+
+logger = logging.getLogger(__name__)
+
+CATEGORIES = ("ideas", "learnings", "projects", "reflections", "tasks")
+# Categories a confident entry may be filed into without Claude. Tasks and
+# projects only get a hint: they need Todoist or an existing project note.
+FILE_DIRECTLY = ("ideas", "learnings", "reflections")
+NOTE_TYPES = {
+    "ideas": "idea",
+    "learnings": "learning",
+    "projects": "project",
+    "reflections": "reflection",
+    "tasks": "task",
+}
+
+RULES: dict[str, list[re.Pattern[str]]] = {
+    "tasks": [
+        re.compile(
+            r"\b(купить|позвонить|написать|отправить|оплатить|записаться|"
+            r"забрать|заказать|не забыть|напомни\w*|надо|нужно)\b"
+        ),
+    ],
+    "ideas": [
+        re.compile(r"\b(иде[яюи]|а что если|можно было бы|придумал\w*)\b"),
+    ],
+    "learnings": [
+        re.compile(r"https?://"),
+        re.compile(r"\b(узнал\w*|прочитал\w*|стать[яюи]|книг[аеиу]|курс\w*|гайд)\b"),
+    ],
+    "reflections": [
+        re.compile(r"\b(чувству\w*|понял что|осознал\w*|размышля\w*|благодар\w*)\b"),
+    ],
+    "projects": [
+        re.compile(r"\b(проект\w*|этап\w*|дедлайн\w*|релиз\w*|mvp)\b"),
+    ],
+}
+FORWARD_CATEGORY = "learnings"
+
+# Weight of the rules in the blended score, and the cap for the model alone
+RULE_WEIGHT = 0.5
+MODEL_ONLY_WEIGHT = 0.6
+
+TAG_RE = re.compile(r"<!-- class: (\w+) ([\d.]+) -->")
+FRONTMATTER_RE = re.compile(r"\A---\n.*?\n---\n", re.DOTALL)
+
+
+@dataclass
+class Classification:
+    """Category of an entry and how sure the classifier is."""
+
+    category: str
+    confidence: float
+
+    def tag(self) -> str:
+        return f"<!-- class: {self.category} {self.confidence:.2f} -->"
+
+
+def read_tag(entry: str) -> Classification | None:
+    """Classification tag of a daily entry, if it has one."""
+    match = TAG_RE.search(entry)
+    if match is None or match.group(1) not in CATEGORIES:
+        return None
+    return Classification(match.group(1), float(match.group(2)))
+
+
+class NaiveBayes:
+    """Multinomial naive Bayes over keyword stems, Laplace-smoothed."""
+
+    def __init__(self) -> None:
+        self.docs: Counter[str] = Counter()
+        self.words: dict[str, Counter[str]] = {c: Counter() for c in CATEGORIES}
+        self.vocabulary: set[str] = set()
+
+    def fit(self, category: str, text: str) -> None:
+        stems = keywords(normalize(text))
+        self.docs[category] += 1
+        self.words[category].update(stems)
+        self.vocabulary |= stems
+
+    def posterior(self, text: str) -> dict[str, float]:
+        """Probability per category (uniform when untrained)."""
+        if not self.docs:
+            return {c: 1 / len(CATEGORIES) for c in CATEGORIES}
+        stems = keywords(normalize(text)) & self.vocabulary
+        total_docs = sum(self.docs.values()) + len(CATEGORIES)
+        scores = {}
+        for category in CATEGORIES:
+            counts = self.words[category]
+            denominator = sum(counts.values()) + len(self.vocabulary)
+            score = math.log((self.docs[category] + 1) / total_docs)
+            for stem in stems:
+                score += math.log((counts[stem] + 1) / denominator)
+            scores[category] = score
+        top = max(scores.values())
+        exp = {c: math.exp(s - top) for c, s in scores.items()}
+        total = sum(exp.values())
+        return {c: v / total for c, v in exp.items()}
+
+
+class EntryClassifier:
+    """Keyword rules plus naive Bayes trained on vault/thoughts/."""
+
+    def __init__(self, vault_path: Path) -> None:
+        self.thoughts_path = Path(vault_path) / "thoughts"
+        self._model = NaiveBayes()
+        self._fingerprint: tuple[int, int] | None = None
+
+    def _training_files(self) -> list[tuple[str, Path]]:
+        return [
+            (category, path)
+            for category in CATEGORIES
+            for path in sorted((self.thoughts_path / category).glob("*.md"))
+        ]
+
+    def _ensure_model(self) -> None:
+        """(Re)train when notes were added, removed or edited."""
+        files = self._training_files()
+        fingerprint = (
+            len(files),
+            max((path.stat().st_mtime_ns for _, path in files), default=0),
+        )
+        if fingerprint == self._fingerprint:
+            return
+        model = NaiveBayes()
+        for category, path in files:
+            try:
+                text = path.read_text(encoding="utf-8")
+            except (OSError, UnicodeDecodeError):
+                continue
+            model.fit(category, FRONTMATTER_RE.sub("", text))
+        self._model = model
+        self._fingerprint = fingerprint
+        logger.info("Preclassifier trained on %d notes", len(files))
+
+    def classify(self, text: str, msg_type: str = "") -> Classification:
+        """Classify an entry.
+
+        Args:
+            text: Entry text
+            msg_type: Daily entry type marker, e.g. "[forward from: Name]"
+
+        Returns:
+            Most likely category with its blended confidence
+        """
+        self._ensure_model()
+        clean = HTML_COMMENT_RE.sub("", text)
+        normalized = clean.lower().replace("ё", "е")
+
+        hits: Counter[str] = Counter()
+        for category, patterns in RULES.items():
+            hits[category] += sum(1 for p in patterns if p.search(normalized))
+        if msg_type.startswith("[forward"):
+            hits[FORWARD_CATEGORY] += 1
+
+        posterior = self._model.posterior(clean)
+        total_hits = sum(hits.values())
+        if total_hits:
+            scores = {
+                c: (1 - RULE_WEIGHT) * posterior[c] + RULE_WEIGHT * hits[c] / total_hits
+                for c in CATEGORIES
+            }
+        else:
+            scores = {c: MODEL_ONLY_WEIGHT * p for c, p in posterior.items()}
+        category = max(scores, key=lambda c: scores[c])
+        return Classification(category, round(scores[category], 2))
+
+    def tag(self, text: str, msg_type: str) -> str | None:
+        """Tag for VaultStorage.append_to_daily (see set_entry_tagger)."""
+        try:
+            return self.classify(text, msg_type).tag()
+        except Exception:
+            logger.exception("Preclassifier failed")
+            return None
+
+
+TRANSLIT = str.maketrans(
+    {
+        "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "e",
+        "ж": "zh", "з": "z", "и": "i", "й": "y", "к": "k", "л": "l", "м": "m",
+        "н": "n", "о": "o", "п": "p", "р": "r", "с": "s", "т": "t", "у": "u",
+        "ф": "f", "х": "h", "ц": "ts", "ч": "ch", "ш": "sh", "щ": "sch",
+        "ъ": "", "ы": "y", "ь": "", "э": "e", "ю": "yu", "я": "ya",
+    }
+)  # fmt: skip
+
+
+def note_slug(text: str, max_words: int = 5) -> str:
+    """Transliterated file-name slug from the first words of a text."""
+    text = re.sub(r"https?://\S+", "", text) or text
+    words = re.findall(r"\w+", text.lower().translate(TRANSLIT))
+    return "-".join(words[:max_words]) or "note"
+
+
+def entry_body(entry: str) -> tuple[str, str]:
+    """(type marker, text without tags) of a "## HH:MM [type]" entry."""
+    header, _, body = entry.partition("\n")
+    marker = header.split(" ", 2)[2] if header.count(" ") >= 2 else ""
+    return marker, HTML_COMMENT_RE.sub("", body).strip()
+
+
+def file_note(
+    vault_path: Path, day: date, category: str, entry: str, confidence: float
+) -> Path:
+    """Save an entry as a note in thoughts/<category>/ and link it in the MOC.
+
+    Returns:
+        Path of the new note
+    """
+    marker, text = entry_body(entry)
+    notes_dir = Path(vault_path) / "thoughts" / category
+    notes_dir.mkdir(parents=True, exist_ok=True)
+    stem = f"{day.isoformat()}-{note_slug(text)}"
+    path = notes_dir / f"{stem}.md"
+    suffix = 2
+    while path.exists():
+        path = notes_dir / f"{stem}-{suffix}.md"
+        suffix += 1
+
+    path.write_text(
+        f"""---
+date: {day.isoformat()}
+type: {NOTE_TYPES[category]}
+source: daily/{day.isoformat()}.md {marker}
+classified: local {confidence:.2f}
+---
+
+{text}
+""",
+        encoding="utf-8",
+    )
+
+    moc_path = Path(vault_path) / "MOC" / f"MOC-{category}.md"
+    if moc_path.exists():
+        content = moc_path.read_text(encoding="utf-8")
+        summary = " ".join(text.split())[:80]
+        link = f"- [[{path.stem}]] — {summary}"
+        if "## Recent\n" in content and path.stem not in content:
+            moc_path.write_text(
+                content.replace("## Recent\n", f"## Recent\n\n{link}\n", 1),
+                encoding="utf-8",
+            )
+    return path
@@ -0,0 +1,208 @@
+"""Token-budgeted prompt context.
+
+Required sections (role, rules, the user request) always go in. Optional
+context (session entries, reference sub-sections) is split into pieces
+that are ranked by recency and relevance to the request and trimmed to
+fit the token budget. When everything fits, sections are passed through
+unchanged so the static prompt prefix stays cacheable.
+"""
+
+import logging
+import re
+from dataclasses import dataclass, field
+
+from d_brain.services.prompts import PromptSection
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOKEN_BUDGET = 12000
+
+# Keyword matching uses word prefixes so Russian inflections still match
+STEM_LENGTH = 5
+MIN_KEYWORD_LENGTH = 4
+
+WORD_RE = re.compile(r"\w+")
+MARKDOWN_SECTION_RE = re.compile(r"^(?=## )", re.MULTILINE)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count: ~4 chars per token for ASCII, ~2 for Cyrillic etc."""
+    ascii_chars = sum(1 for ch in text if ch.isascii())
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars + 1) // 2
+
+
+def keywords(text: str) -> set[str]:
+    """Lowercased word stems used for relevance matching."""
+    return {
+        word[:STEM_LENGTH]
+        for word in WORD_RE.findall(text.lower())
+        if len(word) >= MIN_KEYWORD_LENGTH
+    }
+
+
+def split_markdown_sections(text: str) -> list[str]:
+    """Split a markdown document on level-2 headings (preamble first)."""
+    return [part.strip() for part in MARKDOWN_SECTION_RE.split(text) if part.strip()]
+
+
+@dataclass
+class _Optional:
+    section: PromptSection
+    pieces: list[str]
+    scores: list[float]
+    header: str
+    footer: str
+    separator: str
+    kept: list[bool] = field(default_factory=list)
+
+    def render(self) -> str:
+        body = self.separator.join(
+            piece for piece, keep in zip(self.pieces, self.kept, strict=True) if keep
+        )
+        if not body:
+            return ""
+        return "\n".join(part for part in (self.header, body, self.footer) if part)
+
+
+class ContextBuilder:
+    """Collects prompt sections and fits optional context into a budget."""
+
+    def __init__(self, request: str, budget: int = DEFAULT_TOKEN_BUDGET) -> None:
+        self.budget = budget
+        self._request_keywords = keywords(request)
+        self._parts: list[PromptSection | _Optional] = []
+
+    def require(self, section: PromptSection) -> None:
+        """Add a section that is always included in full."""
+        self._parts.append(section)
+
+    def optional(
+        self,
+        name: str,
+        pieces: list[str],
+        static: bool = False,
+        recency: bool = False,
+        lead_bonus: float = 0.0,
+        header: str = "",
+        footer: str = "",
+        separator: str = "\n\n",
+    ) -> None:
+        """Add a section whose pieces may be dropped to meet the budget.
+
+        Args:
+            name: Section name for the budget log
+            pieces: Units that are kept or dropped as a whole, in display order
+            static: Whether the full section is identical across requests
+            recency: Favor later pieces (e.g. newer session entries)
+            lead_bonus: Extra score for the first piece (e.g. a preamble)
+            header: Line shown above the kept pieces
+            footer: Line shown below the kept pieces
+            separator: Text between pieces
+        """
+        pieces = [piece for piece in pieces if piece.strip()]
+        scores = []
+        for i, piece in enumerate(pieces):
+            score = 1.0 + 2.0 * self._relevance(piece)
+            if recency:
+                score += (i + 1) / len(pieces)
+            if i == 0:
+                score += lead_bonus
+            scores.append(score)
+        full = separator.join(pieces)
+        text = ""
+        if full:
+            text = "\n".join(part for part in (header, full, footer) if part)
+        self._parts.append(
+            _Optional(
+                PromptSection(name, text, static),
+                pieces,
+                scores,
+                header,
+                footer,
+                separator,
+            )
+        )
+
+    def _relevance(self, text: str) -> float:
+        """Share of request keywords that occur in text (0..1)."""
+        if not self._request_keywords:
+            return 0.0
+        return len(self._request_keywords & keywords(text)) / len(
+            self._request_keywords
+        )
+
+    def build(self, label: str) -> list[PromptSection]:
+        """Fit optional context into the budget and return the sections.
+
+        Args:
+            label: Prompt kind for the budget log
+
+        Returns:
+            Sections in insertion order, optional ones possibly trimmed
+        """
+        required = sum(
+            estimate_tokens(part.text)
+            for part in self._parts
+            if isinstance(part, PromptSection)
+        )
+        optional = [part for part in self._parts if isinstance(part, _Optional)]
+        available = self.budget - required
+        wanted = sum(estimate_tokens(part.section.text) for part in optional)
+
+        if wanted <= available:
+            for part in optional:
+                part.kept = [True] * len(part.pieces)
+            sections = [self._section(part, trimmed=False) for part in self._parts]
+        else:
+            self._trim(optional, available)
+            sections = [self._section(part, trimmed=True) for part in self._parts]
+
+        self._log(label, sections, optional)
+        return sections
+
+    def _trim(self, optional: list[_Optional], available: int) -> None:
+        """Keep the highest-scoring pieces that fit into available tokens."""
+        candidates = []
+        for part in optional:
+            part.kept = [False] * len(part.pieces)
+            overhead = estimate_tokens(part.header) + estimate_tokens(part.footer)
+            for i, piece in enumerate(part.pieces):
+                tokens = estimate_tokens(piece)
+                candidates.append((part.scores[i], part, i, tokens, overhead))
+
+        used = 0
+        for _, part, i, tokens, overhead in sorted(
+            candidates, key=lambda c: c[0], reverse=True
+        ):
+            cost = tokens + (0 if any(part.kept) else overhead)
+            if used + cost <= available:
+                part.kept[i] = True
+                used += cost
+
+    @staticmethod
+    def _section(part: PromptSection | _Optional, trimmed: bool) -> PromptSection:
+        if isinstance(part, PromptSection):
+            return part
+        if not trimmed:
+            return part.section
+        # A trimmed section differs between requests, so it isn't static
+        return PromptSection(part.section.name, part.render(), static=False)
+
+    def _log(
+        self,
+        label: str,
+        sections: list[PromptSection],
+        optional: list[_Optional],
+    ) -> None:
+        pieces = {
+            part.section.name: f" ({sum(part.kept)}/{len(part.pieces)} pieces)"
+            for part in optional
+        }
+        breakdown = ", ".join(
+            f"{s.name} {estimate_tokens(s.text)}{pieces.get(s.name, '')}"
+            for s in sections
+        )
+        total = sum(estimate_tokens(s.text) for s in sections)
+        logger.info(
+            "%s context: %d/%d tokens: %s", label, total, self.budget, breakdown
+        )
@@ -0,0 +1,196 @@
+"""Machine-maintained digest of the vault for prompt context.
+
+vault/.cache/context-digest.md holds what Claude would otherwise read on
+every run: active goals, the latest thoughts per category, MOC headlines
+and open commitments (unchecked checkboxes). It is kept up to date
+incrementally: a manifest stores each source file's mtime, size and
+extracted lines, so only changed files are parsed again and the digest
+is rewritten only when something changed.
+"""
+
+import json
+import logging
+import os
+import re
+from pathlib import Path
+from typing import Any
+
+from d_brain.services.storage import HTML_COMMENT_RE
+
+logger = logging.getLogger(__name__)
+
+DIGEST_PATH = ".cache/context-digest.md"
+MANIFEST_PATH = ".cache/context-digest.json"
+
+# Source files, relative to the vault
+SOURCE_GLOBS = ("goals/*.md", "MEMORY.md", "MOC/*.md", "thoughts/*/*.md")
+# Folders whose unchecked items count as open commitments
+COMMITMENT_PREFIXES = ("goals/", "MEMORY.md", "thoughts/projects/", "thoughts/tasks/")
+
+THOUGHTS_PER_CATEGORY = 5
+MAX_GOAL_LINES = 15
+MAX_MOC_LINKS = 5
+MAX_COMMITMENTS = 20
+LINE_CHARS = 160
+
+FRONTMATTER_RE = re.compile(r"\A---\n.*?\n---\n", re.DOTALL)
+OPEN_ITEM_RE = re.compile(r"^\s*[-*] \[ \] (.+)$")
+LIST_ITEM_RE = re.compile(r"^\s*(?:[-*]|\d+\.) (?!\[x\])(.+)$", re.IGNORECASE)
+# Template lines like "Q1: [milestone]" or "- [ ] Action 1"
+PLACEHOLDER_RE = re.compile(
+    r"(?<!\[)\[(?![ xX]\])[^\[\]]+\](?!\])|YYYY"
+    r"|^(?:[-*] (?:\[ \] )?)?(?:Action|Milestone|Metric|Task|Priority) \d+\b"
+)
+
+
+def _clip(line: str) -> str:
+    line = " ".join(line.split()).removesuffix("---")
+    return line if len(line) <= LINE_CHARS else line[:LINE_CHARS].rstrip() + "…"
+
+
+def _clean(text: str) -> list[str]:
+    """Content lines without frontmatter, comments and template placeholders."""
+    text = HTML_COMMENT_RE.sub("", FRONTMATTER_RE.sub("", text))
+    return [
+        line.rstrip()
+        for line in text.splitlines()
+        if line.strip() and not PLACEHOLDER_RE.search(line.strip())
+    ]
+
+
+def _extract(rel: str, text: str) -> dict[str, Any]:
+    """Digest lines contributed by one source file."""
+    lines = _clean(text)
+    fragment: dict[str, Any] = {}
+
+    if rel.startswith(COMMITMENT_PREFIXES):
+        fragment["open"] = [
+            _clip(m.group(1)) for line in lines if (m := OPEN_ITEM_RE.match(line))
+        ]
+
+    if rel.startswith("goals/"):
+        title = next((ln.lstrip("# ") for ln in lines if ln.startswith("# ")), rel)
+        # Goal statements only: no cross-links or review questions
+        items = [
+            _clip(m.group(1))
+            for line in lines
+            if (m := LIST_ITEM_RE.match(line))
+            and not m.group(1).startswith("[[")
+            and not m.group(1).rstrip().endswith("?")
+        ]
+        fragment["goals"] = [title, *items[:MAX_GOAL_LINES]]
+    elif rel.startswith("MOC/"):
+        headings = [ln.lstrip("# ") for ln in lines if ln.startswith("## ")]
+        links = [_clip(ln.strip("-* ")) for ln in lines if "[[" in ln]
+        fragment["moc"] = [", ".join(headings), *links[:MAX_MOC_LINKS]]
+    elif rel.startswith("thoughts/"):
+        body = next((ln for ln in lines if not ln.startswith("#")), "")
+        fragment["thought"] = _clip(f"{Path(rel).stem}: {body}")
+    return fragment
+
+
+class VaultDigest:
+    """Incrementally maintained vault/.cache/context-digest.md."""
+
+    def __init__(self, vault_path: Path) -> None:
+        self.vault_path = Path(vault_path)
+        self.digest_path = self.vault_path / DIGEST_PATH
+        self.manifest_path = self.vault_path / MANIFEST_PATH
+
+    def _load_manifest(self) -> dict[str, Any]:
+        try:
+            data = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def _write(self, path: Path, text: str) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(text, encoding="utf-8")
+        os.replace(tmp_path, path)
+
+    def refresh(self) -> str:
+        """Bring the digest up to date and return it.
+
+        Returns:
+            Digest markdown ("" if the vault has none of the sources)
+        """
+        manifest = self._load_manifest()
+        current: dict[str, Any] = {}
+        changed = 0
+        for pattern in SOURCE_GLOBS:
+            for path in sorted(self.vault_path.glob(pattern)):
+                rel = path.relative_to(self.vault_path).as_posix()
+                stat = path.stat()
+                stamp = [stat.st_mtime_ns, stat.st_size]
+                cached = manifest.get(rel)
+                if cached and cached["stamp"] == stamp:
+                    current[rel] = cached
+                    continue
+                try:
+                    text = path.read_text(encoding="utf-8")
+                except (OSError, UnicodeDecodeError):
+                    continue
+                current[rel] = {"stamp": stamp, "fragment": _extract(rel, text)}
+                changed += 1
+
+        removed = len(manifest.keys() - current.keys())
+        if not changed and not removed and self.digest_path.exists():
+            return self.digest_path.read_text(encoding="utf-8")
+
+        digest = self._render(current)
+        self._write(self.digest_path, digest)
+        self._write(self.manifest_path, json.dumps(current, ensure_ascii=False))
+        logger.info(
+            "Context digest updated: %d file(s) changed, %d removed, %d chars",
+            changed,
+            removed,
+            len(digest),
+        )
+        return digest
+
+    def _render(self, files: dict[str, Any]) -> str:
+        goals: list[str] = []
+        mocs: list[str] = []
+        # category -> (mtime_ns, path, line), newest picked first
+        thoughts: dict[str, list[tuple[int, str, str]]] = {}
+        commitments: list[str] = []
+
+        for rel, entry in files.items():
+            fragment = entry["fragment"]
+            if "goals" in fragment:
+                title, *items = fragment["goals"]
+                goals.append(f"### {title}")
+                goals.extend(f"- {item}" for item in dict.fromkeys(items))
+            if "moc" in fragment:
+                headings, *links = fragment["moc"]
+                mocs.append(f"- {Path(rel).stem}: {headings or '-'}")
+                mocs.extend(f"  - {link}" for link in links)
+            if "thought" in fragment:
+                category = rel.split("/")[1]
+                thoughts.setdefault(category, []).append(
+                    (entry["stamp"][0], rel, fragment["thought"])
+                )
+            commitments.extend(f"- {item}" for item in fragment.get("open", []))
+
+        commitments = list(dict.fromkeys(commitments))
+        parts = []
+        if goals:
+            parts.append("## Активные цели\n" + "\n".join(goals))
+        if commitments:
+            parts.append(
+                "## Открытые обязательства\n" + "\n".join(commitments[:MAX_COMMITMENTS])
+            )
+        if thoughts:
+            lines = []
+            for category, notes in sorted(thoughts.items()):
+                latest = sorted(notes, reverse=True)[:THOUGHTS_PER_CATEGORY]
+                lines.append(f"### {category}")
+                lines.extend(f"- {line}" for _, _, line in latest)
+            parts.append("## Последние заметки\n" + "\n".join(lines))
+        if mocs:
+            parts.append("## MOC\n" + "\n".join(mocs))
+        if not parts:
+            return ""
+        return "# Vault digest\n\n" + "\n\n".join(parts) + "\n"
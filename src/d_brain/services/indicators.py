@@ -0,0 +1,184 @@
+"""Technical indicators for the market digest, computed locally with NumPy.
+
+All tracked symbols are aligned on one calendar (gaps forward-filled) into
+a days × symbols close matrix, and every indicator is computed over the
+whole matrix at once: multi-horizon returns, annualized volatility, MA20/
+MA50 crossovers, strength relative to the sector and correlation of daily
+returns with the dollar index and gold. Claude gets these as ready-made
+signals instead of estimating trends from two closes.
+"""
+
+import logging
+from dataclasses import dataclass
+from datetime import date
+
+import numpy as np
+
+from d_brain.services.prices import PriceStore
+
+logger = logging.getLogger(__name__)
+
+# Horizons in trading days
+HORIZONS = {"1d": 1, "5d": 5, "1m": 21, "3m": 63}
+HISTORY_BARS = 260  # a year of bars, enough for every window below
+VOLATILITY_WINDOW = 21
+CORRELATION_WINDOW = 63
+MA_FAST = 20
+MA_SLOW = 50
+CROSS_LOOKBACK = 5  # a crossover within this many days is reported
+TRADING_DAYS = 252
+
+# Momentum score: weighted returns over volatility
+SCORE_WEIGHTS = {"5d": 0.2, "1m": 0.3, "3m": 0.5}
+
+
+@dataclass
+class AssetSignals:
+    """Precomputed indicators of one asset (percent values, None = no data)."""
+
+    key: str
+    returns: dict[str, float | None]
+    volatility: float | None
+    trend: str  # "up" (MA20 > MA50), "down" or "" without enough history
+    crossover: str  # "golden" / "death" within CROSS_LOOKBACK days, else ""
+    relative_strength: float | None  # 1m return minus the sector median
+    corr_dxy: float | None
+    corr_gold: float | None
+    score: float | None
+    rank: int = 0  # 1 = strongest momentum
+
+
+def _matrix(store: PriceStore, symbols: list[str]) -> tuple[list[date], np.ndarray]:
+    """Days × symbols close matrix, forward-filled, NaN before the first bar."""
+    history = {s: store.closes(s, HISTORY_BARS) for s in symbols}
+    days = sorted({day for rows in history.values() for day, _ in rows})
+    index = {day: row for row, day in enumerate(days)}
+    closes = np.full((len(days), len(symbols)), np.nan)
+    for col, symbol in enumerate(symbols):
+        for day, close in history[symbol]:
+            closes[index[day], col] = close
+
+    # Forward-fill: take each cell from the last row that has a value
+    rows = np.where(np.isnan(closes), 0, np.arange(len(days))[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    return days, closes[rows, np.arange(len(symbols))]
+
+
+def _moving_average(closes: np.ndarray, window: int) -> np.ndarray:
+    """Trailing simple moving average per column (NaN until window bars)."""
+    result = np.full(closes.shape, np.nan)
+    if len(closes) < window:
+        return result
+    sums = np.cumsum(np.vstack([np.zeros(closes.shape[1]), closes]), axis=0)
+    result[window - 1 :] = (sums[window:] - sums[:-window]) / window
+    return result
+
+
+def _correlation(returns: np.ndarray, ref: int) -> np.ndarray:
+    """Pearson correlation of every column with column ref."""
+    valid = ~np.isnan(returns).any(axis=0)
+    window = np.where(np.isnan(returns), 0.0, returns)
+    centered = window - window.mean(axis=0)
+    norms = np.sqrt((centered**2).sum(axis=0))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        corr = np.asarray(centered.T @ centered[:, ref] / (norms * norms[ref]))
+    corr[~valid | ~valid[ref] | (norms == 0)] = np.nan
+    return corr
+
+
+def _value(x: float) -> float | None:
+    return None if np.isnan(x) else round(float(x), 2)
+
+
+def compute_signals(
+    store: PriceStore,
+    assets: dict[str, dict[str, str]],
+    dxy_symbol: str,
+    gold_symbol: str,
+) -> dict[str, AssetSignals]:
+    """Compute indicators for all assets from the stored price history.
+
+    Args:
+        store: Price store with daily closes
+        assets: Tracked assets (key → symbol, sector, ...), see market.ASSETS
+        dxy_symbol: Dollar index symbol (stored, but not necessarily tracked)
+        gold_symbol: Gold symbol
+
+    Returns:
+        Signals per asset key, ranked by momentum score
+    """
+    keys = list(assets)
+    symbols = [assets[k]["symbol"] for k in keys]
+    columns = list(dict.fromkeys([*symbols, dxy_symbol, gold_symbol]))
+    days, closes = _matrix(store, columns)
+    if len(days) < 2:
+        return {}
+    tracked = [columns.index(s) for s in symbols]
+    last = closes[-1]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        returns = {
+            name: (last / closes[-1 - h] - 1) * 100
+            if len(days) > h
+            else np.full(len(columns), np.nan)
+            for name, h in HORIZONS.items()
+        }
+        daily = np.diff(np.log(closes), axis=0)
+
+    recent = daily[-VOLATILITY_WINDOW:]
+    volatility = np.where(
+        np.isnan(recent).any(axis=0) | (len(recent) < VOLATILITY_WINDOW),
+        np.nan,
+        np.std(recent, axis=0, ddof=1) * np.sqrt(TRADING_DAYS) * 100,
+    )
+
+    fast = _moving_average(closes, MA_FAST)
+    slow = _moving_average(closes, MA_SLOW)
+    above = fast > slow  # False where either MA is NaN
+    known = ~np.isnan(slow[-1])
+    before = max(0, len(days) - 1 - CROSS_LOOKBACK)
+    known_before = ~np.isnan(slow[before])
+    crossed = known & known_before & (above[-1] != above[before])
+
+    correlation_window = daily[-CORRELATION_WINDOW:]
+    corr_dxy = _correlation(correlation_window, columns.index(dxy_symbol))
+    corr_gold = _correlation(correlation_window, columns.index(gold_symbol))
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        weighted = sum(w * returns[name] for name, w in SCORE_WEIGHTS.items())
+        score = weighted / volatility
+
+    # Relative strength: 1m return against the median of the asset's sector
+    month = returns["1m"][tracked]
+    sectors = np.array([assets[k]["sector"] for k in keys])
+    relative = np.full(len(keys), np.nan)
+    for sector in np.unique(sectors):
+        members = sectors == sector
+        if members.sum() > 1 and not np.isnan(month[members]).all():
+            relative[members] = month[members] - np.nanmedian(month[members])
+
+    signals: dict[str, AssetSignals] = {}
+    for i, (key, col) in enumerate(zip(keys, tracked, strict=True)):
+        trend = ("up" if above[-1, col] else "down") if known[col] else ""
+        crossover = ("golden" if above[-1, col] else "death") if crossed[col] else ""
+        signals[key] = AssetSignals(
+            key=key,
+            returns={name: _value(r[col]) for name, r in returns.items()},
+            volatility=_value(volatility[col]),
+            trend=trend,
+            crossover=crossover,
+            relative_strength=_value(relative[i]),
+            corr_dxy=_value(corr_dxy[col]) if columns[col] != dxy_symbol else None,
+            corr_gold=_value(corr_gold[col]) if columns[col] != gold_symbol else None,
+            score=_value(score[col]),
+        )
+
+    ranked = sorted(
+        (s for s in signals.values() if s.score is not None),
+        key=lambda s: s.score or 0.0,
+        reverse=True,
+    )
+    for rank, item in enumerate(ranked, start=1):
+        item.rank = rank
+    logger.info("Market signals: %d assets over %d days", len(signals), len(days))
+    return signals
@@ -0,0 +1,328 @@
+"""Local fast path for read-only /do requests.
+
+Requests like "сколько записей сегодня", "покажи цели на неделю" or "что я
+записал утром" are answered from vault files and the session log in
+milliseconds instead of a full Claude run. Anything that doesn't match a
+known intent, or isn't a plain question, goes to Claude.
+"""
+
+import html
+import logging
+import re
+from collections import Counter
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from d_brain.services.context import keywords
+from d_brain.services.session import SessionStore
+from d_brain.services.storage import HTML_COMMENT_RE, VaultStorage, split_entries
+
+logger = logging.getLogger(__name__)
+
+# Requests answered per intent; CLAUDE counts the ones sent to Claude
+CLAUDE = "claude"
+_stats: Counter[str] = Counter()
+
+# Longer requests usually carry details only Claude can act on
+MAX_WORDS = 8
+MAX_REPLY_CHARS = 3500
+
+# Words a plain question or read request opens with. Only such requests
+# (or ones matching a local intent) count as read-only; anything else may
+# ask for a change, whatever verb it uses.
+READ_LEADS = {
+    "что",
+    "чем",
+    "какие",
+    "какой",
+    "какая",
+    "какое",
+    "каких",
+    "сколько",
+    "когда",
+    "где",
+    "кто",
+    "есть",
+    "были",
+    "покажи",
+    "перечисли",
+    "расскажи",
+    "подскажи",
+    "найди",
+    "выведи",
+}
+
+# Words that join a second request ("покажи задачи и перенеси их")
+CLAUSE_JOINERS = {"и", "а", "потом", "затем", "также"}
+
+# Stems of change verbs that rule a request out even after a read lead
+WRITE_STEMS = {
+    "добав",
+    "измен",
+    "обнов",
+    "поста",
+    "удали",
+    "удаля",
+    "перен",
+    "созда",
+    "запиш",
+    "отмет",
+    "сдела",
+    "закро",
+    "выпол",
+    "напом",
+    "убери",
+    "убрат",
+    "перем",
+    "отлож",
+    "помен",
+    "запла",
+    "завер",
+    "внеси",
+    "внест",
+    "переи",
+}
+
+ENTRY_TYPE_RE = re.compile(r"^## \d{1,2}:\d{2} \[(\w+)", re.MULTILINE)
+
+GOAL_FILES = {
+    "недел": ("3-weekly.md", "Цели на неделю"),
+    "месяц": ("2-monthly.md", "Цели на месяц"),
+    "год": ("1-yearly-*.md", "Цели на год"),
+}
+
+# Days the entry count can be given for, by how many days back they are
+COUNT_DAYS = {"сегодня": 0, "вчера": 1}
+# Days and periods other than today ("вчера", "за неделю", "в марте",
+# "3 дня назад"); handlers leave what they can't look up to Claude
+OTHER_DAYS_RE = re.compile(
+    r"\b(вчера|позавчера|завтра|недел|месяц|год|лет\b|дн[еияй]|день|сутк"
+    r"|выходн|понедельн|вторн|сред[аеуы]\b|четверг|пятниц|суббот|воскресен"
+    r"|январ|феврал|март|апрел|ма[йяе]\b|июн|июл|август|сентябр|октябр|ноябр"
+    r"|декабр|прошл|последн|прошедш|\d)"
+)
+DAY_PART_RE = re.compile(r"\b(утром|днем|вечером|ночью)\b")
+# A topic narrows the question ("записи про работу", "о встрече"), which
+# the local handlers don't filter by
+TOPIC_RE = re.compile(r"\b(про|о|об|обо|по|насчет|касательно|связан\w*|тег\w*)\b")
+
+# Part of the day -> (first hour, last hour + 1)
+DAY_PARTS = {
+    "утром": (5, 12),
+    "днем": (12, 17),
+    "вечером": (17, 24),
+    "ночью": (0, 5),
+    "сегодня": (0, 24),
+}
+
+
+def normalize(text: str) -> str:
+    """Lowercase, fold ё and collapse punctuation and whitespace."""
+    text = text.lower().replace("ё", "е")
+    return " ".join(re.sub(r"[^\w\s-]", " ", text).split())
+
+
+def is_read_only(prompt: str) -> bool:
+    """Whether a request is a known read-only question.
+
+    A whitelist: the request has to be a single clause that opens with a
+    question word or a read verb (READ_LEADS) or matches a local intent,
+    and must not contain a known change verb.
+    """
+    text = normalize(prompt)
+    words = text.split()
+    stems = keywords(text)
+    if not words or stems & WRITE_STEMS or CLAUSE_JOINERS & set(words[1:]):
+        return False
+    return words[0] in READ_LEADS or any(
+        intent.matches(text, stems) for intent in INTENTS
+    )
+
+
+@dataclass
+class IntentContext:
+    """What an intent handler can read."""
+
+    vault_path: Path
+    user_id: int
+    today: date
+
+
+# Returns None when the request is outside what the handler can answer
+IntentHandler = Callable[[IntentContext, str], str | None]
+
+
+@dataclass
+class Intent:
+    """A read-only request the bot can answer without Claude.
+
+    Matches when any regex in `patterns` matches the normalized request, or
+    when all stems of any set in `keywords` occur in it.
+    """
+
+    name: str
+    handler: IntentHandler
+    patterns: list[re.Pattern[str]] = field(default_factory=list)
+    keywords: list[set[str]] = field(default_factory=list)
+
+    def matches(self, text: str, stems: set[str]) -> bool:
+        return any(p.search(text) for p in self.patterns) or any(
+            required <= stems for required in self.keywords
+        )
+
+
+def _count_entries(ctx: IntentContext, text: str) -> str | None:
+    words = text.split()
+    named = [back for word, back in COUNT_DAYS.items() if word in words]
+    rest = " ".join(word for word in words if word not in COUNT_DAYS)
+    if (
+        len(named) > 1
+        or OTHER_DAYS_RE.search(rest)
+        or DAY_PART_RE.search(text)
+        or TOPIC_RE.search(text)
+    ):
+        return None
+    day = ctx.today - timedelta(days=named[0] if named else 0)
+    content = VaultStorage(ctx.vault_path).read_daily(day)
+    entries = split_entries(content)
+    if not entries:
+        return f"📅 <b>{day}</b>\n\nЗаписей нет."
+
+    types = Counter(m.group(1) for m in ENTRY_TYPE_RE.finditer(content))
+    return (
+        f"📅 <b>{day}</b>\n\n"
+        f"Всего записей: <b>{len(entries)}</b>\n"
+        f"- 🎤 Голосовых: {types['voice']}\n"
+        f"- 💬 Текстовых: {types['text']}\n"
+        f"- 📷 Фото: {types['photo']}\n"
+        f"- ↩️ Пересланных: {types['forward']}"
+    )
+
+
+def _show_goals(ctx: IntentContext, text: str) -> str:
+    pattern, title = GOAL_FILES["недел"]
+    for stem, goal in GOAL_FILES.items():
+        if re.search(rf"\b{stem}", text):
+            pattern, title = goal
+            break
+
+    goals_dir = ctx.vault_path / "goals"
+    files = sorted(goals_dir.glob(pattern)) if goals_dir.exists() else []
+    if not files:
+        return f"🎯 <b>{title}</b>\n\nФайл целей не найден."
+
+    content = HTML_COMMENT_RE.sub("", files[-1].read_text(encoding="utf-8"))
+    lines = []
+    for line in content.strip().splitlines():
+        if line.startswith("#"):
+            lines.append(f"<b>{html.escape(line.lstrip('#').strip())}</b>")
+        else:
+            lines.append(html.escape(line))
+    body = "\n".join(lines)
+    if len(body) > MAX_REPLY_CHARS:
+        body = body[:MAX_REPLY_CHARS].rsplit("\n", 1)[0] + "\n…"
+    return f"🎯 <b>{title}</b>\n\n{body}"
+
+
+def _session_notes(ctx: IntentContext, text: str) -> str | None:
+    # The session log only holds today, unfiltered by topic
+    parts = DAY_PART_RE.findall(text)
+    if len(parts) > 1 or OTHER_DAYS_RE.search(text) or TOPIC_RE.search(text):
+        return None
+    part = parts[0] if parts else "сегодня"
+    start, end = DAY_PARTS[part]
+    entries = SessionStore(ctx.vault_path).get_today(ctx.user_id)
+
+    lines = []
+    for entry in entries:
+        ts = entry.get("ts", "")
+        note = entry.get("text", "")
+        if not note or len(ts) < 16 or not start <= int(ts[11:13]) < end:
+            continue
+        lines.append(
+            f"<b>{ts[11:16]}</b> [{html.escape(entry.get('type', ''))}] "
+            f"{html.escape(note[:200])}"
+        )
+    if not lines:
+        return f"📝 Записей {part} нет."
+    body = "\n".join(lines)
+    if len(body) > MAX_REPLY_CHARS:
+        body = "…\n" + body[-MAX_REPLY_CHARS:].split("\n", 1)[-1]
+    return f"📝 <b>Записи {part}</b>\n\n{body}"
+
+
+INTENTS = [
+    Intent(
+        "count_entries",
+        _count_entries,
+        patterns=[re.compile(r"\bсколько\b.*\bзапис")],
+        keywords=[{"сколь", "запис"}],
+    ),
+    Intent(
+        "show_goals",
+        _show_goals,
+        patterns=[re.compile(r"\bцел[иье]\w*\b.*\b(недел|месяц|год)")],
+        keywords=[{"цели", "недел"}, {"покаж", "цели"}],
+    ),
+    Intent(
+        "session_notes",
+        _session_notes,
+        patterns=[
+            re.compile(
+                r"\bчто\b.*\b(записал|писал|надиктовал|сохранил)\w*\b.*"
+                r"\b(утром|днем|вечером|ночью|сегодня)\b"
+            ),
+            re.compile(
+                r"\bчто\b.*\b(утром|днем|вечером|ночью|сегодня)\b.*"
+                r"\b(записал|писал|надиктовал|сохранил)\w*\b"
+            ),
+        ],
+    ),
+]
+
+
+class IntentRouter:
+    """Answers known read-only /do intents locally."""
+
+    def __init__(self, vault_path: Path, intents: list[Intent] | None = None) -> None:
+        self.vault_path = Path(vault_path)
+        self.intents = INTENTS if intents is None else intents
+
+    def route(self, prompt: str, user_id: int = 0) -> str | None:
+        """Answer the request locally if it matches a read-only intent.
+
+        Args:
+            prompt: User's /do request
+            user_id: Telegram user ID for session lookups
+
+        Returns:
+            Telegram HTML reply, or None to fall back to Claude
+        """
+        text = normalize(prompt)
+        stems = keywords(text)
+        if len(text.split()) <= MAX_WORDS and is_read_only(text):
+            ctx = IntentContext(self.vault_path, user_id, datetime.now().date())
+            for intent in self.intents:
+                if not intent.matches(text, stems):
+                    continue
+                try:
+                    reply = intent.handler(ctx, text)
+                except Exception:
+                    logger.exception("Intent %s failed, using Claude", intent.name)
+                    break
+                if reply is None:
+                    logger.info("Intent %s can't answer, using Claude", intent.name)
+                    break
+                _stats[intent.name] += 1
+                logger.info("/do answered locally by intent %s", intent.name)
+                return reply
+
+        _stats[CLAUDE] += 1
+        return None
+
+
+def routing_stats() -> dict[str, int]:
+    """Requests answered per intent since start (CLAUDE: sent to Claude)."""
+    return dict(_stats)
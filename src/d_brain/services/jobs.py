@@ -0,0 +1,341 @@
+"""Durable job queue for long-running Claude jobs.
+
+Jobs are stored in SQLite (WAL mode) so that a bot restart doesn't drop
+queued requests: on startup, interrupted jobs of resumable kinds (/process
+and /backfill, guarded by the daily watermark) are put back to pending and
+picked up again; other interrupted jobs are failed, since running them
+twice could repeat their side effects.
+
+Each job belongs to a class (interactive, batch, scheduled) that sets its
+priority, so a quick /do doesn't queue behind a weekly digest.
+"""
+
+import json
+import logging
+import sqlite3
+import time
+from collections.abc import Collection
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+SCHEDULED = "scheduled"
+
+# Lower runs first
+CLASS_PRIORITY = {INTERACTIVE: 0, BATCH: 1, SCHEDULED: 2}
+
+# A job interrupted this many times is failed instead of resumed again
+MAX_ATTEMPTS = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    args TEXT NOT NULL DEFAULT '{}',
+    chat_id INTEGER NOT NULL,
+    message_id INTEGER NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    result TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, id);
+"""
+
+# Columns added after the first schema version: name -> definition
+MIGRATIONS = {
+    "job_class": "TEXT NOT NULL DEFAULT 'batch'",
+    "priority": "INTEGER NOT NULL DEFAULT 1",
+}
+
+
+@dataclass
+class Job:
+    """A queued Claude job and where to deliver its result."""
+
+    id: int
+    kind: str
+    args: dict[str, Any]
+    chat_id: int
+    message_id: int
+    state: str
+    result: dict[str, Any] | None
+    attempts: int
+    created_at: float
+    started_at: float | None
+    finished_at: float | None
+    job_class: str = BATCH
+    priority: int = CLASS_PRIORITY[BATCH]
+
+    @classmethod
+    def from_row(cls, row: sqlite3.Row) -> "Job":
+        return cls(
+            id=row["id"],
+            kind=row["kind"],
+            args=json.loads(row["args"]),
+            chat_id=row["chat_id"],
+            message_id=row["message_id"],
+            state=row["state"],
+            result=json.loads(row["result"]) if row["result"] else None,
+            attempts=row["attempts"],
+            created_at=row["created_at"],
+            started_at=row["started_at"],
+            finished_at=row["finished_at"],
+            job_class=row["job_class"],
+            priority=row["priority"],
+        )
+
+
+@dataclass
+class ClassStats:
+    """Queue depth and wait times for one job class."""
+
+    pending: int = 0
+    oldest_wait: float = 0.0  # seconds the oldest pending job has waited
+    avg_wait: float = 0.0  # mean queue wait of jobs started recently
+    started: int = 0  # jobs started in the stats window
+
+
+class JobQueue:
+    """SQLite-backed persistent job queue."""
+
+    def __init__(self, db_path: Path) -> None:
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(
+            self.db_path,
+            isolation_level=None,  # explicit transactions only
+            check_same_thread=False,
+        )
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self) -> None:
+        """Add columns missing from databases created by older versions."""
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for name, definition in MIGRATIONS.items():
+            if name not in columns:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {definition}")
+
+    def close(self) -> None:
+        """Close the database connection."""
+        self._conn.close()
+
+    def enqueue(
+        self,
+        kind: str,
+        args: dict[str, Any],
+        chat_id: int,
+        message_id: int,
+        job_class: str = BATCH,
+    ) -> Job:
+        """Add a pending job.
+
+        Args:
+            kind: Job kind (process, weekly, market, do)
+            args: JSON-serializable job arguments
+            chat_id: Chat holding the status message
+            message_id: Status message to deliver progress and result to
+            job_class: interactive, batch or scheduled
+
+        Returns:
+            The stored job
+        """
+        cursor = self._conn.execute(
+            "INSERT INTO jobs (kind, args, chat_id, message_id, created_at, "
+            "job_class, priority) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                kind,
+                json.dumps(args, ensure_ascii=False),
+                chat_id,
+                message_id,
+                time.time(),
+                job_class,
+                CLASS_PRIORITY.get(job_class, CLASS_PRIORITY[BATCH]),
+            ),
+        )
+        job = self.get(int(cursor.lastrowid or 0))
+        assert job is not None
+        logger.info("Job %d (%s) enqueued", job.id, kind)
+        return job
+
+    def get(self, job_id: int) -> Job | None:
+        """Get a job by id."""
+        row = self._conn.execute(
+            "SELECT * FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        return Job.from_row(row) if row else None
+
+    def claim(
+        self,
+        job_classes: Collection[str],
+        by_priority: bool = True,
+    ) -> Job | None:
+        """Atomically move the next pending job to running and return it.
+
+        Args:
+            job_classes: Classes that currently have a free slot
+            by_priority: Order by class priority first (otherwise pure FIFO)
+
+        Returns:
+            The claimed job, or None if nothing eligible is pending
+        """
+        if not job_classes:
+            return None
+        placeholders = ", ".join("?" for _ in job_classes)
+        order = "priority, id" if by_priority else "id"
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self._conn.execute(
+                "SELECT id FROM jobs WHERE state = ? "
+                f"AND job_class IN ({placeholders}) ORDER BY {order} LIMIT 1",
+                (PENDING, *job_classes),
+            ).fetchone()
+            if row is None:
+                self._conn.execute("COMMIT")
+                return None
+            self._conn.execute(
+                "UPDATE jobs SET state = ?, started_at = ?, attempts = attempts + 1 "
+                "WHERE id = ?",
+                (RUNNING, time.time(), row["id"]),
+            )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        return self.get(row["id"])
+
+    def complete(self, job_id: int, result: dict[str, Any]) -> None:
+        """Store a job's result, marking it done, failed or cancelled."""
+        if result.get("cancelled"):
+            state = CANCELLED
+        elif "error" in result:
+            state = FAILED
+        else:
+            state = DONE
+        self._conn.execute(
+            "UPDATE jobs SET state = ?, result = ?, finished_at = ? WHERE id = ?",
+            (state, json.dumps(result, ensure_ascii=False), time.time(), job_id),
+        )
+
+    def cancel_pending(self, job_id: int) -> bool:
+        """Cancel a job that hasn't started yet.
+
+        Returns:
+            True if the job was pending and is now cancelled
+        """
+        cursor = self._conn.execute(
+            "UPDATE jobs SET state = ?, result = ?, finished_at = ? "
+            "WHERE id = ? AND state = ?",
+            (
+                CANCELLED,
+                json.dumps({"cancelled": True, "processed_entries": 0}),
+                time.time(),
+                job_id,
+                PENDING,
+            ),
+        )
+        return cursor.rowcount > 0
+
+    def active_jobs(self, chat_id: int | None = None) -> list[Job]:
+        """Pending and running jobs, newest first.
+
+        Args:
+            chat_id: Only jobs delivering to this chat (all chats if None)
+        """
+        query = "SELECT * FROM jobs WHERE state IN (?, ?)"
+        params: list[Any] = [PENDING, RUNNING]
+        if chat_id is not None:
+            query += " AND chat_id = ?"
+            params.append(chat_id)
+        rows = self._conn.execute(query + " ORDER BY id DESC", params).fetchall()
+        return [Job.from_row(row) for row in rows]
+
+    def requeue_interrupted(self, resumable: Collection[str]) -> tuple[int, list[Job]]:
+        """Deal with jobs left running by a previous process.
+
+        Jobs of resumable kinds (safe to run twice, e.g. guarded by the
+        daily watermark) go back to pending; other interrupted jobs, and
+        jobs interrupted MAX_ATTEMPTS times, are failed.
+
+        Args:
+            resumable: Job kinds that may be resumed
+
+        Returns:
+            (number of jobs resumed, jobs failed instead, with their result)
+        """
+        placeholders = ", ".join("?" for _ in resumable)
+        not_resumable = f"kind NOT IN ({placeholders})" if resumable else "1"
+        interrupted = [
+            Job.from_row(row)
+            for row in self._conn.execute(
+                f"SELECT * FROM jobs WHERE state = ? "
+                f"AND ({not_resumable} OR attempts >= ?)",
+                (RUNNING, *resumable, MAX_ATTEMPTS),
+            )
+        ]
+        for job in interrupted:
+            error = (
+                "Job interrupted too many times"
+                if job.kind in resumable
+                else "Прервано перезапуском бота, запрос мог выполниться "
+                "частично — проверьте результат и повторите при необходимости"
+            )
+            job.result = {"error": error, "processed_entries": 0}
+            self.complete(job.id, job.result)
+        cursor = self._conn.execute(
+            "UPDATE jobs SET state = ?, started_at = NULL WHERE state = ?",
+            (PENDING, RUNNING),
+        )
+        return cursor.rowcount, interrupted
+
+    def pending_count(self) -> int:
+        """Number of jobs waiting to run."""
+        row = self._conn.execute(
+            "SELECT COUNT(*) FROM jobs WHERE state = ?", (PENDING,)
+        ).fetchone()
+        return int(row[0])
+
+    def stats(self, window: float = 86400) -> dict[str, ClassStats]:
+        """Queue depth and wait times per job class.
+
+        Args:
+            window: Seconds of history used for the average wait
+
+        Returns:
+            Dict of job class to its stats
+        """
+        now = time.time()
+        stats = {job_class: ClassStats() for job_class in CLASS_PRIORITY}
+        for row in self._conn.execute(
+            "SELECT job_class, COUNT(*), MIN(created_at) FROM jobs "
+            "WHERE state = ? GROUP BY job_class",
+            (PENDING,),
+        ):
+            entry = stats.setdefault(row[0], ClassStats())
+            entry.pending = row[1]
+            entry.oldest_wait = now - row[2]
+        for row in self._conn.execute(
+            "SELECT job_class, COUNT(*), AVG(started_at - created_at) FROM jobs "
+            "WHERE started_at >= ? GROUP BY job_class",
+            (now - window,),
+        ):
+            entry = stats.setdefault(row[0], ClassStats())
+            entry.started = row[1]
+            entry.avg_wait = row[2] or 0.0
+        return stats
@@ -0,0 +1,167 @@
+"""Append-only ledger of Claude runs.
+
+Every run records its wall time, time to first output, token usage, cost,
+MCP tool calls and how it ended, as one JSON line in
+vault/.cache/runs.jsonl. The history feeds /perf and per-job-type
+adaptive timeouts.
+"""
+
+import json
+import logging
+import math
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+OK = "ok"
+ERROR = "error"
+TIMEOUT = "timeout"
+CANCELLED = "cancelled"
+
+# Adaptive timeout = p95 of finished and timed-out runs x factor, within
+# these bounds
+ADAPTIVE_FACTOR = 2.0
+ADAPTIVE_MIN_SAMPLES = 5
+ADAPTIVE_WINDOW_DAYS = 30
+MIN_TIMEOUT = 120.0
+MAX_TIMEOUT = 3600.0
+
+
+@dataclass
+class RunRecord:
+    """Accounting for one Claude run."""
+
+    job: str
+    status: str
+    wall: float  # seconds from start to exit
+    ttfo: float | None = None  # seconds to the first streamed output
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_read_tokens: int = 0
+    cache_creation_tokens: int = 0
+    cost_usd: float = 0.0
+    tool_calls: int = 0
+    turns: int = 0
+    pooled: bool = False
+    error: str = ""
+    ts: float = field(default_factory=time.time)
+
+
+@dataclass
+class JobPerf:
+    """Percentiles and totals for one job type."""
+
+    runs: int = 0
+    failures: int = 0
+    wall_p50: float = 0.0
+    wall_p95: float = 0.0
+    ttfo_p50: float = 0.0
+    ttfo_p95: float = 0.0
+    avg_input_tokens: float = 0.0
+    avg_output_tokens: float = 0.0
+    cache_hit_ratio: float = 0.0  # cache reads / all input tokens
+    avg_tool_calls: float = 0.0
+    cost_usd: float = 0.0
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile (0 for no values)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class RunLedger:
+    """JSONL ledger of Claude runs."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+
+    def append(self, record: RunRecord) -> None:
+        """Append a run record."""
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("a", encoding="utf-8") as f:
+                f.write(json.dumps(asdict(record), ensure_ascii=False) + "\n")
+        except OSError as e:
+            logger.warning("Failed to write run ledger: %s", e)
+
+    def records(self, days: float = 7) -> list[RunRecord]:
+        """Run records from the last `days` days, oldest first."""
+        if not self.path.exists():
+            return []
+        cutoff = time.time() - days * 86400
+        fields = set(RunRecord.__dataclass_fields__)
+        records = []
+        with self.path.open(encoding="utf-8", errors="ignore") as f:
+            for line in f:
+                try:
+                    raw: dict[str, Any] = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if raw.get("ts", 0) >= cutoff:
+                    records.append(
+                        RunRecord(**{k: v for k, v in raw.items() if k in fields})
+                    )
+        return records
+
+    def summary(self, days: float = 7) -> dict[str, JobPerf]:
+        """Per-job-type performance over the last `days` days."""
+        by_job: dict[str, list[RunRecord]] = {}
+        for record in self.records(days):
+            by_job.setdefault(record.job, []).append(record)
+
+        summary = {}
+        for job, records in sorted(by_job.items()):
+            walls = [r.wall for r in records if r.status == OK]
+            ttfos = [r.ttfo for r in records if r.ttfo is not None]
+            inputs = sum(
+                r.input_tokens + r.cache_read_tokens + r.cache_creation_tokens
+                for r in records
+            )
+            n = len(records)
+            summary[job] = JobPerf(
+                runs=n,
+                failures=sum(1 for r in records if r.status != OK),
+                wall_p50=percentile(walls, 50),
+                wall_p95=percentile(walls, 95),
+                ttfo_p50=percentile(ttfos, 50),
+                ttfo_p95=percentile(ttfos, 95),
+                avg_input_tokens=inputs / n,
+                avg_output_tokens=sum(r.output_tokens for r in records) / n,
+                cache_hit_ratio=(
+                    sum(r.cache_read_tokens for r in records) / inputs if inputs else 0
+                ),
+                avg_tool_calls=sum(r.tool_calls for r in records) / n,
+                cost_usd=sum(r.cost_usd for r in records),
+            )
+        return summary
+
+    def timeout_for(self, job: str, default: float) -> float:
+        """Timeout derived from recent runs of this job type.
+
+        Fast job types get a shorter timeout than the configured one, slow
+        ones a longer one. Timed-out runs count with the time they were cut
+        off at, so a job type that keeps hitting its limit gets a longer one.
+
+        Args:
+            job: Job type (runner job_type)
+            default: Timeout to use without enough history
+
+        Returns:
+            p95 wall time x ADAPTIVE_FACTOR within [MIN_TIMEOUT, MAX_TIMEOUT]
+        """
+        walls = [
+            r.wall
+            for r in self.records(ADAPTIVE_WINDOW_DAYS)
+            if r.job == job and r.status in (OK, TIMEOUT)
+        ]
+        if len(walls) < ADAPTIVE_MIN_SAMPLES:
+            return default
+        timeout = percentile(walls, 95) * ADAPTIVE_FACTOR
+        return min(MAX_TIMEOUT, max(MIN_TIMEOUT, timeout))
@@ -1,10 +1,28 @@
-"""Market data service - fetches real-time prices via yfinance."""
+"""Market data service - daily prices from market providers, kept in a local store."""
 
 import logging
+import time
 from dataclasses import dataclass
+from pathlib import Path
+
+from d_brain.services.indicators import CROSS_LOOKBACK, AssetSignals, compute_signals
+from d_brain.services.market_providers import (
+    DEFAULT_DEADLINE,
+    MarketDataProvider,
+    YFinanceProvider,
+    fetch_bars,
+)
+from d_brain.services.prices import PriceStore
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_CACHE_TTL = 300
+# Dollar index: stored for correlations, not shown in the table
+DXY_SYMBOL = "DX-Y.NYB"
+# Correlations at least this strong are listed in the signals section
+STRONG_CORRELATION = 0.5
+TOP_RANKED = 5
+
 # Tracked assets grouped by sector
 ASSETS: dict[str, dict[str, str]] = {
     # === Broad Market Indices ===
@@ -42,60 +60,219 @@ class AssetQuote:
     change_pct: float
 
 
-def fetch_market_data() -> dict[str, "AssetQuote | None"]:
-    """Fetch market data for all tracked assets via yfinance."""
-    import yfinance as yf
+# Quotes from the last fetch per price store: (monotonic time, quotes)
+_quotes_cache: dict[Path, tuple[float, dict[str, "AssetQuote | None"]]] = {}
 
-    symbols = [info["symbol"] for info in ASSETS.values()]
 
-    try:
-        # Batch download: last 5 days to ensure we have prev close even after weekends
-        data = yf.download(
-            symbols,
-            period="5d",
-            interval="1d",
-            auto_adjust=True,
-            progress=False,
-        )
-        close = data["Close"]
-    except Exception as e:
-        logger.error("Failed to download market data: %s", e)
-        return {key: None for key in ASSETS}
+def update_prices(
+    store: PriceStore,
+    symbols: list[str],
+    ttl: float,
+    providers: list[MarketDataProvider],
+    deadline: float = DEFAULT_DEADLINE,
+) -> None:
+    """Download bars missing from the store for symbols not fetched within ttl.
 
-    results: dict[str, "AssetQuote | None"] = {}
-    symbol_to_key = {info["symbol"]: key for key, info in ASSETS.items()}
+    Symbols without history get their full history; the rest are fetched
+    from their last stored day on. Symbols that miss the deadline keep
+    their stored prices and are retried on the next call.
+    """
+    fetched = store.fetched_at()
+    now = time.time()
+    stale = [s for s in symbols if now - fetched.get(s, 0) >= ttl]
+    if not stale:
+        return
+    last_days = store.last_days()
+    bars, updated = fetch_bars(
+        providers, {s: last_days.get(s) for s in stale}, deadline
+    )
+    store.add(bars, updated)
+    logger.info(
+        "Market data: %d bar(s), %d/%d symbol(s) updated",
+        sum(len(rows) for rows in bars.values()),
+        len(updated),
+        len(stale),
+    )
 
-    for symbol, key in symbol_to_key.items():
-        info = ASSETS[key]
-        try:
-            series = close[symbol].dropna()
-            if len(series) < 2:
-                logger.warning("Not enough data for %s", symbol)
+
+def fetch_market_data(
+    db_path: Path,
+    ttl: float = DEFAULT_CACHE_TTL,
+    providers: list[MarketDataProvider] | None = None,
+    deadline: float = DEFAULT_DEADLINE,
+) -> dict[str, "AssetQuote | None"]:
+    """Fetch market data for all tracked assets.
+
+    Prices come from the local store (see PriceStore), which is topped up
+    from the providers at most once per ttl. Within the ttl, repeated calls in
+    the same process are answered from memory without opening the store.
+    Symbols whose download fails or misses the deadline keep their last
+    stored prices.
+
+    Args:
+        db_path: SQLite price store, e.g. vault/.cache/prices.sqlite3
+        ttl: Seconds fetched prices stay fresh (0 = always download)
+        providers: Provider chain, primary first (default: yfinance)
+        deadline: Seconds the download may take in total
+
+    Returns:
+        Quote per asset key (None when there are no two stored closes)
+    """
+    cached = _quotes_cache.get(db_path)
+    if cached is not None and time.monotonic() - cached[0] < ttl:
+        return dict(cached[1])
+
+    store = PriceStore(db_path)
+    try:
+        symbols = [info["symbol"] for info in ASSETS.values()]
+        update_prices(
+            store,
+            [*symbols, DXY_SYMBOL],
+            ttl,
+            providers or [YFinanceProvider()],
+            deadline,
+        )
+        results: dict[str, "AssetQuote | None"] = {}
+        for key, info in ASSETS.items():
+            closes = store.closes(info["symbol"], 2)
+            if len(closes) < 2:
+                logger.warning("Not enough data for %s", info["symbol"])
                 results[key] = None
                 continue
 
-            price = float(series.iloc[-1])
-            prev_close = float(series.iloc[-2])
+            price = closes[-1][1]
+            prev_close = closes[-2][1]
             change_pct = ((price - prev_close) / prev_close * 100) if prev_close else 0.0
 
             results[key] = AssetQuote(
                 key=key,
                 name=info["name"],
                 emoji=info["emoji"],
-                symbol=symbol,
+                symbol=info["symbol"],
                 sector=info["sector"],
                 price=price,
                 change_pct=change_pct,
             )
-        except Exception as e:
-            logger.warning("Failed to parse %s: %s", symbol, e)
-            results[key] = None
+    finally:
+        store.close()
+
+    _quotes_cache[db_path] = (time.monotonic(), results)
+    return dict(results)
+
+
+def compute_market_signals(db_path: Path) -> dict[str, AssetSignals]:
+    """Indicators for all tracked assets from the local price store.
+
+    Call after fetch_market_data, which fills the store.
+
+    Returns:
+        Signals per asset key ({} if they can't be computed)
+    """
+    store = PriceStore(db_path)
+    try:
+        return compute_signals(store, ASSETS, DXY_SYMBOL, ASSETS["gold"]["symbol"])
+    except Exception as e:
+        logger.error("Failed to compute market signals: %s", e)
+        return {}
+    finally:
+        store.close()
+
+
+def _pct(value: float | None) -> str:
+    return "—" if value is None else f"{value:+.1f}%"
+
+
+def _signal_columns(signals: AssetSignals) -> str:
+    """Indicator columns appended to an asset's table line."""
+    r = signals.returns
+    parts = [f"5д {_pct(r['5d'])} · 1м {_pct(r['1m'])} · 3м {_pct(r['3m'])}"]
+    if signals.volatility is not None:
+        parts.append(f"вол {signals.volatility:.0f}%")
+    if signals.trend:
+        trend = "MA20>MA50 ↑" if signals.trend == "up" else "MA20<MA50 ↓"
+        if signals.crossover:
+            golden = signals.crossover == "golden"
+            trend += " (золотой крест)" if golden else " (крест смерти)"
+        parts.append(trend)
+    if signals.relative_strength is not None:
+        parts.append(f"к сектору {signals.relative_strength:+.1f} п.п.")
+    if signals.rank:
+        parts.append(f"#{signals.rank}")
+    return " | ".join(parts)
+
+
+def _correlation_line(
+    title: str, signals: dict[str, AssetSignals], attr: str
+) -> str | None:
+    strong = sorted(
+        (
+            (value, ASSETS[key]["name"])
+            for key, s in signals.items()
+            if (value := getattr(s, attr)) is not None
+            and abs(value) >= STRONG_CORRELATION
+        ),
+        reverse=True,
+    )
+    if not strong:
+        return None
+    return f"  {title}: " + ", ".join(f"{name} {v:+.2f}" for v, name in strong)
+
+
+def _signals_section(signals: dict[str, AssetSignals]) -> list[str]:
+    """Ranking, crossovers, sector leaders and correlations."""
+
+    def names(items: list[AssetSignals]) -> str:
+        return ", ".join(ASSETS[s.key]["name"] for s in items) or "—"
+
+    ranked = sorted((s for s in signals.values() if s.rank), key=lambda s: s.rank)
+    lines = ["[Сигналы]"]
+    if ranked:
+        top = ranked[:TOP_RANKED]
+        bottom = ranked[-TOP_RANKED:][::-1] if len(ranked) > TOP_RANKED else []
+        lines.append(
+            "  Рейтинг тренда (доходность 5д/1м/3м к волатильности): "
+            + ", ".join(f"{s.rank}. {ASSETS[s.key]['name']}" for s in top)
+        )
+        if bottom:
+            lines.append(f"  Слабейшие: {names(bottom)}")
+    crosses = [
+        f"{title} — {names(items)}"
+        for title, kind in (("золотой крест", "golden"), ("крест смерти", "death"))
+        if (items := [s for s in signals.values() if s.crossover == kind])
+    ]
+    if crosses:
+        lines.append(
+            f"  Пересечения MA20/MA50 за {CROSS_LOOKBACK} дн.: " + "; ".join(crosses)
+        )
+    relative = sorted(
+        (s for s in signals.values() if s.relative_strength),
+        key=lambda s: s.relative_strength or 0.0,
+    )
+    if relative:
+        lines.append(
+            f"  Сильнее сектора за 1м: {names(relative[::-1][:3])}; "
+            f"слабее: {names(relative[:3])}"
+        )
+    for title, attr in (
+        ("Корреляция с DXY (3м)", "corr_dxy"),
+        ("Корреляция с золотом (3м)", "corr_gold"),
+    ):
+        if line := _correlation_line(title, signals, attr):
+            lines.append(line)
+    return lines if len(lines) > 1 else []
 
-    return results
 
+def format_market_table(
+    quotes: dict[str, "AssetQuote | None"],
+    signals: dict[str, AssetSignals] | None = None,
+) -> str:
+    """Format quotes as plain-text table grouped by sector for Claude prompt.
 
-def format_market_table(quotes: dict[str, "AssetQuote | None"]) -> str:
-    """Format quotes as plain-text table grouped by sector for Claude prompt."""
+    With signals, each line carries the asset's indicators and a closing
+    section lists the trend ranking, crossovers, sector leaders and strong
+    correlations.
+    """
+    signals = signals or {}
     sectors: dict[str, list[str]] = {}
 
     for key, quote in quotes.items():
@@ -120,6 +297,8 @@ def format_market_table(quotes: dict[str, "AssetQuote | None"]) -> str:
                 f"  {quote.emoji} {quote.name}: {price_str} "
                 f"{arrow} {sign}{quote.change_pct:.2f}%"
             )
+            if key in signals:
+                line += f" | {_signal_columns(signals[key])}"
 
         sectors.setdefault(sector, []).append(line)
 
@@ -128,5 +307,6 @@ def format_market_table(quotes: dict[str, "AssetQuote | None"]) -> str:
         lines.append(f"[{sector}]")
         lines.extend(items)
         lines.append("")
+    lines.extend(_signals_section(signals))
 
     return "\n".join(lines).strip()
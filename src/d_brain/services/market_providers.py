@@ -0,0 +1,258 @@
+"""Market data providers with concurrent per-symbol fallback.
+
+A provider downloads daily closes for a list of symbols. fetch_bars first
+asks the primary provider for all symbols in one batch; symbols the batch
+didn't return are then fetched one by one, concurrently, each trying the
+providers in order. Everything runs against one deadline: whatever has
+arrived by then is returned, so a slow or broken symbol only loses its
+own update instead of stalling or blanking the whole table.
+"""
+
+import json
+import logging
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Future, wait
+from datetime import date
+from pathlib import Path
+from typing import Any, Protocol
+
+logger = logging.getLogger(__name__)
+
+Bars = dict[str, list[tuple[date, float]]]
+
+YFINANCE = "yfinance"
+FIXTURE = "fixture"
+
+# First download for a symbol without stored history
+HISTORY_PERIOD = "1y"
+DEFAULT_DEADLINE = 20.0
+# Share of the deadline the batch download may use before per-symbol fallback
+BATCH_SHARE = 0.5
+MAX_WORKERS = 8
+
+
+class MarketDataProvider(Protocol):
+    """Source of daily closes."""
+
+    name: str
+
+    def download(self, symbols: list[str], start: date | None) -> Bars:
+        """Daily closes per symbol from start on (full history when None).
+
+        Symbols the provider has no data for are left out of the result;
+        a failed request raises.
+        """
+        ...
+
+
+class YFinanceProvider:
+    """Yahoo Finance via yfinance."""
+
+    name = YFINANCE
+
+    def download(self, symbols: list[str], start: date | None) -> Bars:
+        import yfinance as yf
+
+        period = {"start": start.isoformat()} if start else {"period": HISTORY_PERIOD}
+        if len(symbols) == 1:
+            # Ticker.history, unlike yf.download, is safe to run in parallel
+            close = yf.Ticker(symbols[0]).history(
+                interval="1d", auto_adjust=True, **period
+            )["Close"]
+            columns = {symbols[0]: close}
+        else:
+            data = yf.download(
+                symbols,
+                interval="1d",
+                auto_adjust=True,
+                progress=False,
+                **period,
+            )
+            if data.empty:
+                return {}
+            columns = {s: data["Close"][s] for s in symbols if s in data["Close"]}
+
+        bars: Bars = {}
+        for symbol, column in columns.items():
+            series = column.dropna()
+            if len(series):
+                bars[symbol] = [(ts.date(), float(v)) for ts, v in series.items()]
+        return bars
+
+
+class FixtureProvider:
+    """Closes from a JSON file, for offline runs, tests and benchmarks.
+
+    The file maps symbols to {"YYYY-MM-DD": close}; see write_fixture.
+    """
+
+    name = FIXTURE
+
+    def __init__(self, path: Path, delay: float = 0) -> None:
+        self.path = Path(path)
+        self.delay = delay  # simulated latency per request
+
+    def download(self, symbols: list[str], start: date | None) -> Bars:
+        if self.delay:
+            time.sleep(self.delay)
+        data = json.loads(self.path.read_text(encoding="utf-8"))
+        bars: Bars = {}
+        for symbol in symbols:
+            rows = sorted(
+                (date.fromisoformat(day), float(close))
+                for day, close in data.get(symbol, {}).items()
+            )
+            rows = [(day, close) for day, close in rows if not start or day >= start]
+            if rows:
+                bars[symbol] = rows
+        return bars
+
+
+def write_fixture(path: Path, bars: Bars) -> None:
+    """Save closes in the FixtureProvider format."""
+    data = {
+        symbol: {day.isoformat(): close for day, close in rows}
+        for symbol, rows in bars.items()
+    }
+    Path(path).write_text(json.dumps(data, indent=1), encoding="utf-8")
+
+
+def make_providers(
+    names: list[str], fixture_path: Path | None = None
+) -> list[MarketDataProvider]:
+    """Build the provider chain from settings.
+
+    Args:
+        names: Provider names in fallback order (yfinance, fixture)
+        fixture_path: JSON file for the fixture provider
+
+    Returns:
+        Providers in order; unknown or unconfigured ones are skipped
+    """
+    providers: list[MarketDataProvider] = []
+    for name in names:
+        if name == YFINANCE:
+            providers.append(YFinanceProvider())
+        elif name == FIXTURE and fixture_path is not None:
+            providers.append(FixtureProvider(fixture_path))
+        else:
+            logger.warning("Unknown or unconfigured market provider: %s", name)
+    return providers or [YFinanceProvider()]
+
+
+def _batch(provider: MarketDataProvider, starts: dict[str, date | None]) -> Bars:
+    """Download all symbols with one provider, one request per start group.
+
+    Symbols without history get the full history; the rest are requested
+    together from the oldest of their starts on.
+    """
+    new = [s for s, start in starts.items() if start is None]
+    known = {s: start for s, start in starts.items() if start is not None}
+    groups = [(new, None), (list(known), min(known.values(), default=None))]
+    bars: Bars = {}
+    for group, start in groups:
+        if group:
+            bars.update(provider.download(group, start))
+    return bars
+
+
+def _single(
+    providers: list[MarketDataProvider], symbol: str, start: date | None
+) -> tuple[list[tuple[date, float]], bool]:
+    """Fetch one symbol, trying providers in order.
+
+    Returns:
+        (bars, whether any provider answered without an error)
+    """
+    answered = False
+    for provider in providers:
+        try:
+            rows = provider.download([symbol], start).get(symbol, [])
+        except Exception as e:
+            logger.warning("%s failed for %s: %s", provider.name, symbol, e)
+            continue
+        answered = True
+        if rows:
+            return rows, True
+    return [], answered
+
+
+def _submit(
+    slots: threading.Semaphore, fn: Callable[..., Any], *args: Any
+) -> Future[Any]:
+    """Run fn in a daemon thread once one of the slots is free.
+
+    Unlike executor threads, daemon threads don't hold up interpreter exit,
+    so a provider call that hangs past the deadline can be abandoned even
+    in one-shot scripts. A future cancelled before it started never runs.
+    """
+    future: Future[Any] = Future()
+
+    def target() -> None:
+        with slots:
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                future.set_result(fn(*args))
+            except BaseException as e:
+                future.set_exception(e)
+
+    threading.Thread(target=target, name="market", daemon=True).start()
+    return future
+
+
+def fetch_bars(
+    providers: list[MarketDataProvider],
+    starts: dict[str, date | None],
+    deadline: float = DEFAULT_DEADLINE,
+) -> tuple[Bars, set[str]]:
+    """Download closes for symbols, with per-symbol fallback and a deadline.
+
+    Args:
+        providers: Provider chain, primary first
+        starts: Symbol → first day to fetch (None = full history)
+        deadline: Seconds after which the results so far are returned
+
+    Returns:
+        (bars per symbol, symbols that were fetched successfully, with or
+        without new bars)
+    """
+    expires = time.monotonic() + deadline
+    bars: Bars = {}
+    fetched: set[str] = set()
+    slots = threading.Semaphore(MAX_WORKERS)
+
+    primary = providers[0]
+    batch = _submit(slots, _batch, primary, starts)
+    batch_done, _ = wait([batch], timeout=deadline * BATCH_SHARE)
+    if not batch_done:
+        logger.warning("%s batch download timed out", primary.name)
+    elif (error := batch.exception()) is not None:
+        logger.warning("%s batch download failed: %s", primary.name, error)
+    else:
+        bars.update(batch.result())
+        fetched.update(bars)
+
+    missing = [s for s in starts if s not in bars]
+    if missing:
+        futures = {_submit(slots, _single, providers, s, starts[s]): s for s in missing}
+        done, pending = wait(futures, timeout=max(0, expires - time.monotonic()))
+        for future in done:
+            symbol = futures[future]
+            rows, answered = future.result()
+            if rows:
+                bars[symbol] = rows
+            if answered:
+                fetched.add(symbol)
+        if pending:
+            # Stuck requests are abandoned, not awaited; queued ones never run
+            for future in pending:
+                future.cancel()
+            logger.warning(
+                "Market data deadline (%.0fs) passed, skipped: %s",
+                deadline,
+                ", ".join(sorted(futures[f] for f in pending)),
+            )
+    return bars, fetched
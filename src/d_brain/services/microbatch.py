@@ -0,0 +1,82 @@
+"""Micro-batch trigger for processing daily entries during the day.
+
+Follows VaultStorage.append_to_daily writes and fires a batch once
+`min_entries` new entries have piled up, or once the day has been quiet for
+`idle_minutes` with anything pending. The batch itself runs
+ClaudeProcessor.process_daily(background=True), which handles only the
+entries past the watermark and keeps its report for the evening summary.
+"""
+
+import asyncio
+import logging
+from collections.abc import Callable
+from datetime import date
+
+from d_brain.services.storage import add_append_listener, remove_append_listener
+
+logger = logging.getLogger(__name__)
+
+BatchCallback = Callable[[date], None]
+
+
+class MicroBatcher:
+    """Counts appended entries per day and triggers background batches."""
+
+    def __init__(
+        self,
+        on_batch: BatchCallback,
+        min_entries: int = 5,
+        idle_minutes: float = 20,
+    ) -> None:
+        self.on_batch = on_batch
+        self.min_entries = max(1, min_entries)
+        self.idle_seconds = idle_minutes * 60
+        self._pending: dict[date, int] = {}
+        self._timers: dict[date, asyncio.TimerHandle] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def start(self) -> None:
+        """Start following daily file appends."""
+        self._loop = asyncio.get_running_loop()
+        add_append_listener(self._on_append)
+        logger.info(
+            "Micro-batching enabled (%d entries or %.0f min idle)",
+            self.min_entries,
+            self.idle_seconds / 60,
+        )
+
+    def stop(self) -> None:
+        """Stop following appends and drop pending timers."""
+        remove_append_listener(self._on_append)
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+        self._pending.clear()
+
+    def _on_append(self, day: date, entry: str) -> None:
+        # May be called from a worker thread; count on the loop
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._count, day)
+
+    def _count(self, day: date) -> None:
+        self._pending[day] = self._pending.get(day, 0) + 1
+        if timer := self._timers.pop(day, None):
+            timer.cancel()
+        if self._pending[day] >= self.min_entries:
+            self._fire(day)
+        elif self._loop is not None and self.idle_seconds > 0:
+            self._timers[day] = self._loop.call_later(
+                self.idle_seconds, self._fire, day
+            )
+
+    def _fire(self, day: date) -> None:
+        count = self._pending.pop(day, 0)
+        if timer := self._timers.pop(day, None):
+            timer.cancel()
+        if not count:
+            return
+        logger.info("Micro-batch for %s triggered by %d new entries", day, count)
+        try:
+            self.on_batch(day)
+        except Exception:
+            logger.exception("Failed to start micro-batch for %s", day)
@@ -0,0 +1,90 @@
+"""Local price history for the market digest.
+
+Daily closes are kept in SQLite (vault/.cache/prices.sqlite3), one row per
+symbol and day, together with when each symbol was last fetched. A fetch
+only downloads bars from the last stored day on (refreshing that day's
+possibly intraday close), and analytics over longer horizons read the
+history from disk instead of downloading more.
+"""
+
+import logging
+import sqlite3
+import time
+from collections.abc import Iterable
+from datetime import date
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS bars (
+    symbol TEXT NOT NULL,
+    day TEXT NOT NULL,
+    close REAL NOT NULL,
+    PRIMARY KEY (symbol, day)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS fetches (
+    symbol TEXT PRIMARY KEY,
+    fetched_at REAL NOT NULL
+);
+"""
+
+
+class PriceStore:
+    """SQLite-backed daily close history."""
+
+    def __init__(self, db_path: Path) -> None:
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        """Close the database connection."""
+        self._conn.close()
+
+    def last_days(self) -> dict[str, date]:
+        """Latest stored day per symbol."""
+        rows = self._conn.execute("SELECT symbol, MAX(day) FROM bars GROUP BY symbol")
+        return {symbol: date.fromisoformat(day) for symbol, day in rows}
+
+    def fetched_at(self) -> dict[str, float]:
+        """Unix time of the last successful fetch per symbol."""
+        return dict(self._conn.execute("SELECT symbol, fetched_at FROM fetches"))
+
+    def add(
+        self,
+        bars: dict[str, list[tuple[date, float]]],
+        fetched: Iterable[str],
+    ) -> None:
+        """Store downloaded bars, replacing days that were stored already.
+
+        Args:
+            bars: Daily closes per symbol
+            fetched: Symbols that were downloaded (with or without new bars)
+        """
+        now = time.time()
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO bars (symbol, day, close) VALUES (?, ?, ?)",
+                [
+                    (symbol, day.isoformat(), close)
+                    for symbol, rows in bars.items()
+                    for day, close in rows
+                ],
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO fetches (symbol, fetched_at) VALUES (?, ?)",
+                [(symbol, now) for symbol in fetched],
+            )
+
+    def closes(self, symbol: str, limit: int) -> list[tuple[date, float]]:
+        """Most recent daily closes of a symbol, oldest first."""
+        rows = self._conn.execute(
+            "SELECT day, close FROM bars WHERE symbol = ? ORDER BY day DESC LIMIT ?",
+            (symbol, limit),
+        ).fetchall()
+        return [(date.fromisoformat(day), close) for day, close in reversed(rows)]
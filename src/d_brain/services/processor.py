@@ -1,26 +1,180 @@
 """Claude processing service."""
 
+import asyncio
+import html
+import json
 import logging
-import os
-import subprocess
-from datetime import date
+import re
+from datetime import date, datetime
 from pathlib import Path
 from typing import Any
 
+from d_brain.services.classifier import FILE_DIRECTLY, file_note, read_tag
+from d_brain.services.context import (
+    DEFAULT_TOKEN_BUDGET,
+    ContextBuilder,
+    split_markdown_sections,
+)
+from d_brain.services.digest import VaultDigest
+from d_brain.services.intents import is_read_only
+from d_brain.services.ledger import RunLedger
+from d_brain.services.prompts import (
+    DAILY_HTML_FORMAT,
+    DAILY_JSON_FORMAT,
+    DAILY_RULES,
+    DIGEST_FOOTER,
+    DIGEST_HEADER,
+    EXECUTE_ROLE,
+    EXECUTE_RULES,
+    HTML_FORMAT,
+    JSON_FORMAT,
+    MARKET_RULES,
+    SKILL_PATH,
+    TODOIST_REFERENCE_PATH,
+    WEEKLY_RULES,
+    PromptSection,
+    assemble,
+    read_cached,
+)
+from d_brain.services.report import (
+    StructuredReport,
+    parse_report,
+    render_html,
+    render_markdown,
+)
+from d_brain.services.response_cache import ResponseCache
+from d_brain.services.rollup import RollupStore, extract_rollup
+from d_brain.services.runner import (
+    DEFAULT_MAX_CONCURRENCY,
+    ClaudeRunner,
+    EventCallback,
+    background_limit,
+)
 from d_brain.services.session import SessionStore
+from d_brain.services.storage import VaultStorage, Watermark, chunk_entries
+from d_brain.services.weekly import build_weekly_dataset
 
 logger = logging.getLogger(__name__)
 
-DEFAULT_TIMEOUT = 1200  # 20 minutes
+# Session entries offered to the context builder for /do
+SESSION_MAX_ENTRIES = 50
+SESSION_TEXT_CHARS = 300
+
+# Ledger job types of daily processing. Runs over the whole day, over the
+# entries added since the last run, micro-batches and chunks differ a lot in
+# size, so each keeps its own history and adaptive timeout.
+JOB_FULL = "Processing (full)"
+JOB_DELTA = "Processing (delta)"
+JOB_BATCH = "Processing (batch)"
+JOB_CHUNK = "Processing (chunk)"
+
+DEFAULT_CHUNK_CHARS = 12000
+DEFAULT_CHUNK_PARALLELISM = 2
+
+# First line of a chunk report ("📊 <b>Обработка за ...</b>"), replaced on merge
+REPORT_HEADER_RE = re.compile(r"\A\s*[^\n]*Обработка за[^\n]*\n?")
+
+
+def merge_reports(header: str, blocks: list[tuple[str, dict[str, Any]]]) -> str:
+    """Merge partial reports into one Telegram HTML report.
+
+    Args:
+        header: Report headline (Telegram HTML)
+        blocks: (block title, result) pairs in display order
+
+    Returns:
+        Report with a single header and one block per partial result
+    """
+    parts = [header]
+    for title, result in blocks:
+        if "error" in result:
+            body = (
+                f"❌ <b>Ошибка:</b> {html.escape(str(result['error']))}\n"
+                "<i>Эти записи будут обработаны при следующем запуске</i>"
+            )
+        else:
+            body = REPORT_HEADER_RE.sub("", result.get("report", "")).strip()
+        parts.append(f"<b>— {title} —</b>\n{body}")
+    return "\n\n".join(parts)
+
+
+def all_structured(results: list[dict[str, Any]]) -> bool:
+    """Whether every successful result was rendered from a structured report.
+
+    Merged reports only add escaped text around the parts, so they stay
+    structured when all parts are.
+    """
+    ok = [result for result in results if "error" not in result]
+    return bool(ok) and all(result.get("structured") for result in ok)
+
+
+def merge_chunk_reports(day: date, results: list[dict[str, Any]]) -> str:
+    """Merge per-chunk reports (in chunk order) into one report."""
+    return merge_reports(
+        f"📊 <b>Обработка за {day}</b>",
+        [
+            (f"Часть {number}/{len(results)}", result)
+            for number, result in enumerate(results, start=1)
+        ],
+    )
 
 
 class ClaudeProcessor:
     """Service for triggering Claude Code processing."""
 
-    def __init__(self, vault_path: Path, todoist_api_key: str = "") -> None:
+    def __init__(
+        self,
+        vault_path: Path,
+        todoist_api_key: str = "",
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        prompt_token_budget: int = DEFAULT_TOKEN_BUDGET,
+        chunk_chars: int = DEFAULT_CHUNK_CHARS,
+        chunk_parallelism: int = DEFAULT_CHUNK_PARALLELISM,
+        response_cache_ttl: float = 0,
+        adaptive_timeouts: bool = False,
+        structured_reports: bool = False,
+        context_digest: bool = True,
+        preclassify_threshold: float = 0,
+        claude_bin: str = "claude",
+    ) -> None:
         self.vault_path = Path(vault_path)
         self.todoist_api_key = todoist_api_key
+        self.prompt_token_budget = prompt_token_budget
+        self.chunk_chars = chunk_chars  # 0 disables map-reduce processing
+        self.chunk_parallelism = max(1, chunk_parallelism)
+        if chunk_chars and self.chunk_parallelism > background_limit(max_concurrency):
+            logger.warning(
+                "Chunk parallelism %d exceeds the %d Claude slot(s) open to "
+                "background runs (max concurrency %d, one kept for /do); "
+                "extra chunks will wait",
+                self.chunk_parallelism,
+                background_limit(max_concurrency),
+                max_concurrency,
+            )
+        # Ask for JSON reports and render them locally
+        self.structured_reports = structured_reports
+        # Inline vault/.cache/context-digest.md instead of exploratory reads
+        self._digest = VaultDigest(self.vault_path) if context_digest else None
+        # Tagged entries at or above this confidence skip Claude (0 disables)
+        self.preclassify_threshold = preclassify_threshold
+        self.batches_dir = self.vault_path / ".cache" / "batches"
+        self.rollups = RollupStore(self.vault_path)
+        # Opt-in cache of read-only /do answers (TTL 0 disables)
+        self._response_cache = (
+            ResponseCache(self.vault_path, response_cache_ttl)
+            if response_cache_ttl > 0
+            else None
+        )
         self._mcp_config_path = (self.vault_path.parent / "mcp-config.json").resolve()
+        self._runner = ClaudeRunner(
+            cwd=self.vault_path.parent,
+            mcp_config_path=self._mcp_config_path,
+            todoist_api_key=todoist_api_key,
+            max_concurrency=max_concurrency,
+            ledger=RunLedger(self.vault_path / ".cache" / "runs.jsonl"),
+            adaptive_timeout=adaptive_timeouts,
+            claude_bin=claude_bin,
+        )
 
     def _load_skill_content(self) -> str:
         """Load dbrain-processor skill content for inclusion in prompt.
@@ -28,44 +182,71 @@ class ClaudeProcessor:
         NOTE: @vault/ references don't work in --print mode,
         so we must include skill content directly in the prompt.
         """
-        skill_path = self.vault_path / ".claude/skills/dbrain-processor/SKILL.md"
-        if skill_path.exists():
-            return skill_path.read_text()
-        return ""
+        return read_cached(self.vault_path / SKILL_PATH)
 
     def _load_todoist_reference(self) -> str:
         """Load Todoist reference for inclusion in prompt."""
-        ref_path = self.vault_path / ".claude/skills/dbrain-processor/references/todoist.md"
-        if ref_path.exists():
-            return ref_path.read_text()
-        return ""
+        return read_cached(self.vault_path / TODOIST_REFERENCE_PATH)
 
-    def _get_session_context(self, user_id: int) -> str:
-        """Get today's session context for Claude.
+    def _load_digest(self) -> str:
+        """Refresh and load the vault digest ("" when disabled or failed)."""
+        if self._digest is None:
+            return ""
+        try:
+            return self._digest.refresh()
+        except OSError as e:
+            logger.warning("Failed to refresh context digest: %s", e)
+            return ""
+
+    def _get_session_lines(self, user_id: int) -> list[str]:
+        """Get today's session entries for Claude, oldest first.
 
         Args:
             user_id: Telegram user ID
 
         Returns:
-            Recent session entries formatted for inclusion in prompt.
+            Recent session entries formatted for inclusion in prompt
+            (the context builder trims them to the token budget).
         """
         if user_id == 0:
-            return ""
+            return []
 
         session = SessionStore(self.vault_path)
         today_entries = session.get_today(user_id)
-        if not today_entries:
-            return ""
 
-        lines = ["=== TODAY'S SESSION ==="]
-        for entry in today_entries[-10:]:
+        lines = []
+        for entry in today_entries[-SESSION_MAX_ENTRIES:]:
             ts = entry.get("ts", "")[11:16]  # HH:MM from ISO
             entry_type = entry.get("type", "unknown")
-            text = entry.get("text", "")[:80]
+            text = entry.get("text", "")[:SESSION_TEXT_CHARS]
             if text:
                 lines.append(f"{ts} [{entry_type}] {text}")
-        lines.append("=== END SESSION ===\n")
-        return "\n".join(lines)
+        return lines
+
+    def _format_section(self, html_format: str, json_format: str) -> PromptSection:
+        """Output format rules for the configured report mode."""
+        return PromptSection(
+            "format", json_format if self.structured_reports else html_format
+        )
+
+    def _render_structured(self, result: dict[str, Any]) -> StructuredReport | None:
+        """Render a JSON report to Telegram HTML in place.
+
+        Results from structured mode get "structured": True; output that
+        isn't a JSON report is left as is and handled as Claude's HTML.
+
+        Returns:
+            The parsed report, or None
+        """
+        if not self.structured_reports or "error" in result:
+            return None
+        report = parse_report(result.get("report", ""))
+        if report is None:
+            logger.warning("Structured report expected, treating output as HTML")
+            return None
+        result["report"] = render_html(report)
+        result["structured"] = True
+        return report
 
     def _html_to_markdown(self, html: str) -> str:
         """Convert Telegram HTML to Obsidian Markdown."""
@@ -87,15 +268,22 @@ class ClaudeProcessor:
 
         return text
 
-    def _save_weekly_summary(self, report_html: str, week_date: date) -> Path:
-        """Save weekly summary to vault/summaries/YYYY-WXX-summary.md."""
+    def _save_weekly_summary(
+        self, report_html: str, week_date: date, markdown: str | None = None
+    ) -> Path:
+        """Save weekly summary to vault/summaries/YYYY-WXX-summary.md.
+
+        Structured reports pass their own Markdown rendering.
+        """
         # Calculate ISO week number
         year, week, _ = week_date.isocalendar()
         filename = f"{year}-W{week:02d}-summary.md"
         summary_path = self.vault_path / "summaries" / filename
 
         # Convert HTML to Markdown for Obsidian
-        content = self._html_to_markdown(report_html)
+        if markdown is None:
+            markdown = self._html_to_markdown(report_html)
+        content = markdown
 
         # Add frontmatter
         frontmatter = f"""---
@@ -124,11 +312,25 @@ week: {year}-W{week:02d}
                 moc_path.write_text(content)
                 logger.info("Updated MOC-weekly.md with link to %s", summary_path.stem)
 
-    def process_daily(self, day: date | None = None) -> dict[str, Any]:
+    async def process_daily(
+        self,
+        day: date | None = None,
+        on_event: EventCallback | None = None,
+        background: bool = False,
+    ) -> dict[str, Any]:
         """Process daily file with Claude.
 
+        Days whose new entries exceed chunk_chars are split on entry
+        boundaries and processed as parallel chunks.
+
+        Background (micro-batch) runs keep their reports; the next regular
+        run merges them into its summary, so it only has to process what
+        came in since the last batch.
+
         Args:
             day: Date to process (default: today)
+            on_event: Optional callback for streamed progress events
+            background: Run as a micro-batch during the day
 
         Returns:
             Processing report as dict
@@ -145,399 +347,490 @@ week: {year}-W{week:02d}
                 "processed_entries": 0,
             }
 
-        # Load skill content directly (@ references don't work in --print mode)
-        skill_content = self._load_skill_content()
-
-        prompt = f"""Сегодня {day}. Выполни ежедневную обработку.
+        # Only entries past the watermark go to Claude
+        storage = VaultStorage(self.vault_path)
+        new_entries, watermark = storage.get_new_entries(day)
 
-=== SKILL INSTRUCTIONS ===
-{skill_content}
-=== END SKILL ===
-
-ПЕРВЫМ ДЕЛОМ: вызови mcp__todoist__user-info чтобы убедиться что MCP работает.
-
-CRITICAL MCP RULE:
-- ТЫ ИМЕЕШЬ ДОСТУП к mcp__todoist__* tools — ВЫЗЫВАЙ ИХ НАПРЯМУЮ
-- НИКОГДА не пиши "MCP недоступен" или "добавь вручную"
-- Для задач: вызови mcp__todoist__add-tasks tool
-- Если tool вернул ошибку — покажи ТОЧНУЮ ошибку в отчёте
+        if background:
+            if not new_entries:
+                return {"report": "", "processed_entries": 0, "background": True}
+            batch_result = await self._process_new(
+                day, new_entries, storage, watermark, on_event, JOB_BATCH
+            )
+            if "error" not in batch_result:
+                self._save_batch_report(day, batch_result)
+            return {**batch_result, "background": True}
+
+        batches = self._load_batch_reports(day)
+        if not new_entries and not batches:
+            logger.info("No new entries for %s, skipping Claude", day)
+            if storage.get_watermark(day) is None:
+                # Record the day as handled (e.g. processed by the old flow)
+                storage.save_watermark(day, watermark)
+            return {
+                "report": f"📭 <b>Новых записей за {day} нет</b>",
+                "processed_entries": 0,
+            }
 
-CRITICAL OUTPUT FORMAT:
-- Return ONLY raw HTML for Telegram (parse_mode=HTML)
-- NO markdown: no **, no ## , no ```, no tables
-- Start directly with 📊 <b>Обработка за {day}</b>
-- Allowed tags: <b>, <i>, <code>, <s>, <u>
-- If entries already processed, return status report in same HTML format"""
+        blocks = [(f"🕐 Обработано в {batch['time']}", batch) for batch in batches]
+        processed = sum(batch.get("processed_entries", 0) for batch in batches)
+        result: dict[str, Any] = {}
+        if new_entries:
+            job_type = JOB_FULL if storage.get_watermark(day) is None else JOB_DELTA
+            result = await self._process_new(
+                day, new_entries, storage, watermark, on_event, job_type
+            )
+            if not batches:
+                return result
+            if "error" not in result:
+                processed += result["processed_entries"]
+            blocks.append(("Новые записи", result))
+        else:
+            logger.info("No new entries for %s, summarizing micro-batches", day)
+
+        self._clear_batch_reports(day)
+        return {
+            "report": merge_reports(f"📊 <b>Обработка за {day}</b>", blocks),
+            "processed_entries": processed,
+            "structured": all_structured([block for _, block in blocks]),
+        }
+
+    async def _process_new(
+        self,
+        day: date,
+        new_entries: list[str],
+        storage: VaultStorage,
+        watermark: Watermark,
+        on_event: EventCallback | None,
+        job_type: str,
+    ) -> dict[str, Any]:
+        """Process entries past the watermark and advance it.
+
+        With the preclassifier enabled, confidently tagged entries are filed
+        locally first and only the rest go to Claude.
+        """
+        filed: list[tuple[str, Path]] = []
+        if self.preclassify_threshold > 0:
+            filed, new_entries = self._file_confident(day, new_entries)
+            if not new_entries:
+                storage.save_watermark(day, watermark)
+                return {
+                    "report": f"📊 <b>Обработка за {day}</b>\n\n"
+                    + self._filed_report(filed),
+                    "processed_entries": len(filed),
+                    "structured": self.structured_reports,
+                }
 
-        try:
-            # Pass TODOIST_API_KEY to Claude subprocess
-            env = os.environ.copy()
-            if self.todoist_api_key:
-                env["TODOIST_API_KEY"] = self.todoist_api_key
-
-            result = subprocess.run(
-                [
-                    "claude",
-                    "--print",
-                    "--dangerously-skip-permissions",
-                    "--mcp-config",
-                    str(self._mcp_config_path),
-                    "-p",
-                    prompt,
-                ],
-                cwd=self.vault_path.parent,
-                capture_output=True,
-                text=True,
-                timeout=DEFAULT_TIMEOUT,
-                check=False,
-                env=env,
+        chunks = (
+            chunk_entries(new_entries, self.chunk_chars) if self.chunk_chars else []
+        )
+        if len(chunks) > 1:
+            result = await self._process_chunked(
+                day, chunks, storage, watermark, on_event
             )
+        else:
+            result = await self._process_entries(
+                day, new_entries, on_event, job_type=job_type
+            )
+            if "error" not in result:
+                storage.save_watermark(day, watermark)
+                result["processed_entries"] = len(new_entries)
+
+        if filed:
+            if "error" in result:
+                # Keep the filed entries done, the rest stays for the next run
+                storage.save_watermark(day, watermark.excluding(new_entries))
+            else:
+                result["report"] += "\n\n" + self._filed_report(filed)
+                result["processed_entries"] += len(filed)
+        return result
+
+    def _file_confident(
+        self, day: date, entries: list[str]
+    ) -> tuple[list[tuple[str, Path]], list[str]]:
+        """File entries the preclassifier is sure about as thoughts notes.
 
-            if result.returncode != 0:
-                logger.error(
-                    "Claude processing failed (rc=%d): stderr=%s stdout=%s",
-                    result.returncode,
-                    result.stderr,
-                    result.stdout,
+        Returns:
+            Tuple of ((entry, note path) pairs filed, entries left for Claude)
+        """
+        filed = []
+        rest = []
+        for entry in entries:
+            tag = read_tag(entry)
+            if (
+                tag is None
+                or tag.category not in FILE_DIRECTLY
+                or tag.confidence < self.preclassify_threshold
+            ):
+                rest.append(entry)
+                continue
+            try:
+                path = file_note(
+                    self.vault_path, day, tag.category, entry, tag.confidence
                 )
-                return {
-                    "error": result.stderr or result.stdout or "Claude processing failed",
-                    "processed_entries": 0,
-                }
+            except OSError as e:
+                logger.warning("Failed to file entry locally: %s", e)
+                rest.append(entry)
+                continue
+            filed.append((entry, path))
+
+        if filed:
+            notes = [str(p.relative_to(self.vault_path)) for _, p in filed]
+            logger.info("Filed %d of %d entries locally", len(filed), len(entries))
+            try:
+                self.rollups.add(day, [e for e, _ in filed], {"thoughts": notes})
+            except OSError as e:
+                logger.warning("Failed to save rollup for %s: %s", day, e)
+        return filed, rest
+
+    def _filed_report(self, filed: list[tuple[str, Path]]) -> str:
+        lines = [
+            f"• {html.escape(str(path.relative_to(self.vault_path)))}"
+            for _, path in filed
+        ]
+        return "📥 <b>Разложено без Claude:</b>\n" + "\n".join(lines)
+
+    def _batch_file(self, day: date) -> Path:
+        return self.batches_dir / f"{day.isoformat()}.jsonl"
+
+    def _save_batch_report(self, day: date, result: dict[str, Any]) -> None:
+        """Keep a micro-batch report for the day's final summary."""
+        self.batches_dir.mkdir(parents=True, exist_ok=True)
+        record = {
+            "time": datetime.now().strftime("%H:%M"),
+            "report": result.get("report", ""),
+            "processed_entries": result.get("processed_entries", 0),
+            "structured": bool(result.get("structured")),
+        }
+        with self._batch_file(day).open("a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def _load_batch_reports(self, day: date) -> list[dict[str, Any]]:
+        """Micro-batch reports not yet included in a summary."""
+        path = self._batch_file(day)
+        if not path.exists():
+            return []
+        reports = []
+        for line in path.read_text(encoding="utf-8").splitlines():
+            try:
+                reports.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+        return reports
+
+    def pending_batch_days(self) -> list[date]:
+        """Days with micro-batch reports not yet included in a summary."""
+        if not self.batches_dir.exists():
+            return []
+        days = []
+        for path in self.batches_dir.glob("*.jsonl"):
+            try:
+                days.append(date.fromisoformat(path.stem))
+            except ValueError:
+                continue
+        return sorted(days)
+
+    def _clear_batch_reports(self, day: date) -> None:
+        self._batch_file(day).unlink(missing_ok=True)
+
+    async def _process_entries(
+        self,
+        day: date,
+        entries: list[str],
+        on_event: EventCallback | None,
+        part: tuple[int, int] | None = None,
+        job_type: str = JOB_FULL,
+    ) -> dict[str, Any]:
+        """Run Claude over a batch of daily entries.
 
-            # Return human-readable output
-            output = result.stdout.strip()
-            return {
-                "report": output,
-                "processed_entries": 1,  # успешно обработано
-            }
+        Args:
+            day: Date of the daily file
+            entries: Entries to process
+            on_event: Optional callback for streamed progress events
+            part: (number, total) when the batch is one chunk of the day
+            job_type: Ledger job type (chunks always use JOB_CHUNK)
+        """
+        entries_block = "\n\n".join(entries)
+        part_note = ""
+        if part is not None:
+            part_note = (
+                f", часть {part[0]} из {part[1]}"
+                "; остальные части обрабатываются параллельно,"
+                " отчитайся только по этой части"
+            )
 
-        except subprocess.TimeoutExpired:
-            logger.error("Claude processing timed out")
-            return {
-                "error": "Processing timed out",
-                "processed_entries": 0,
-            }
-        except FileNotFoundError:
-            logger.error("Claude CLI not found")
-            return {
-                "error": "Claude CLI not installed",
-                "processed_entries": 0,
-            }
-        except Exception as e:
-            logger.exception("Unexpected error during processing")
-            return {
-                "error": str(e),
-                "processed_entries": 0,
-            }
+        # Load skill content directly (@ references don't work in --print mode)
+        skill_content = self._load_skill_content()
+        digest = self._load_digest()
+
+        prompt = assemble(
+            "Processing",
+            [
+                PromptSection(
+                    "skill",
+                    f"=== SKILL INSTRUCTIONS ===\n{skill_content}\n=== END SKILL ===",
+                ),
+                PromptSection("rules", DAILY_RULES),
+                self._format_section(DAILY_HTML_FORMAT, DAILY_JSON_FORMAT),
+                PromptSection(
+                    "digest",
+                    f"{DIGEST_HEADER}\n\n{digest}\n{DIGEST_FOOTER}" if digest else "",
+                ),
+                PromptSection(
+                    "entries",
+                    f"""Сегодня {day}. Выполни ежедневную обработку.
+
+НОВЫЕ ЗАПИСИ (daily/{day}.md, {len(entries)} шт.{part_note}):
+
+{entries_block}
+
+=== END ENTRIES ===""",
+                    static=False,
+                ),
+            ],
+        )
+
+        label = "Processing"
+        if part is not None:
+            label = f"Processing part {part[0]}"
+            job_type = JOB_CHUNK
+        result = await self._runner.run(
+            prompt, label=label, on_event=on_event, job_type=job_type
+        )
+        if "error" not in result:
+            result["report"], rollup = extract_rollup(result.get("report", ""))
+            structured = self._render_structured(result)
+            if structured is not None and not rollup:
+                rollup = structured.rollup
+            try:
+                self.rollups.add(day, entries, rollup)
+            except OSError as e:
+                logger.warning("Failed to save rollup for %s: %s", day, e)
+        return result
+
+    async def _process_chunked(
+        self,
+        day: date,
+        chunks: list[list[str]],
+        storage: VaultStorage,
+        watermark: Watermark,
+        on_event: EventCallback | None,
+    ) -> dict[str, Any]:
+        """Map-reduce an oversized day: chunks run in parallel, then merge.
+
+        Entries of failed chunks stay unprocessed for the next run.
+        """
+        logger.info(
+            "Processing %s in %d chunks (parallelism %d)",
+            day,
+            len(chunks),
+            self.chunk_parallelism,
+        )
+        slots = asyncio.Semaphore(self.chunk_parallelism)
+
+        async def run_chunk(number: int, entries: list[str]) -> dict[str, Any]:
+            async with slots:
+                return await self._process_entries(
+                    day, entries, on_event, part=(number, len(chunks))
+                )
 
-    def execute_prompt(self, user_prompt: str, user_id: int = 0) -> dict[str, Any]:
+        results = await asyncio.gather(
+            *(run_chunk(n, entries) for n, entries in enumerate(chunks, start=1))
+        )
+
+        failed = [
+            entry
+            for entries, result in zip(chunks, results, strict=True)
+            if "error" in result
+            for entry in entries
+        ]
+        if len(failed) == sum(len(entries) for entries in chunks):
+            return results[0]
+
+        if failed:
+            watermark = watermark.excluding(failed)
+        storage.save_watermark(day, watermark)
+        processed = sum(len(entries) for entries in chunks) - len(failed)
+        return {
+            "report": merge_chunk_reports(day, results),
+            "processed_entries": processed,
+            "structured": all_structured(results),
+        }
+
+    async def execute_prompt(
+        self,
+        user_prompt: str,
+        user_id: int = 0,
+        on_event: EventCallback | None = None,
+    ) -> dict[str, Any]:
         """Execute arbitrary prompt with Claude.
 
+        With the response cache enabled, answers to read-only requests are
+        reused while the vault is unchanged; cached results carry
+        "cached": True.
+
         Args:
             user_prompt: User's natural language request
             user_id: Telegram user ID for session context
+            on_event: Optional callback for streamed progress events
 
         Returns:
             Execution report as dict
         """
-        today = date.today()
-
-        # Load context
-        todoist_ref = self._load_todoist_reference()
-        session_context = self._get_session_context(user_id)
-
-        prompt = f"""Ты - персональный ассистент d-brain.
-
-CONTEXT:
-- Текущая дата: {today}
-- Vault path: {self.vault_path}
-
-{session_context}=== TODOIST REFERENCE ===
-{todoist_ref}
-=== END REFERENCE ===
-
-ПЕРВЫМ ДЕЛОМ: вызови mcp__todoist__user-info чтобы убедиться что MCP работает.
-
-CRITICAL MCP RULE:
-- ТЫ ИМЕЕШЬ ДОСТУП к mcp__todoist__* tools — ВЫЗЫВАЙ ИХ НАПРЯМУЮ
-- НИКОГДА не пиши "MCP недоступен" или "добавь вручную"
-- Если tool вернул ошибку — покажи ТОЧНУЮ ошибку в отчёте
-
-USER REQUEST:
-{user_prompt}
-
-CRITICAL OUTPUT FORMAT:
-- Return ONLY raw HTML for Telegram (parse_mode=HTML)
-- NO markdown: no **, no ##, no ```, no tables, no -
-- Start with emoji and <b>header</b>
-- Allowed tags: <b>, <i>, <code>, <s>, <u>
-- Be concise - Telegram has 4096 char limit
-
-EXECUTION:
-1. Analyze the request
-2. Call MCP tools directly (mcp__todoist__*, read/write files)
-3. Return HTML status report with results"""
-
-        try:
-            env = os.environ.copy()
-            if self.todoist_api_key:
-                env["TODOIST_API_KEY"] = self.todoist_api_key
-
-            result = subprocess.run(
-                [
-                    "claude",
-                    "--print",
-                    "--dangerously-skip-permissions",
-                    "--mcp-config",
-                    str(self._mcp_config_path),
-                    "-p",
-                    prompt,
-                ],
-                cwd=self.vault_path.parent,
-                capture_output=True,
-                text=True,
-                timeout=DEFAULT_TIMEOUT,
-                check=False,
-                env=env,
-            )
-
-            if result.returncode != 0:
-                logger.error(
-                    "Claude execution failed (rc=%d): stderr=%s stdout=%s",
-                    result.returncode,
-                    result.stderr,
-                    result.stdout,
-                )
+        cache = self._response_cache
+        if cache is not None and is_read_only(user_prompt):
+            hit = cache.get(user_prompt, user_id)
+            if hit is not None:
+                cached, age = hit
+                logger.info("Answering /do from cache (%.0fs old)", age)
                 return {
-                    "error": result.stderr or result.stdout or "Claude execution failed",
-                    "processed_entries": 0,
+                    **cached,
+                    "report": f"{cached['report']}\n\n"
+                    f"<i>⚡ из кэша, {int(age) // 60} мин назад</i>",
+                    "cached": True,
                 }
+        else:
+            cache = None
 
-            return {
-                "report": result.stdout.strip(),
-                "processed_entries": 1,
-            }
-
-        except subprocess.TimeoutExpired:
-            logger.error("Claude execution timed out")
-            return {"error": "Execution timed out", "processed_entries": 0}
-        except FileNotFoundError:
-            logger.error("Claude CLI not found")
-            return {"error": "Claude CLI not installed", "processed_entries": 0}
-        except Exception as e:
-            logger.exception("Unexpected error during execution")
-            return {"error": str(e), "processed_entries": 0}
+        today = date.today()
 
-    def generate_market_digest(self, market_table: str) -> dict[str, Any]:
+        # Fit reference and session context into the token budget
+        context = ContextBuilder(user_prompt, self.prompt_token_budget)
+        context.require(PromptSection("role", EXECUTE_ROLE))
+        context.optional(
+            "todoist",
+            split_markdown_sections(self._load_todoist_reference()),
+            static=True,
+            lead_bonus=1.0,
+            header="=== TODOIST REFERENCE ===",
+            footer="=== END REFERENCE ===",
+        )
+        context.require(PromptSection("rules", EXECUTE_RULES))
+        context.require(self._format_section(HTML_FORMAT, JSON_FORMAT))
+        context.optional(
+            "digest",
+            split_markdown_sections(self._load_digest()),
+            static=True,
+            header=DIGEST_HEADER,
+            footer=DIGEST_FOOTER,
+        )
+        context.require(
+            PromptSection(
+                "context",
+                f"""CONTEXT:
+- Текущая дата: {today}
+- Vault path: {self.vault_path}""",
+                static=False,
+            )
+        )
+        context.optional(
+            "session",
+            self._get_session_lines(user_id),
+            recency=True,
+            header="=== TODAY'S SESSION ===",
+            footer="=== END SESSION ===",
+            separator="\n",
+        )
+        context.require(
+            PromptSection("request", f"USER REQUEST:\n{user_prompt}", static=False)
+        )
+
+        prompt = assemble("Execution", context.build("Execution"))
+
+        result = await self._runner.run(
+            prompt, label="Execution", on_event=on_event, interactive=True
+        )
+        self._render_structured(result)
+        if cache is not None and "error" not in result:
+            cache.put(user_prompt, user_id, result)
+        return result
+
+    async def generate_market_digest(
+        self,
+        market_table: str,
+        on_event: EventCallback | None = None,
+    ) -> dict[str, Any]:
         """Generate morning market digest with Claude as financial analyst.
 
         Args:
             market_table: Pre-formatted price table from market.py
+            on_event: Optional callback for streamed progress events
 
         Returns:
             Report dict with 'report' key containing Telegram HTML
         """
         today = date.today()
 
-        prompt = f"""Ты — опытный финансовый аналитик. Сегодня {today}.
-
-АКТУАЛЬНЫЕ РЫНОЧНЫЕ ДАННЫЕ (цены закрытия + изменение за день):
-{market_table}
-
-ТВОЯ ЗАДАЧА:
-Используй WebSearch для поиска актуальных новостей и выдай глубокую аналитическую сводку.
-
-ШАГ 1 — Поиск (обязательно):
-- Ищи: "market trends {today}" "hot sectors week" "upcoming IPO 2026"
-- Ищи: "rare earth metals trend" "uranium stocks outlook" "semiconductor market"
-- Ищи: "AI supply chain datacenter cooling power" "quantum computing breakthrough"
-- Ищи: "mining M&A Latin America Africa lithium cobalt"
-- Ищи: "Kazakhstan economy" "KSPI stock" "KASE index"
-- Ищи новости по секторам с наибольшим движением из данных выше
-
-ШАГ 2 — Анализ трендов (главное!):
-Твоя ключевая задача — поймать тренд заранее, как это было:
-• Золото: тренд начался → рост +30%
-• Сейчас: редкоземельные металлы, уран, ИИ-полупроводники
-• Что СЛЕДУЮЩЕЕ? Квантовые вычисления? Ядерная энергетика? Недвижимость?
-
-Дополнительные углы для анализа:
-• Цепочка поставок ИИ: не только чипы — смотри на питание/охлаждение дата-центров
-• Ресурсная геополитика: кто скупает месторождения лития/кобальта в Латинской Америке и Африке
-• DXY: ослабление доллара → рост EM-акций и сырья. Следи за корреляцией
-• Японские торговые дома (Mitsui, Mitsubishi, Sumitomo) — индикатор сырьевых трендов
-• Сигнал к выходу: изменения ставки ФРС, геополитические риски, снижение кредитных рейтингов
-
-ШАГ 3 — Контекст для Казахстана:
-- KZ экономика зависит от нефти, урана, меди, зерна
-- KSPI (Kaspi) — главная KZ компания на NASDAQ
-- USD/KZT курс влияет на покупательную способность
-- Санкции не касаются KZ рынка, но влияют косвенно
-
-ФОРМАТ ОТВЕТА — только HTML для Telegram:
-
-📊 <b>Аналитика {today}</b>
-
-<b>Рынки сегодня:</b>
-[топ движения дня — только самые значимые изменения, 4-5 строк]
-
-<b>🔥 Главный тренд сейчас:</b>
-[1-2 абзаца: что горячее, почему, сколько ещё может расти]
-
-<b>🚀 Следующий тренд — что искать:</b>
-[твой прогноз: какой сектор/актив начинает набирать силу]
-
-<b>📅 Ближайшие IPO и события:</b>
-[конкретные названия компаний, даты если нашёл]
-
-<b>🇰🇿 Для Казахстана:</b>
-[как текущие тренды влияют на KZ, что учитывать]
-
-<b>⚡ Что изучить сегодня:</b>
-[3-5 конкретных тикеров или тем для исследования]
-
-<b>⚠️ Сигнал к выходу:</b>
-[риски: ФРС, геополитика, кредитные рейтинги — только если есть реальные сигналы]
-
-ПРАВИЛА ФОРМАТА:
-- NO markdown: no **, no ##, no ```, no таблицы
-- Allowed tags: <b>, <i>, <code>, <s>, <u>
-- Telegram limit 4096 chars — будь ёмким
-- Пиши на русском языке
-- Конкретика важнее общих слов"""
-
-        try:
-            env = os.environ.copy()
-
-            result = subprocess.run(
-                [
-                    "claude",
-                    "--print",
-                    "--dangerously-skip-permissions",
-                    "--mcp-config",
-                    str(self._mcp_config_path),
-                    "-p",
-                    prompt,
-                ],
-                cwd=self.vault_path.parent,
-                capture_output=True,
-                text=True,
-                timeout=DEFAULT_TIMEOUT,
-                check=False,
-                env=env,
-            )
-
-            if result.returncode != 0:
-                logger.error(
-                    "Market digest failed (rc=%d): stderr=%s stdout=%s",
-                    result.returncode,
-                    result.stderr,
-                    result.stdout,
-                )
-                return {
-                    "error": result.stderr or result.stdout or "Market digest failed",
-                    "processed_entries": 0,
-                }
-
-            return {"report": result.stdout.strip(), "processed_entries": 1}
+        prompt = assemble(
+            "Market digest",
+            [
+                PromptSection("rules", MARKET_RULES),
+                PromptSection(
+                    "data",
+                    f"""Сегодня {today}.
+
+АКТУАЛЬНЫЕ РЫНОЧНЫЕ ДАННЫЕ (цены закрытия, изменение за день, индикаторы):
+{market_table}""",
+                    static=False,
+                ),
+            ],
+        )
+
+        return await self._runner.run(
+            prompt, label="Market digest", with_todoist=False, on_event=on_event
+        )
+
+    async def generate_weekly(
+        self, on_event: EventCallback | None = None
+    ) -> dict[str, Any]:
+        """Generate weekly digest with Claude.
 
-        except subprocess.TimeoutExpired:
-            logger.error("Market digest timed out")
-            return {"error": "Market digest timed out", "processed_entries": 0}
-        except FileNotFoundError:
-            logger.error("Claude CLI not found")
-            return {"error": "Claude CLI not installed", "processed_entries": 0}
-        except Exception as e:
-            logger.exception("Unexpected error during market digest")
-            return {"error": str(e), "processed_entries": 0}
+        The week's data (daily rollups or entry excerpts, session stats,
+        weekly goals, last week's summary) is collected locally and
+        embedded in the prompt, so Claude doesn't crawl the vault itself.
 
-    def generate_weekly(self) -> dict[str, Any]:
-        """Generate weekly digest with Claude.
+        Args:
+            on_event: Optional callback for streamed progress events
 
         Returns:
             Weekly digest report as dict
         """
         today = date.today()
 
-        prompt = f"""Сегодня {today}. Сгенерируй недельный дайджест.
-
-ПЕРВЫМ ДЕЛОМ: вызови mcp__todoist__user-info чтобы убедиться что MCP работает.
-
-CRITICAL MCP RULE:
-- ТЫ ИМЕЕШЬ ДОСТУП к mcp__todoist__* tools — ВЫЗЫВАЙ ИХ НАПРЯМУЮ
-- НИКОГДА не пиши "MCP недоступен" или "добавь вручную"
-- Для выполненных задач: вызови mcp__todoist__find-completed-tasks tool
-- Если tool вернул ошибку — покажи ТОЧНУЮ ошибку в отчёте
-
-WORKFLOW:
-1. Собери данные за неделю (daily файлы в vault/daily/, completed tasks через MCP)
-2. Проанализируй прогресс по целям (goals/3-weekly.md)
-3. Определи победы и вызовы
-4. Сгенерируй HTML отчёт
-
-CRITICAL OUTPUT FORMAT:
-- Return ONLY raw HTML for Telegram (parse_mode=HTML)
-- NO markdown: no **, no ##, no ```, no tables
-- Start with 📅 <b>Недельный дайджест</b>
-- Allowed tags: <b>, <i>, <code>, <s>, <u>
-- Be concise - Telegram has 4096 char limit"""
-
+        prompt = assemble(
+            "Weekly digest",
+            [
+                PromptSection("rules", WEEKLY_RULES),
+                self._format_section(HTML_FORMAT, JSON_FORMAT),
+                PromptSection(
+                    "date",
+                    f"Сегодня {today}. Сгенерируй недельный дайджест.",
+                    static=False,
+                ),
+                PromptSection(
+                    "data",
+                    build_weekly_dataset(self.vault_path, today),
+                    static=False,
+                ),
+            ],
+        )
+
+        result = await self._runner.run(
+            prompt, label="Weekly digest", on_event=on_event
+        )
+        if "error" in result:
+            return result
+        structured = self._render_structured(result)
+
+        # Save to summaries/ and update MOC
         try:
-            env = os.environ.copy()
-            if self.todoist_api_key:
-                env["TODOIST_API_KEY"] = self.todoist_api_key
-
-            result = subprocess.run(
-                [
-                    "claude",
-                    "--print",
-                    "--dangerously-skip-permissions",
-                    "--mcp-config",
-                    str(self._mcp_config_path),
-                    "-p",
-                    prompt,
-                ],
-                cwd=self.vault_path.parent,
-                capture_output=True,
-                text=True,
-                timeout=DEFAULT_TIMEOUT,
-                check=False,
-                env=env,
+            summary_path = self._save_weekly_summary(
+                result["report"],
+                today,
+                render_markdown(structured) if structured is not None else None,
             )
-
-            if result.returncode != 0:
-                logger.error(
-                    "Weekly digest failed (rc=%d): stderr=%s stdout=%s",
-                    result.returncode,
-                    result.stderr,
-                    result.stdout,
-                )
-                return {
-                    "error": result.stderr or result.stdout or "Weekly digest failed",
-                    "processed_entries": 0,
-                }
-
-            output = result.stdout.strip()
-
-            # Save to summaries/ and update MOC
-            try:
-                summary_path = self._save_weekly_summary(output, today)
-                self._update_weekly_moc(summary_path)
-            except Exception as e:
-                logger.warning("Failed to save weekly summary: %s", e)
-
-            return {
-                "report": output,
-                "processed_entries": 1,
-            }
-
-        except subprocess.TimeoutExpired:
-            logger.error("Weekly digest timed out")
-            return {"error": "Weekly digest timed out", "processed_entries": 0}
-        except FileNotFoundError:
-            logger.error("Claude CLI not found")
-            return {"error": "Claude CLI not installed", "processed_entries": 0}
+            self._update_weekly_moc(summary_path)
         except Exception as e:
-            logger.exception("Unexpected error during weekly digest")
-            return {"error": str(e), "processed_entries": 0}
+            logger.warning("Failed to save weekly summary: %s", e)
+
+        return result
@@ -0,0 +1,42 @@
+"""Process-tree termination for Claude subprocesses.
+
+Claude is started in its own session (start_new_session=True), so the MCP
+servers it spawns share its process group and can be stopped together.
+"""
+
+import asyncio
+import contextlib
+import logging
+import os
+import signal
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait after SIGTERM before sending SIGKILL
+TERMINATE_GRACE = 5.0
+
+
+async def kill_process_tree(
+    proc: asyncio.subprocess.Process,
+    grace: float = TERMINATE_GRACE,
+) -> None:
+    """Terminate a process and everything in its process group, then reap it.
+
+    Sends SIGTERM to the group, and SIGKILL if the process is still alive
+    after `grace` seconds.
+    """
+    if proc.returncode is not None:
+        # Leader is gone, but MCP servers in its group may still be running
+        with contextlib.suppress(ProcessLookupError, PermissionError):
+            os.killpg(proc.pid, signal.SIGKILL)
+        return
+
+    with contextlib.suppress(ProcessLookupError, PermissionError):
+        os.killpg(proc.pid, signal.SIGTERM)
+    try:
+        await asyncio.wait_for(proc.wait(), grace)
+    except TimeoutError:
+        logger.warning("Process %d ignored SIGTERM, killing", proc.pid)
+    with contextlib.suppress(ProcessLookupError, PermissionError):
+        os.killpg(proc.pid, signal.SIGKILL)
+    await proc.wait()
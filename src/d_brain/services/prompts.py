@@ -0,0 +1,257 @@
+"""Prompt assembly with a cache-friendly layout.
+
+Prompts are built from sections: large static ones (skill instructions,
+references, rules) go first and per-request data (dates, entries, session,
+the user request) last, so that repeated runs share a byte-identical
+prefix that upstream prompt caching can reuse. Skill and reference files
+are cached in memory and re-read only when their mtime changes.
+"""
+
+import hashlib
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+SKILL_PATH = ".claude/skills/dbrain-processor/SKILL.md"
+TODOIST_REFERENCE_PATH = ".claude/skills/dbrain-processor/references/todoist.md"
+
+# path -> (mtime_ns, size, content)
+_file_cache: dict[Path, tuple[int, int, str]] = {}
+
+# label -> prefix hash -> times built
+_prefix_stats: dict[str, dict[str, int]] = {}
+
+
+def read_cached(path: Path) -> str:
+    """Read a text file, reusing the cached content while it is unchanged.
+
+    Args:
+        path: File to read
+
+    Returns:
+        File content, or "" if the file doesn't exist
+    """
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        _file_cache.pop(path, None)
+        return ""
+    cached = _file_cache.get(path)
+    if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        return cached[2]
+    content = path.read_text()
+    _file_cache[path] = (stat.st_mtime_ns, stat.st_size, content)
+    return content
+
+
+@dataclass
+class PromptSection:
+    """A named block of prompt text."""
+
+    name: str
+    text: str
+    static: bool = True  # identical across requests
+
+
+def assemble(label: str, sections: list[PromptSection]) -> str:
+    """Join sections into a prompt, static ones first.
+
+    Logs the hash of the static prefix and how often it was reused, so
+    cache-unfriendly changes show up as a new hash on every request.
+
+    Args:
+        label: Prompt kind for logging (e.g. "Processing")
+        sections: Sections in their intended order within each group
+
+    Returns:
+        Prompt text
+    """
+    static = [s.text for s in sections if s.static and s.text]
+    dynamic = [s.text for s in sections if not s.static and s.text]
+    prefix = "\n\n".join(static)
+    prompt = "\n\n".join([prefix, *dynamic]) if prefix else "\n\n".join(dynamic)
+
+    prefix_hash = hashlib.sha256(prefix.encode("utf-8")).hexdigest()[:12]
+    seen = _prefix_stats.setdefault(label, {})
+    reused = seen.get(prefix_hash, 0)
+    seen[prefix_hash] = reused + 1
+    logger.info(
+        "%s prompt: prefix %s (%d of %d chars static), reused %d time(s)",
+        label,
+        prefix_hash,
+        len(prefix),
+        len(prompt),
+        reused,
+    )
+    return prompt
+
+
+def prefix_stats() -> dict[str, dict[str, int]]:
+    """Builds per static prefix hash, per prompt label."""
+    return {label: dict(hashes) for label, hashes in _prefix_stats.items()}
+
+
+MCP_RULES = """ПЕРВЫМ ДЕЛОМ: вызови mcp__todoist__user-info чтобы убедиться что MCP работает.
+
+CRITICAL MCP RULE:
+- ТЫ ИМЕЕШЬ ДОСТУП к mcp__todoist__* tools — ВЫЗЫВАЙ ИХ НАПРЯМУЮ
+- НИКОГДА не пиши "MCP недоступен" или "добавь вручную\""""
+
+DAILY_RULES = f"""ЗАДАЧА: ежедневная обработка новых записей из daily-файла.
+Дата и записи приведены в конце промпта.
+Заголовок отчёта: 📊 Обработка за YYYY-MM-DD (дата обработки).
+
+{MCP_RULES}
+- Для задач: вызови mcp__todoist__add-tasks tool
+- Если tool вернул ошибку — покажи ТОЧНУЮ ошибку в отчёте
+
+Обработай ТОЛЬКО записи из блока НОВЫЕ ЗАПИСИ — более ранние уже обработаны.
+НЕ редактируй daily-файл: учёт обработанных записей ведётся автоматически.
+Комментарий <!-- class: категория уверенность --> в записи — подсказка
+локального классификатора (tasks — вероятно задача для Todoist); решай сам."""
+
+ROLLUP_FIELDS = """- decisions: ключевые решения из записей, коротко
+- completed_tasks: что отмечено выполненным
+- created_tasks: задачи, созданные в Todoist
+- goal_touches: цели из goals/, которых касались записи
+- thoughts: пути заметок, сохранённых в vault"""
+
+HTML_FORMAT = """CRITICAL OUTPUT FORMAT:
+- Return ONLY raw HTML for Telegram (parse_mode=HTML)
+- NO markdown: no **, no ##, no ```, no tables, no -
+- Start with emoji and <b>header</b>
+- Allowed tags: <b>, <i>, <code>, <s>, <u>
+- Be concise - Telegram has 4096 char limit"""
+
+DAILY_HTML_FORMAT = f"""{HTML_FORMAT}
+
+ROLLUP (для недельного дайджеста, из отчёта вырезается автоматически):
+В самом конце ответа, после отчёта, добавь JSON в теге <rollup>:
+<rollup>{{"decisions": [], "completed_tasks": [], "created_tasks": [],
+"goal_touches": [], "thoughts": []}}</rollup>
+{ROLLUP_FIELDS}"""
+
+# Structured mode: the report is rendered locally (services/report.py)
+JSON_FORMAT = """CRITICAL OUTPUT FORMAT:
+- Return ONLY one JSON object: no text around it, no ``` fences
+- Plain text in all strings: no HTML, no markdown
+- Schema:
+{"emoji": "📊", "title": "заголовок отчёта",
+ "sections": [{"emoji": "✅", "title": "Задачи",
+   "items": [{"text": "Купить молоко", "task_id": "123", "done": false}]}],
+ "errors": ["ТОЧНЫЙ текст ошибки tool"],
+ "footer": "необязательная строка в конце"}
+- task_id: id задачи Todoist, если пункт — созданная или изменённая задача
+- done: true, если пункт выполнен
+- Be concise - Telegram has 4096 char limit"""
+
+DAILY_JSON_FORMAT = f"""{JSON_FORMAT}
+
+ROLLUP (для недельного дайджеста): добавь в объект ключ "rollup":
+{{"decisions": [], "completed_tasks": [], "created_tasks": [],
+"goal_touches": [], "thoughts": []}}
+{ROLLUP_FIELDS}"""
+
+DIGEST_HEADER = """=== VAULT DIGEST ===
+Выжимка vault, обновляется автоматически: цели, открытые обязательства,
+последние заметки, MOC. Используй её вместо чтения goals/, MEMORY.md, MOC/
+и thoughts/; открывай эти файлы, только если их нужно изменить."""
+DIGEST_FOOTER = "=== END DIGEST ==="
+
+EXECUTE_ROLE = "Ты - персональный ассистент d-brain."
+
+EXECUTE_RULES = f"""{MCP_RULES}
+- Если tool вернул ошибку — покажи ТОЧНУЮ ошибку в отчёте
+
+EXECUTION:
+1. Analyze the request (USER REQUEST at the end)
+2. Call MCP tools directly (mcp__todoist__*, read/write files)
+3. Return a status report with results (emoji and short header)"""
+
+WEEKLY_RULES = """ЗАДАЧА: сгенерируй недельный дайджест.
+Заголовок отчёта: 📅 Недельный дайджест.
+
+ДАННЫЕ: всё за неделю уже собрано в блоке WEEKLY DATA в конце промпта —
+записи и сводки по дням, статистика сессий, цели недели, итоги прошлой недели.
+- НЕ читай daily-файлы, goals/ и summaries/ — их содержимое уже в блоке
+- mcp__todoist__* tools доступны, вызывай их только если нужно
+  обновить задачи; если tool вернул ошибку — покажи ТОЧНУЮ ошибку в отчёте
+
+WORKFLOW:
+1. Проанализируй прогресс по целям недели
+2. Сравни с итогами прошлой недели
+3. Определи победы и вызовы
+4. Сгенерируй отчёт"""
+
+MARKET_RULES = """Ты — опытный финансовый аналитик.
+Сегодняшняя дата и актуальные рыночные данные приведены в конце промпта.
+
+ТВОЯ ЗАДАЧА:
+Используй WebSearch для поиска актуальных новостей и выдай глубокую аналитическую сводку.
+
+ШАГ 1 — Поиск (обязательно):
+- Ищи: "market trends <сегодняшняя дата>" "hot sectors week" "upcoming IPO 2026"
+- Ищи: "rare earth metals trend" "uranium stocks outlook" "semiconductor market"
+- Ищи: "AI supply chain datacenter cooling power" "quantum computing breakthrough"
+- Ищи: "mining M&A Latin America Africa lithium cobalt"
+- Ищи: "Kazakhstan economy" "KSPI stock" "KASE index"
+- Ищи новости по секторам с наибольшим движением из рыночных данных
+
+ШАГ 2 — Анализ трендов (главное!):
+Индикаторы в рыночных данных уже посчитаны по истории цен — опирайся на них,
+не пересчитывай: доходность 5д/1м/3м, годовая волатильность, MA20/MA50 и
+их пересечения, сила к медиане сектора за 1м (п.п.), #место в рейтинге
+тренда; в [Сигналы] — рейтинг, пересечения и сильные корреляции с DXY и
+золотом за 3 месяца.
+
+Твоя ключевая задача — поймать тренд заранее, как это было:
+• Золото: тренд начался → рост +30%
+• Сейчас: редкоземельные металлы, уран, ИИ-полупроводники
+• Что СЛЕДУЮЩЕЕ? Квантовые вычисления? Ядерная энергетика? Недвижимость?
+
+Дополнительные углы для анализа:
+• Цепочка поставок ИИ: не только чипы — смотри на питание/охлаждение дата-центров
+• Ресурсная геополитика: кто скупает месторождения лития/кобальта в Латинской Америке и Африке
+• DXY: ослабление доллара → рост EM-акций и сырья. Следи за корреляцией
+• Японские торговые дома (Mitsui, Mitsubishi, Sumitomo) — индикатор сырьевых трендов
+• Сигнал к выходу: изменения ставки ФРС, геополитические риски, снижение кредитных рейтингов
+
+ШАГ 3 — Контекст для Казахстана:
+- KZ экономика зависит от нефти, урана, меди, зерна
+- KSPI (Kaspi) — главная KZ компания на NASDAQ
+- USD/KZT курс влияет на покупательную способность
+- Санкции не касаются KZ рынка, но влияют косвенно
+
+ФОРМАТ ОТВЕТА — только HTML для Telegram:
+
+📊 <b>Аналитика YYYY-MM-DD</b> (сегодняшняя дата)
+
+<b>Рынки сегодня:</b>
+[топ движения дня — только самые значимые изменения, 4-5 строк]
+
+<b>🔥 Главный тренд сейчас:</b>
+[1-2 абзаца: что горячее, почему, сколько ещё может расти]
+
+<b>🚀 Следующий тренд — что искать:</b>
+[твой прогноз: какой сектор/актив начинает набирать силу]
+
+<b>📅 Ближайшие IPO и события:</b>
+[конкретные названия компаний, даты если нашёл]
+
+<b>🇰🇿 Для Казахстана:</b>
+[как текущие тренды влияют на KZ, что учитывать]
+
+<b>⚡ Что изучить сегодня:</b>
+[3-5 конкретных тикеров или тем для исследования]
+
+<b>⚠️ Сигнал к выходу:</b>
+[риски: ФРС, геополитика, кредитные рейтинги — только если есть реальные сигналы]
+
+ПРАВИЛА ФОРМАТА:
+- NO markdown: no **, no ##, no ```, no таблицы
+- Allowed tags: <b>, <i>, <code>, <s>, <u>
+- Telegram limit 4096 chars — будь ёмким
+- Пиши на русском языке
+- Конкретика важнее общих слов"""
@@ -0,0 +1,154 @@
+"""Structured (JSON) reports rendered locally.
+
+In structured mode Claude returns a JSON object instead of Telegram HTML:
+a title, sections of plain-text items (optionally with Todoist task ids)
+and errors. The renderers below turn it into HTML that is valid for
+Telegram by construction and into Markdown for vault summaries, so
+structured reports skip sanitizing, validation and HTML→Markdown
+conversion.
+"""
+
+import html
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ReportItem:
+    """One line of a report section."""
+
+    text: str
+    task_id: str = ""  # Todoist task id, if the item is a task
+    done: bool = False
+
+
+@dataclass
+class ReportSection:
+    """A titled group of items."""
+
+    title: str
+    items: list[ReportItem] = field(default_factory=list)
+    emoji: str = ""
+
+
+@dataclass
+class StructuredReport:
+    """A report as returned by Claude in structured mode."""
+
+    title: str
+    emoji: str = ""
+    sections: list[ReportSection] = field(default_factory=list)
+    errors: list[str] = field(default_factory=list)
+    footer: str = ""
+    rollup: dict[str, Any] = field(default_factory=dict)
+
+
+def _text(value: Any) -> str:
+    return str(value).strip() if value is not None else ""
+
+
+def _item(raw: Any) -> ReportItem | None:
+    if isinstance(raw, dict):
+        text = _text(raw.get("text"))
+        if not text:
+            return None
+        return ReportItem(text, _text(raw.get("task_id")), bool(raw.get("done")))
+    text = _text(raw)
+    return ReportItem(text) if text else None
+
+
+def parse_report(text: str) -> StructuredReport | None:
+    """Parse Claude's JSON report.
+
+    Tolerates text or code fences around the object.
+
+    Args:
+        text: Claude output
+
+    Returns:
+        Parsed report, or None if the output isn't a report object
+    """
+    start, end = text.find("{"), text.rfind("}")
+    if start < 0 or end <= start:
+        return None
+    try:
+        data = json.loads(text[start : end + 1])
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(data, dict) or not (data.get("title") or data.get("sections")):
+        return None
+
+    sections = []
+    for raw in data.get("sections") or []:
+        if not isinstance(raw, dict):
+            continue
+        items = [i for i in map(_item, raw.get("items") or []) if i is not None]
+        title = _text(raw.get("title"))
+        if title or items:
+            sections.append(ReportSection(title, items, _text(raw.get("emoji"))))
+
+    errors = data.get("errors")
+    if not isinstance(errors, list):
+        errors = []
+    rollup = data.get("rollup")
+    return StructuredReport(
+        title=_text(data.get("title")),
+        emoji=_text(data.get("emoji")),
+        sections=sections,
+        errors=[_text(e) for e in errors if _text(e)],
+        footer=_text(data.get("footer")),
+        rollup=rollup if isinstance(rollup, dict) else {},
+    )
+
+
+def _heading(emoji: str, title: str) -> str:
+    return f"{emoji} {title}".strip()
+
+
+def render_html(report: StructuredReport) -> str:
+    """Render a report as Telegram HTML."""
+    e = html.escape
+    parts = [f"<b>{e(_heading(report.emoji, report.title))}</b>"]
+    for section in report.sections:
+        lines = []
+        if section.title:
+            lines.append(f"<b>{e(_heading(section.emoji, section.title))}</b>")
+        for item in section.items:
+            line = f"{'✅' if item.done else '•'} {e(item.text)}"
+            if item.task_id:
+                line += f" <code>{e(item.task_id)}</code>"
+            lines.append(line)
+        parts.append("\n".join(lines))
+    if report.errors:
+        errors = [f"<code>{e(err)}</code>" for err in report.errors]
+        parts.append("\n".join(["❌ <b>Ошибки:</b>", *errors]))
+    if report.footer:
+        parts.append(f"<i>{e(report.footer)}</i>")
+    return "\n\n".join(parts)
+
+
+def render_markdown(report: StructuredReport) -> str:
+    """Render a report as Obsidian Markdown."""
+    parts = [f"# {_heading(report.emoji, report.title)}"]
+    for section in report.sections:
+        lines = []
+        if section.title:
+            lines.append(f"## {_heading(section.emoji, section.title)}")
+        for item in section.items:
+            checkbox = item.task_id or item.done
+            line = f"- [{'x' if item.done else ' '}] " if checkbox else "- "
+            line += item.text
+            if item.task_id:
+                line += f" (`{item.task_id}`)"
+            lines.append(line)
+        parts.append("\n".join(lines))
+    if report.errors:
+        errors = [f"- `{err}`" for err in report.errors]
+        parts.append("\n".join(["## ❌ Ошибки", *errors]))
+    if report.footer:
+        parts.append(f"*{report.footer}*")
+    return "\n\n".join(parts) + "\n"
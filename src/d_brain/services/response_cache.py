@@ -0,0 +1,111 @@
+"""Cache of /do answers to read-only requests.
+
+Entries are keyed by the normalized request, the user and a fingerprint of
+the vault inputs (daily files, goals, git HEAD), so any change to them is
+a miss. Entries also expire after a TTL, since answers can depend on
+Todoist state the fingerprint doesn't see, and the cache is cleared on
+every daily-file append.
+"""
+
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from datetime import date
+from pathlib import Path
+from typing import Any
+
+from d_brain.services.intents import normalize
+from d_brain.services.storage import add_append_listener
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 64
+
+# key -> (stored at, result); shared by all caches in this process
+_entries: OrderedDict[str, tuple[float, dict[str, Any]]] = OrderedDict()
+_listening = False
+
+
+def invalidate(*_: Any) -> None:
+    """Drop all cached answers."""
+    if _entries:
+        logger.info("Response cache invalidated (%d entries)", len(_entries))
+    _entries.clear()
+
+
+def _git_head(path: Path) -> str:
+    """Commit id of HEAD of the git repo containing path ("" if none)."""
+    for directory in [path, *path.parents]:
+        git_dir = directory / ".git"
+        if not git_dir.is_dir():
+            continue
+        try:
+            head = (git_dir / "HEAD").read_text(encoding="utf-8").strip()
+            if not head.startswith("ref: "):
+                return head
+            ref = head.removeprefix("ref: ")
+            ref_file = git_dir / ref
+            if ref_file.exists():
+                return ref_file.read_text(encoding="utf-8").strip()
+            packed = (git_dir / "packed-refs").read_text(encoding="utf-8")
+            for line in packed.splitlines():
+                if line.endswith(f" {ref}"):
+                    return line.split(" ", 1)[0]
+        except OSError:
+            pass
+        return ""
+    return ""
+
+
+class ResponseCache:
+    """TTL + LRU cache of Claude results for read-only /do requests."""
+
+    def __init__(
+        self,
+        vault_path: Path,
+        ttl: float,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+    ) -> None:
+        global _listening
+        self.vault_path = Path(vault_path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        if not _listening:
+            add_append_listener(invalidate)
+            _listening = True
+
+    def fingerprint(self) -> str:
+        """Hash of the vault inputs a /do answer may depend on."""
+        digest = hashlib.sha256(date.today().isoformat().encode())
+        for folder in ("daily", "goals"):
+            for path in sorted((self.vault_path / folder).glob("*.md")):
+                stat = path.stat()
+                stamp = f"{folder}/{path.name}:{stat.st_size}:{stat.st_mtime_ns};"
+                digest.update(stamp.encode())
+        digest.update(_git_head(self.vault_path).encode())
+        return digest.hexdigest()
+
+    def _key(self, prompt: str, user_id: int) -> str:
+        raw = f"{user_id}\0{normalize(prompt)}\0{self.fingerprint()}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, prompt: str, user_id: int) -> tuple[dict[str, Any], float] | None:
+        """Cached result and its age in seconds, or None on a miss."""
+        key = self._key(prompt, user_id)
+        cached = _entries.get(key)
+        if cached is None:
+            return None
+        stored_at, result = cached
+        age = time.time() - stored_at
+        if age > self.ttl:
+            del _entries[key]
+            return None
+        _entries.move_to_end(key)
+        return result, age
+
+    def put(self, prompt: str, user_id: int, result: dict[str, Any]) -> None:
+        """Store a successful result, evicting the least recently used."""
+        _entries[self._key(prompt, user_id)] = (time.time(), result)
+        while len(_entries) > self.max_entries:
+            _entries.popitem(last=False)
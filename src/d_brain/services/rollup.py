@@ -0,0 +1,132 @@
+"""Compact per-day rollups saved by daily processing.
+
+Claude appends a machine-readable <rollup>{...}</rollup> block to its daily
+report; it is cut from the report and merged into
+vault/.state/rollups/YYYY-MM-DD.json together with locally counted entry
+types. The weekly digest then reads seven small rollups instead of a
+week of raw daily files.
+"""
+
+import json
+import logging
+import os
+import re
+from dataclasses import asdict, dataclass, field
+from datetime import date
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_RE = re.compile(r"\s*<rollup>(.*?)</rollup>\s*", re.DOTALL)
+ENTRY_TYPE_RE = re.compile(r"^## \d{1,2}:\d{2} \[(\w+)", re.MULTILINE)
+
+# List fields Claude fills in; each keeps at most MAX_ITEMS unique items
+LIST_FIELDS = (
+    "decisions",
+    "completed_tasks",
+    "created_tasks",
+    "goal_touches",
+    "thoughts",
+)
+MAX_ITEMS = 30
+MAX_ITEM_CHARS = 200
+
+
+@dataclass
+class DailyRollup:
+    """What happened on one day, in a few hundred bytes."""
+
+    day: str
+    entries: int = 0
+    by_type: dict[str, int] = field(default_factory=dict)
+    decisions: list[str] = field(default_factory=list)
+    completed_tasks: list[str] = field(default_factory=list)
+    created_tasks: list[str] = field(default_factory=list)
+    goal_touches: list[str] = field(default_factory=list)
+    thoughts: list[str] = field(default_factory=list)
+
+    def merge(self, entries: list[str], data: dict[str, Any]) -> None:
+        """Add a processed batch: its entries and Claude's rollup data."""
+        self.entries += len(entries)
+        for entry in entries:
+            match = ENTRY_TYPE_RE.match(entry)
+            entry_type = match.group(1) if match else "unknown"
+            self.by_type[entry_type] = self.by_type.get(entry_type, 0) + 1
+        for name in LIST_FIELDS:
+            items: list[str] = getattr(self, name)
+            new = data.get(name)
+            if not isinstance(new, list):
+                continue
+            for item in new:
+                text = str(item).strip()[:MAX_ITEM_CHARS]
+                if text and text not in items and len(items) < MAX_ITEMS:
+                    items.append(text)
+
+    def detail_lines(self) -> list[str]:
+        """Claude's rollup items as compact prompt lines."""
+        titles = {
+            "decisions": "Решения",
+            "completed_tasks": "Выполнено",
+            "created_tasks": "Создано задач",
+            "goal_touches": "Цели",
+            "thoughts": "Заметки",
+        }
+        return [
+            f"{title}: " + "; ".join(getattr(self, name))
+            for name, title in titles.items()
+            if getattr(self, name)
+        ]
+
+
+def extract_rollup(report: str) -> tuple[str, dict[str, Any]]:
+    """Cut the <rollup> block out of a report.
+
+    Returns:
+        Tuple of (report without the block, parsed rollup data or {})
+    """
+    match = ROLLUP_RE.search(report)
+    if match is None:
+        return report, {}
+    cleaned = (report[: match.start()] + "\n" + report[match.end() :]).strip()
+    try:
+        data = json.loads(match.group(1))
+    except json.JSONDecodeError:
+        logger.warning("Unparseable rollup block in daily report")
+        return cleaned, {}
+    return cleaned, data if isinstance(data, dict) else {}
+
+
+class RollupStore:
+    """Daily rollups in vault/.state/rollups/."""
+
+    def __init__(self, vault_path: Path) -> None:
+        self.rollups_dir = Path(vault_path) / ".state" / "rollups"
+
+    def _path(self, day: date) -> Path:
+        return self.rollups_dir / f"{day.isoformat()}.json"
+
+    def get(self, day: date) -> DailyRollup | None:
+        """Get the rollup for a day, if one was saved."""
+        path = self._path(day)
+        if not path.exists():
+            return None
+        try:
+            raw = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return None
+        fields = set(DailyRollup.__dataclass_fields__)
+        return DailyRollup(**{k: v for k, v in raw.items() if k in fields})
+
+    def add(self, day: date, entries: list[str], data: dict[str, Any]) -> None:
+        """Merge a processed batch into the day's rollup and save it."""
+        rollup = self.get(day) or DailyRollup(day=day.isoformat())
+        rollup.merge(entries, data)
+        self.rollups_dir.mkdir(parents=True, exist_ok=True)
+        path = self._path(day)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(
+            json.dumps(asdict(rollup), ensure_ascii=False, indent=2),
+            encoding="utf-8",
+        )
+        os.replace(tmp_path, path)
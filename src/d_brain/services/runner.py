@@ -0,0 +1,460 @@
+"""Async Claude CLI runner shared by all processor entry points."""
+
+import asyncio
+import contextlib
+import inspect
+import json
+import logging
+import os
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from d_brain.services.ledger import (
+    CANCELLED,
+    ERROR,
+    OK,
+    TIMEOUT,
+    RunLedger,
+    RunRecord,
+)
+from d_brain.services.proctree import kill_process_tree
+from d_brain.services.worker_pool import ClaudeWorker, get_worker_pool
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 1200  # 20 minutes
+DEFAULT_MAX_CONCURRENCY = 3  # two for background runs, one kept for /do
+
+# stream-json lines carry whole tool results, which easily exceed the
+# default 64 KiB StreamReader line limit.
+STREAM_LINE_LIMIT = 16 * 1024 * 1024
+
+
+@dataclass
+class ClaudeEvent:
+    """Progress event parsed from Claude's stream-json output.
+
+    kind is "text" for a chunk of assistant text or "tool" for a tool call,
+    in which case text holds the tool name (e.g. mcp__todoist__add-tasks).
+    """
+
+    kind: str
+    text: str
+
+
+EventCallback = Callable[[ClaudeEvent], Awaitable[None] | None]
+
+
+class _Slots:
+    """Claude subprocess slots, with one held back for interactive runs.
+
+    Batch and scheduled runs (chunks, backfill, digests) may take at most
+    limit - 1 slots, so a /do request never queues behind a full set of
+    them, and while an interactive run is waiting no other run may start.
+    With a limit of 1 everything shares the single slot.
+    """
+
+    def __init__(self, limit: int) -> None:
+        self.limit = max(1, limit)
+        self.background_limit = background_limit(limit)
+        self.busy = 0
+        self.background = 0
+        self._interactive_waiting = 0
+        self._changed = asyncio.Condition()
+
+    def _available(self, interactive: bool) -> bool:
+        if self.busy >= self.limit:
+            return False
+        if interactive:
+            return True
+        return (
+            self.background < self.background_limit and self._interactive_waiting == 0
+        )
+
+    @contextlib.asynccontextmanager
+    async def hold(self, interactive: bool) -> AsyncIterator[None]:
+        """Wait for a slot and keep it for the duration of the block."""
+        async with self._changed:
+            if interactive:
+                self._interactive_waiting += 1
+            try:
+                await self._changed.wait_for(lambda: self._available(interactive))
+            finally:
+                if interactive:
+                    self._interactive_waiting -= 1
+                    # A background run may have been held back only by us
+                    self._changed.notify_all()
+            self.busy += 1
+            if not interactive:
+                self.background += 1
+        try:
+            yield
+        finally:
+            async with self._changed:
+                self.busy -= 1
+                if not interactive:
+                    self.background -= 1
+                self._changed.notify_all()
+
+
+def background_limit(max_concurrency: int) -> int:
+    """Claude processes that batch and scheduled runs may use at once."""
+    return max(1, max_concurrency - 1)
+
+
+# Process-wide cap on simultaneous Claude subprocesses. Processors are created
+# per request, so the slots live at module level to be shared by all.
+_slots: _Slots | None = None
+
+
+def _get_slots(limit: int) -> _Slots:
+    """Get the shared concurrency slots, creating them on first use."""
+    global _slots
+    if _slots is None:
+        _slots = _Slots(limit)
+    return _slots
+
+
+class ClaudeRunner:
+    """Runs `claude --print` as a native asyncio subprocess.
+
+    No executor thread is held while the job runs: the event loop waits on
+    the subprocess pipes directly, and a semaphore bounds how many Claude
+    processes may run at the same time, keeping one of them free for
+    interactive requests. When a warm worker pool is running,
+    Todoist jobs are dispatched to a pooled worker instead of a cold spawn.
+
+    With a ledger, every run is recorded there, and with adaptive_timeout
+    the timeout for each job type is derived from its recorded history.
+    """
+
+    def __init__(
+        self,
+        cwd: Path,
+        mcp_config_path: Path,
+        todoist_api_key: str = "",
+        timeout: float = DEFAULT_TIMEOUT,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        ledger: RunLedger | None = None,
+        adaptive_timeout: bool = False,
+        claude_bin: str = "claude",
+    ) -> None:
+        self.cwd = Path(cwd)
+        self.mcp_config_path = Path(mcp_config_path)
+        self.todoist_api_key = todoist_api_key
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.ledger = ledger
+        self.adaptive_timeout = adaptive_timeout
+        self.claude_bin = claude_bin
+
+    def _build_env(self, with_todoist: bool) -> dict[str, str]:
+        """Build subprocess environment, passing TODOIST_API_KEY if needed."""
+        env = os.environ.copy()
+        if with_todoist and self.todoist_api_key:
+            env["TODOIST_API_KEY"] = self.todoist_api_key
+        return env
+
+    def _build_args(self, prompt: str) -> list[str]:
+        return [
+            self.claude_bin,
+            "--print",
+            "--verbose",
+            "--output-format",
+            "stream-json",
+            "--dangerously-skip-permissions",
+            "--mcp-config",
+            str(self.mcp_config_path),
+            "-p",
+            prompt,
+        ]
+
+    async def run(
+        self,
+        prompt: str,
+        label: str,
+        with_todoist: bool = True,
+        on_event: EventCallback | None = None,
+        job_type: str | None = None,
+        interactive: bool = False,
+    ) -> dict[str, Any]:
+        """Run Claude with the given prompt.
+
+        Args:
+            prompt: Full prompt text
+            label: Human-readable job name used in logs and error messages
+            with_todoist: Whether to pass TODOIST_API_KEY to the subprocess
+            on_event: Optional callback for streamed text and tool-call events
+            job_type: Ledger and timeout key (default: label)
+            interactive: User-facing request that may use the reserved slot
+
+        Returns:
+            Dict with 'report' on success or 'error' on failure,
+            plus 'processed_entries'
+        """
+        job_type = job_type or label
+        timeout = self.timeout
+        if self.ledger is not None and self.adaptive_timeout:
+            timeout = self.ledger.timeout_for(job_type, self.timeout)
+
+        async with _get_slots(self.max_concurrency).hold(interactive):
+            pool = get_worker_pool()
+            worker = pool.acquire() if pool is not None and with_todoist else None
+            stream = _StreamState()
+            started = time.monotonic()
+            result: dict[str, Any] | None = None
+            try:
+                if worker is not None:
+                    result = await self._run_pooled(
+                        worker, prompt, label, on_event, stream, timeout
+                    )
+                else:
+                    result = await self._run(
+                        prompt, label, with_todoist, on_event, stream, timeout
+                    )
+                return result
+            finally:
+                self._record(job_type, started, stream, result, worker is not None)
+
+    def _record(
+        self,
+        job_type: str,
+        started: float,
+        stream: "_StreamState",
+        result: dict[str, Any] | None,
+        pooled: bool,
+    ) -> None:
+        """Write the run to the ledger (result None means cancelled)."""
+        if self.ledger is None:
+            return
+        if result is None:
+            status = CANCELLED
+        elif "error" in result:
+            status = TIMEOUT if stream.timed_out else ERROR
+        else:
+            status = OK
+        usage = stream.usage
+        self.ledger.append(
+            RunRecord(
+                job=job_type,
+                status=status,
+                wall=round(time.monotonic() - started, 3),
+                ttfo=(
+                    round(stream.first_output_at - started, 3)
+                    if stream.first_output_at is not None
+                    else None
+                ),
+                input_tokens=int(usage.get("input_tokens", 0)),
+                output_tokens=int(usage.get("output_tokens", 0)),
+                cache_read_tokens=int(usage.get("cache_read_input_tokens", 0)),
+                cache_creation_tokens=int(usage.get("cache_creation_input_tokens", 0)),
+                cost_usd=stream.cost_usd,
+                tool_calls=stream.tool_calls,
+                turns=stream.turns,
+                pooled=pooled,
+                error=str((result or {}).get("error", ""))[:300],
+            )
+        )
+
+    async def _run_pooled(
+        self,
+        worker: ClaudeWorker,
+        prompt: str,
+        label: str,
+        on_event: EventCallback | None,
+        stream: "_StreamState",
+        timeout: float,
+    ) -> dict[str, Any]:
+        pool = get_worker_pool()
+        try:
+            async with asyncio.timeout(timeout):
+                await worker.send(prompt)
+                while not stream.finished:
+                    line = await worker.readline()
+                    if not line:
+                        break  # Worker exited mid-job
+                    for event in stream.feed(line):
+                        await _emit(on_event, event)
+        except TimeoutError:
+            logger.error("%s timed out after %.0fs", label, timeout)
+            stream.timed_out = True
+            return {"error": f"{label} timed out", "processed_entries": 0}
+        finally:
+            if pool is not None:
+                await pool.release(worker, healthy=stream.finished)
+            else:
+                await worker.close()
+
+        output = stream.output()
+        if not stream.finished or stream.is_error:
+            stderr = worker.stderr_tail.decode("utf-8", errors="replace")
+            logger.error(
+                "%s failed in pooled worker: stderr=%s stdout=%s",
+                label,
+                stderr,
+                output,
+            )
+            return {
+                "error": output or stderr or f"{label} failed",
+                "processed_entries": 0,
+            }
+
+        return {"report": output.strip(), "processed_entries": 1}
+
+    async def _run(
+        self,
+        prompt: str,
+        label: str,
+        with_todoist: bool,
+        on_event: EventCallback | None,
+        stream: "_StreamState",
+        timeout: float,
+    ) -> dict[str, Any]:
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *self._build_args(prompt),
+                cwd=self.cwd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                env=self._build_env(with_todoist),
+                limit=STREAM_LINE_LIMIT,
+                start_new_session=True,  # own process group, see proctree
+            )
+        except FileNotFoundError:
+            logger.error("Claude CLI not found")
+            return {"error": "Claude CLI not installed", "processed_entries": 0}
+        except Exception as e:
+            logger.exception("Failed to start Claude for %s", label)
+            return {"error": str(e), "processed_entries": 0}
+
+        assert proc.stdout is not None and proc.stderr is not None
+        stderr_task = asyncio.create_task(proc.stderr.read())
+        try:
+            async with asyncio.timeout(timeout):
+                async for line in proc.stdout:
+                    for event in stream.feed(line):
+                        await _emit(on_event, event)
+                await proc.wait()
+                stderr_bytes = await stderr_task
+        except TimeoutError:
+            logger.error("%s timed out after %.0fs", label, timeout)
+            stream.timed_out = True
+            await self._kill(proc)
+            return {"error": f"{label} timed out", "processed_entries": 0}
+        except BaseException:
+            await self._kill(proc)
+            raise
+        finally:
+            if not stderr_task.done():
+                stderr_task.cancel()
+
+        stderr = stderr_bytes.decode("utf-8", errors="replace")
+        output = stream.output()
+
+        if proc.returncode != 0 or stream.is_error:
+            logger.error(
+                "%s failed (rc=%s): stderr=%s stdout=%s",
+                label,
+                proc.returncode,
+                stderr,
+                output,
+            )
+            return {
+                "error": stderr or output or f"{label} failed",
+                "processed_entries": 0,
+            }
+
+        return {"report": output.strip(), "processed_entries": 1}
+
+    @staticmethod
+    async def _kill(proc: asyncio.subprocess.Process) -> None:
+        """Kill the subprocess and its MCP servers, and reap it."""
+        await kill_process_tree(proc)
+
+
+async def _emit(callback: EventCallback | None, event: ClaudeEvent) -> None:
+    """Deliver event to callback, never letting it break the run."""
+    if callback is None:
+        return
+    try:
+        result = callback(event)
+        if inspect.isawaitable(result):
+            await result
+    except Exception:
+        logger.warning("Progress callback failed", exc_info=True)
+
+
+class _StreamState:
+    """Accumulates Claude stream-json lines into events and a final result."""
+
+    def __init__(self) -> None:
+        self.result: str | None = None
+        self.is_error = False
+        self.finished = False
+        self.timed_out = False
+        self.first_output_at: float | None = None
+        self.tool_calls = 0
+        self.turns = 0
+        self.cost_usd = 0.0
+        self.usage: dict[str, Any] = {}
+        self._texts: list[str] = []
+        self._raw: list[str] = []
+
+    def feed(self, line: bytes) -> list[ClaudeEvent]:
+        """Parse one stdout line and return the events it contains."""
+        text = line.decode("utf-8", errors="replace").strip()
+        if not text:
+            return []
+        try:
+            message = json.loads(text)
+        except json.JSONDecodeError:
+            # Not stream-json (older CLI or plain output) - keep as raw text
+            self._mark_output()
+            self._raw.append(text)
+            return [ClaudeEvent("text", text)]
+        if not isinstance(message, dict):
+            return []
+
+        msg_type = message.get("type")
+        if msg_type in ("assistant", "result"):
+            self._mark_output()  # system/init lines don't count as output
+        if msg_type == "result":
+            result = message.get("result")
+            self.result = result if isinstance(result, str) else None
+            self.is_error = bool(message.get("is_error"))
+            self.finished = True
+            usage = message.get("usage")
+            self.usage = usage if isinstance(usage, dict) else {}
+            self.cost_usd = float(message.get("total_cost_usd") or 0)
+            self.turns = int(message.get("num_turns") or 0)
+            return []
+        if msg_type != "assistant":
+            return []
+
+        events: list[ClaudeEvent] = []
+        content = (message.get("message") or {}).get("content") or []
+        for block in content:
+            if not isinstance(block, dict):
+                continue
+            if block.get("type") == "text" and block.get("text"):
+                self._texts.append(block["text"])
+                events.append(ClaudeEvent("text", block["text"]))
+            elif block.get("type") == "tool_use":
+                self.tool_calls += 1
+                events.append(ClaudeEvent("tool", str(block.get("name", "tool"))))
+        return events
+
+    def _mark_output(self) -> None:
+        if self.first_output_at is None:
+            self.first_output_at = time.monotonic()
+
+    def output(self) -> str:
+        """Final output: the result message, else the last text seen."""
+        if self.result is not None:
+            return self.result
+        if self._raw:
+            return "\n".join(self._raw)
+        return self._texts[-1] if self._texts else ""
@@ -0,0 +1,179 @@
+"""Single-flight coalescing for long-running jobs.
+
+Jobs are keyed by kind and date (e.g. "process:2026-10-18",
+"weekly:2026-W42"). Within one process, a second caller awaits the
+in-flight job's future. Across processes (bot vs systemd scripts), an
+flock-based lease in vault/.locks/ marks the job as running and the holder
+leaves its result next to the lease for joiners to pick up.
+"""
+
+import asyncio
+import contextlib
+import fcntl
+import json
+import logging
+import os
+import re
+import time
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+from typing import Any, TextIO
+
+logger = logging.getLogger(__name__)
+
+LEASE_POLL_INTERVAL = 5.0
+
+# Shared by all SingleFlight instances in this process
+_inflight: dict[str, asyncio.Future[dict[str, Any]]] = {}
+
+
+class JobLease:
+    """Exclusive cross-process lease backed by flock on a lockfile.
+
+    The kernel drops the lock when the holder exits, so a crashed job never
+    leaves a stale lease behind.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._file: TextIO | None = None
+
+    def try_acquire(self) -> bool:
+        """Try to take the lease without blocking."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        f = self.path.open("a+", encoding="utf-8")
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            f.close()
+            return False
+        f.seek(0)
+        f.truncate()
+        f.write(f"{os.getpid()} {time.time():.0f}\n")
+        f.flush()
+        self._file = f
+        return True
+
+    def release(self) -> None:
+        """Release the lease if held."""
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+
+class SingleFlight:
+    """Runs at most one job per key, letting later callers join it."""
+
+    def __init__(self, vault_path: Path) -> None:
+        self.locks_dir = Path(vault_path) / ".locks"
+
+    def _paths(self, key: str) -> tuple[Path, Path]:
+        safe = re.sub(r"[^\w.-]+", "-", key)
+        return self.locks_dir / f"{safe}.lock", self.locks_dir / f"{safe}.result.json"
+
+    def is_running(self, key: str) -> bool:
+        """Check whether a job with this key is in flight in this process."""
+        return key in _inflight
+
+    async def run(
+        self,
+        key: str,
+        job: Callable[[], Awaitable[dict[str, Any]]],
+        on_join: Callable[[], Awaitable[None]] | None = None,
+    ) -> dict[str, Any]:
+        """Run job under key, or join the job already running under it.
+
+        Args:
+            key: Job key, e.g. "process:2026-10-18"
+            job: Coroutine factory producing the job result dict
+            on_join: Called when this caller joins an in-flight job
+
+        Returns:
+            The job result; joined results carry "joined": True
+        """
+        if key in _inflight:
+            logger.info("Joining in-flight job %s", key)
+            if on_join is not None:
+                await on_join()
+            inflight = _inflight[key]
+            try:
+                result = await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                current = asyncio.current_task()
+                if not inflight.cancelled() or (current and current.cancelling()):
+                    raise
+                # The job we joined was cancelled, not us
+                return {
+                    "error": "Parallel run was cancelled",
+                    "processed_entries": 0,
+                }
+            return {**result, "joined": True}
+
+        future: asyncio.Future[dict[str, Any]] = (
+            asyncio.get_running_loop().create_future()
+        )
+        _inflight[key] = future
+        try:
+            result = await self._run_leased(key, job, on_join)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so an unjoined failure doesn't log a warning
+            future.exception()
+            raise
+        finally:
+            del _inflight[key]
+
+    async def _run_leased(
+        self,
+        key: str,
+        job: Callable[[], Awaitable[dict[str, Any]]],
+        on_join: Callable[[], Awaitable[None]] | None,
+    ) -> dict[str, Any]:
+        lock_path, result_path = self._paths(key)
+        lease = JobLease(lock_path)
+
+        if not lease.try_acquire():
+            logger.info("Job %s is running in another process, joining", key)
+            if on_join is not None:
+                await on_join()
+            waited_since = time.time()
+            while not lease.try_acquire():
+                await asyncio.sleep(LEASE_POLL_INTERVAL)
+            lease.release()
+            return {**self._read_result(result_path, waited_since), "joined": True}
+
+        try:
+            result = await job()
+            self._write_result(result_path, result)
+            return result
+        finally:
+            lease.release()
+
+    @staticmethod
+    def _write_result(path: Path, result: dict[str, Any]) -> None:
+        with contextlib.suppress(OSError, TypeError, ValueError):
+            tmp_path = path.with_suffix(".tmp")
+            payload = json.dumps(result, ensure_ascii=False)
+            tmp_path.write_text(payload, encoding="utf-8")
+            os.replace(tmp_path, path)
+
+    @staticmethod
+    def _read_result(path: Path, newer_than: float) -> dict[str, Any]:
+        """Read the result left by another process's run of the job."""
+        try:
+            if path.stat().st_mtime >= newer_than - 1:
+                data = json.loads(path.read_text(encoding="utf-8"))
+                if isinstance(data, dict):
+                    return data
+        except (OSError, json.JSONDecodeError):
+            pass
+        return {
+            "error": "Parallel run finished without a result",
+            "processed_entries": 0,
+        }
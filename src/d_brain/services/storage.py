@@ -1,7 +1,106 @@
 """Vault storage service for saving entries."""
 
+import hashlib
+import json
+import logging
+import os
+import re
+from collections.abc import Callable
+from dataclasses import dataclass, field
 from datetime import date, datetime
 from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+# Called as listener(day, entry) after every append_to_daily write
+AppendListener = Callable[[date, str], None]
+_append_listeners: list[AppendListener] = []
+
+# Called as tagger(text, msg_type) before an append; returns a line added
+# to the entry (e.g. a classification comment) or None
+EntryTagger = Callable[[str, str], str | None]
+_entry_tagger: EntryTagger | None = None
+
+# Daily entries start with "## HH:MM [type]" (see append_to_daily)
+ENTRY_HEADER_RE = re.compile(r"^## \d{1,2}:\d{2} ", re.MULTILINE)
+# Marker left by the older in-file processing flow
+PROCESSED_MARKER = "<!-- ✓ processed -->"
+HTML_COMMENT_RE = re.compile(r"<!--.*?-->", re.DOTALL)
+
+
+def add_append_listener(listener: AppendListener) -> None:
+    """Register a callback for entries appended to daily files."""
+    _append_listeners.append(listener)
+
+
+def remove_append_listener(listener: AppendListener) -> None:
+    """Unregister a callback added with add_append_listener."""
+    if listener in _append_listeners:
+        _append_listeners.remove(listener)
+
+
+def set_entry_tagger(tagger: EntryTagger | None) -> None:
+    """Set the process-wide tagger for appended entries (None disables)."""
+    global _entry_tagger
+    _entry_tagger = tagger
+
+
+def split_entries(content: str) -> list[str]:
+    """Split daily file content into "## HH:MM [type]" entries."""
+    starts = [m.start() for m in ENTRY_HEADER_RE.finditer(content)]
+    if not starts:
+        return []
+    return [
+        content[start:end].strip()
+        for start, end in zip(starts, [*starts[1:], len(content)], strict=True)
+    ]
+
+
+def chunk_entries(entries: list[str], max_chars: int) -> list[list[str]]:
+    """Group consecutive entries into chunks of at most max_chars.
+
+    An entry longer than max_chars gets a chunk of its own.
+    """
+    chunks: list[list[str]] = []
+    size = 0
+    for entry in entries:
+        if chunks and size + len(entry) <= max_chars:
+            chunks[-1].append(entry)
+            size += len(entry)
+        else:
+            chunks.append([entry])
+            size = len(entry)
+    return chunks
+
+
+def entry_hash(entry: str) -> str:
+    """Stable short hash of an entry, ignoring HTML comments and whitespace."""
+    normalized = " ".join(HTML_COMMENT_RE.sub("", entry).split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:16]
+
+
+@dataclass
+class Watermark:
+    """How much of a daily file has already been processed.
+
+    offset/sha256 cover the processed byte prefix, so new entries appended
+    after it are found without re-reading the rest. entries holds hashes of
+    processed entries as a fallback when the prefix was edited in place.
+    """
+
+    offset: int = 0
+    sha256: str = ""
+    entries: list[str] = field(default_factory=list)
+
+    def excluding(self, entries: list[str]) -> "Watermark":
+        """Copy that leaves the given entries unprocessed.
+
+        The prefix is dropped, so the next run falls back to entry hashes
+        and picks the excluded entries up again.
+        """
+        skip = {entry_hash(e) for e in entries}
+        return Watermark(entries=[h for h in self.entries if h not in skip])
 
 
 class VaultStorage:
@@ -11,6 +110,7 @@ class VaultStorage:
         self.vault_path = Path(vault_path)
         self.daily_path = self.vault_path / "daily"
         self.attachments_path = self.vault_path / "attachments"
+        self.watermarks_file = self.vault_path / ".state" / "watermarks.json"
 
     def _ensure_dirs(self) -> None:
         """Ensure required directories exist."""
@@ -29,6 +129,120 @@ class VaultStorage:
             return ""
         return file_path.read_text(encoding="utf-8")
 
+    def _load_watermarks(self) -> dict[str, Any]:
+        if not self.watermarks_file.exists():
+            return {}
+        try:
+            data = json.loads(self.watermarks_file.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def get_watermark(self, day: date) -> Watermark | None:
+        """Get the processed watermark for given date, if any."""
+        raw = self._load_watermarks().get(day.isoformat())
+        if not isinstance(raw, dict):
+            return None
+        return Watermark(
+            offset=int(raw.get("offset", 0)),
+            sha256=str(raw.get("sha256", "")),
+            entries=list(raw.get("entries", [])),
+        )
+
+    def save_watermark(self, day: date, watermark: Watermark) -> None:
+        """Persist the processed watermark for given date."""
+        data = self._load_watermarks()
+        data[day.isoformat()] = {
+            "offset": watermark.offset,
+            "sha256": watermark.sha256,
+            "entries": watermark.entries,
+        }
+        self.watermarks_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.watermarks_file.with_suffix(".tmp")
+        tmp_path.write_text(
+            json.dumps(data, ensure_ascii=False, indent=2, sort_keys=True),
+            encoding="utf-8",
+        )
+        os.replace(tmp_path, self.watermarks_file)
+
+    def unprocessed_days(
+        self, lookback_days: int, today: date | None = None
+    ) -> list[date]:
+        """Past days whose daily file still has entries past the watermark.
+
+        A day with a watermark can still have unprocessed entries: the ones
+        added after a micro-batch, or left over by a failed or partially
+        failed run. Watermarks only exist from the first processing run on,
+        so days before the earliest watermark (or all days, while there is
+        none) count as handled by the flow that predates them, not as missed.
+
+        Args:
+            lookback_days: How many days before today to consider
+            today: Reference date (default: today); it is never included
+
+        Returns:
+            Dates in chronological order
+        """
+        today = today or date.today()
+        if not self.daily_path.exists():
+            return []
+        processed = self._load_watermarks()
+        if not processed:
+            return []
+        first = min(processed)
+        days = []
+        for path in self.daily_path.glob("*.md"):
+            try:
+                day = date.fromisoformat(path.stem)
+            except ValueError:
+                continue
+            recent = 0 < (today - day).days <= lookback_days
+            if recent and first <= day.isoformat() and self.get_new_entries(day)[0]:
+                days.append(day)
+        return sorted(days)
+
+    def get_new_entries(self, day: date) -> tuple[list[str], Watermark]:
+        """Get daily entries not yet covered by the watermark.
+
+        Args:
+            day: Date of the daily file
+
+        Returns:
+            Tuple of (new entries, watermark to save once they are processed).
+            The new watermark covers the file as read now, so entries
+            appended while processing runs stay unprocessed.
+        """
+        file_path = self.get_daily_file(day)
+        data = file_path.read_bytes() if file_path.exists() else b""
+        content = data.decode("utf-8", errors="replace")
+
+        entries = split_entries(content)
+        all_hashes = [entry_hash(e) for e in entries]
+        updated = Watermark(
+            offset=len(data),
+            sha256=hashlib.sha256(data).hexdigest(),
+            entries=all_hashes,
+        )
+
+        old = self.get_watermark(day)
+        if (
+            old is not None
+            and old.offset <= len(data)
+            and hashlib.sha256(data[: old.offset]).hexdigest() == old.sha256
+        ):
+            # Fast path: processed prefix untouched, only look at the tail
+            tail = data[old.offset :].decode("utf-8", errors="replace")
+            new_entries = split_entries(tail)
+        else:
+            done = set(old.entries) if old is not None else set()
+            new_entries = [
+                e
+                for e, h in zip(entries, all_hashes, strict=True)
+                if h not in done and PROCESSED_MARKER not in e
+            ]
+
+        return new_entries, updated
+
     def append_to_daily(
         self,
         text: str,
@@ -47,10 +261,19 @@ class VaultStorage:
 
         time_str = timestamp.strftime("%H:%M")
         entry = f"\n## {time_str} {msg_type}\n{text}\n"
+        tag = _entry_tagger(text, msg_type) if _entry_tagger is not None else None
+        if tag:
+            entry += f"{tag}\n"
 
         with file_path.open("a", encoding="utf-8") as f:
             f.write(entry)
 
+        for listener in list(_append_listeners):
+            try:
+                listener(timestamp.date(), entry)
+            except Exception:
+                logger.exception("Append listener failed")
+
     def get_attachments_dir(self, day: date) -> Path:
         """Get attachments directory for given date."""
         dir_path = self.attachments_path / day.isoformat()
@@ -0,0 +1,131 @@
+"""Local dataset for the weekly digest.
+
+Everything the digest needs is gathered from the vault before Claude is
+called: per-day entry counts from the daily files, rollup details (or
+entry excerpts for days without a rollup), session stats, the weekly
+goals and last week's summary. Claude gets one deterministic data block
+and only has to write the synthesis, without listing and reading files
+through tool calls.
+"""
+
+import logging
+import re
+from collections import Counter
+from datetime import date, timedelta
+from pathlib import Path
+
+from d_brain.services.rollup import ENTRY_TYPE_RE, RollupStore
+from d_brain.services.session import SessionStore
+from d_brain.services.storage import HTML_COMMENT_RE, split_entries
+
+logger = logging.getLogger(__name__)
+
+WEEKLY_GOALS_PATH = "goals/3-weekly.md"
+
+# Limits that keep the data block compact
+MAX_EXCERPTS_PER_DAY = 20
+EXCERPT_CHARS = 160
+MAX_GOALS_CHARS = 4000
+MAX_SUMMARY_CHARS = 3000
+
+FRONTMATTER_RE = re.compile(r"\A---\n.*?\n---\n", re.DOTALL)
+
+
+def _clip(text: str, limit: int) -> str:
+    text = text.strip()
+    if len(text) <= limit:
+        return text
+    return text[:limit].rsplit("\n", 1)[0] + "\n…"
+
+
+def _excerpt(entry: str) -> str:
+    """One line per entry: "HH:MM [type] first words"."""
+    header, _, body = entry.partition("\n")
+    match = re.match(r"## (\d{1,2}:\d{2}) \[(\w+)", header)
+    stamp = f"{match.group(1)} [{match.group(2)}]" if match else header[3:]
+    text = " ".join(HTML_COMMENT_RE.sub("", body).split())
+    if len(text) > EXCERPT_CHARS:
+        text = text[:EXCERPT_CHARS].rstrip() + "…"
+    return f"- {stamp} {text}"
+
+
+def _day_block(vault_path: Path, rollups: RollupStore, day: date) -> str:
+    daily_file = vault_path / "daily" / f"{day.isoformat()}.md"
+    content = daily_file.read_text(encoding="utf-8") if daily_file.exists() else ""
+    entries = split_entries(content)
+    types = Counter(m.group(1) for m in ENTRY_TYPE_RE.finditer(content))
+    type_text = ", ".join(f"{k} {v}" for k, v in sorted(types.items()))
+    lines = [f"## {day} — записей: {len(entries)} ({type_text or '-'})"]
+
+    rollup = rollups.get(day)
+    if rollup is not None:
+        lines.extend(rollup.detail_lines())
+    elif entries:
+        lines.extend(_excerpt(e) for e in entries[:MAX_EXCERPTS_PER_DAY])
+        if len(entries) > MAX_EXCERPTS_PER_DAY:
+            lines.append(f"- … ещё {len(entries) - MAX_EXCERPTS_PER_DAY}")
+    return "\n".join(lines)
+
+
+def _session_stats(vault_path: Path) -> str:
+    sessions_dir = vault_path / ".sessions"
+    if not sessions_dir.exists():
+        return "-"
+    session = SessionStore(vault_path)
+    totals: Counter[str] = Counter()
+    for path in sorted(sessions_dir.glob("*.jsonl")):
+        if path.stem.isdigit():
+            totals.update(session.get_stats(int(path.stem), days=7))
+    return ", ".join(f"{k} {v}" for k, v in sorted(totals.items())) or "-"
+
+
+def _previous_summary(vault_path: Path, today: date) -> str:
+    year, week, _ = (today - timedelta(days=7)).isocalendar()
+    path = vault_path / "summaries" / f"{year}-W{week:02d}-summary.md"
+    if not path.exists():
+        return "(нет)"
+    content = FRONTMATTER_RE.sub("", path.read_text(encoding="utf-8"))
+    return _clip(content, MAX_SUMMARY_CHARS)
+
+
+def build_weekly_dataset(vault_path: Path, today: date | None = None) -> str:
+    """Collect the week's data into one prompt block.
+
+    Args:
+        vault_path: Path to the vault
+        today: Last day of the week (default: today)
+
+    Returns:
+        Data block covering the seven days ending today
+    """
+    vault_path = Path(vault_path)
+    if today is None:
+        today = date.today()
+    rollups = RollupStore(vault_path)
+
+    days = [today - timedelta(days=offset) for offset in range(6, -1, -1)]
+    goals_file = vault_path / WEEKLY_GOALS_PATH
+    goals = (
+        HTML_COMMENT_RE.sub("", goals_file.read_text(encoding="utf-8"))
+        if goals_file.exists()
+        else ""
+    )
+
+    day_blocks = "\n\n".join(_day_block(vault_path, rollups, day) for day in days)
+    dataset = f"""=== WEEKLY DATA ({days[0]} — {today}) ===
+
+=== DAYS ===
+{day_blocks}
+
+=== SESSION STATS (7 дней) ===
+{_session_stats(vault_path)}
+
+=== WEEKLY GOALS ({WEEKLY_GOALS_PATH}) ===
+{_clip(goals, MAX_GOALS_CHARS) or "(нет)"}
+
+=== PREVIOUS WEEK SUMMARY ===
+{_previous_summary(vault_path, today)}
+
+=== END WEEKLY DATA ==="""
+    logger.info("Weekly dataset: %d chars for %s — %s", len(dataset), days[0], today)
+    return dataset
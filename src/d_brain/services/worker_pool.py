@@ -0,0 +1,250 @@
+"""Pool of warm, long-lived Claude CLI workers.
+
+Each worker is a `claude --print --input-format stream-json` process started
+ahead of time, so the CLI boot and MCP server startup (Todoist MCP takes
+10-30 s) are paid before a request arrives instead of on every request.
+Prompts are written to the worker's stdin as stream-json user messages.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from collections.abc import Coroutine
+from pathlib import Path
+from typing import Any
+
+from d_brain.services.proctree import kill_process_tree
+
+logger = logging.getLogger(__name__)
+
+STDERR_TAIL_BYTES = 4096
+STREAM_LINE_LIMIT = 16 * 1024 * 1024
+
+
+class ClaudeWorker:
+    """A single resident Claude CLI process speaking stream-json."""
+
+    def __init__(self, args: list[str], cwd: Path, env: dict[str, str]) -> None:
+        self._args = args
+        self._cwd = cwd
+        self._env = env
+        self.proc: asyncio.subprocess.Process | None = None
+        self.started_at = 0.0
+        self.last_used = 0.0
+        self.jobs_served = 0
+        self.stderr_tail = b""
+        self._stderr_task: asyncio.Task[None] | None = None
+
+    @property
+    def alive(self) -> bool:
+        """Whether the underlying process is still running."""
+        return self.proc is not None and self.proc.returncode is None
+
+    async def start(self) -> None:
+        """Spawn the CLI process."""
+        self.proc = await asyncio.create_subprocess_exec(
+            *self._args,
+            cwd=self._cwd,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env=self._env,
+            limit=STREAM_LINE_LIMIT,
+            start_new_session=True,  # own process group, see proctree
+        )
+        self.started_at = self.last_used = time.monotonic()
+        self._stderr_task = asyncio.create_task(self._drain_stderr())
+        logger.info("Claude worker started (pid=%d)", self.proc.pid)
+
+    async def _drain_stderr(self) -> None:
+        """Keep stderr from filling its pipe, remembering only the tail."""
+        assert self.proc is not None and self.proc.stderr is not None
+        while chunk := await self.proc.stderr.read(4096):
+            self.stderr_tail = (self.stderr_tail + chunk)[-STDERR_TAIL_BYTES:]
+
+    async def send(self, prompt: str) -> None:
+        """Write a prompt to the worker as a stream-json user message."""
+        assert self.proc is not None and self.proc.stdin is not None
+        message = {"type": "user", "message": {"role": "user", "content": prompt}}
+        line = json.dumps(message, ensure_ascii=False) + "\n"
+        self.proc.stdin.write(line.encode("utf-8"))
+        await self.proc.stdin.drain()
+        self.jobs_served += 1
+        self.last_used = time.monotonic()
+
+    async def readline(self) -> bytes:
+        """Read one line of stream-json output (b"" on EOF)."""
+        assert self.proc is not None and self.proc.stdout is not None
+        return await self.proc.stdout.readline()
+
+    async def close(self) -> None:
+        """Terminate the worker process and reap it."""
+        if self.proc is None:
+            return
+        await kill_process_tree(self.proc)
+        if self._stderr_task is not None:
+            self._stderr_task.cancel()
+        logger.info("Claude worker stopped (pid=%d)", self.proc.pid)
+
+
+class ClaudeWorkerPool:
+    """Keeps `size` warm Claude workers ready for dispatch.
+
+    A worker is retired after `max_jobs_per_worker` prompts (default 1, so
+    every request gets a clean conversation) and replaced in the background.
+    A maintenance loop runs every `health_interval` seconds, replacing dead
+    workers and recycling ones idle longer than `idle_ttl` so that stale MCP
+    connections don't linger.
+    """
+
+    def __init__(
+        self,
+        cwd: Path,
+        mcp_config_path: Path,
+        todoist_api_key: str = "",
+        size: int = 1,
+        idle_ttl: float = 1800,
+        health_interval: float = 60,
+        max_jobs_per_worker: int = 1,
+        claude_bin: str = "claude",
+    ) -> None:
+        self.cwd = Path(cwd)
+        self.mcp_config_path = Path(mcp_config_path)
+        self.todoist_api_key = todoist_api_key
+        self.size = size
+        self.idle_ttl = idle_ttl
+        self.health_interval = health_interval
+        self.max_jobs_per_worker = max(1, max_jobs_per_worker)
+        self.claude_bin = claude_bin
+        self._idle: list[ClaudeWorker] = []
+        self._busy: set[ClaudeWorker] = set()
+        self._spawning = 0
+        self._maintenance: asyncio.Task[None] | None = None
+        self._background: set[asyncio.Task[None]] = set()
+        self._closed = False
+
+    def _args(self) -> list[str]:
+        return [
+            self.claude_bin,
+            "--print",
+            "--verbose",
+            "--input-format",
+            "stream-json",
+            "--output-format",
+            "stream-json",
+            "--dangerously-skip-permissions",
+            "--mcp-config",
+            str(self.mcp_config_path),
+        ]
+
+    def _env(self) -> dict[str, str]:
+        env = os.environ.copy()
+        if self.todoist_api_key:
+            env["TODOIST_API_KEY"] = self.todoist_api_key
+        return env
+
+    def _in_background(self, coro: Coroutine[Any, Any, None]) -> None:
+        """Run housekeeping without blocking the caller, keeping a reference."""
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def start(self) -> None:
+        """Warm up the pool and start the maintenance loop."""
+        await self._refill()
+        self._maintenance = asyncio.create_task(self._maintain())
+        logger.info("Claude worker pool started (size=%d)", self.size)
+
+    async def _spawn(self) -> None:
+        worker = ClaudeWorker(self._args(), self.cwd, self._env())
+        try:
+            await worker.start()
+        except Exception:
+            logger.exception("Failed to start Claude worker")
+            return
+        finally:
+            self._spawning -= 1
+        if self._closed:
+            await worker.close()
+        else:
+            self._idle.append(worker)
+
+    async def _refill(self) -> None:
+        """Spawn workers until the pool is back at its target size."""
+        missing = self.size - len(self._idle) - len(self._busy) - self._spawning
+        if missing > 0 and not self._closed:
+            self._spawning += missing  # _spawn() decrements as each one settles
+            await asyncio.gather(*(self._spawn() for _ in range(missing)))
+
+    async def _maintain(self) -> None:
+        while not self._closed:
+            await asyncio.sleep(self.health_interval)
+            now = time.monotonic()
+            for worker in list(self._idle):
+                stale = self.idle_ttl > 0 and now - worker.last_used > self.idle_ttl
+                if not worker.alive or stale:
+                    if not worker.alive:
+                        logger.warning(
+                            "Claude worker died: %s",
+                            worker.stderr_tail.decode("utf-8", errors="replace"),
+                        )
+                    self._idle.remove(worker)
+                    await worker.close()
+            try:
+                await self._refill()
+            except Exception:
+                logger.exception("Claude worker pool refill failed")
+
+    def acquire(self) -> ClaudeWorker | None:
+        """Take a warm worker, or None if none is ready (caller cold-spawns)."""
+        while self._idle:
+            worker = self._idle.pop(0)
+            if worker.alive:
+                self._busy.add(worker)
+                return worker
+            self._in_background(worker.close())
+        self._in_background(self._refill())
+        return None
+
+    async def release(self, worker: ClaudeWorker, healthy: bool = True) -> None:
+        """Return a worker after a job, retiring it if spent or unhealthy."""
+        self._busy.discard(worker)
+        reusable = (
+            healthy
+            and worker.alive
+            and worker.jobs_served < self.max_jobs_per_worker
+            and not self._closed
+        )
+        if reusable:
+            self._idle.append(worker)
+        else:
+            await worker.close()
+        if not self._closed:
+            self._in_background(self._refill())
+
+    async def close(self) -> None:
+        """Stop maintenance and terminate all workers."""
+        self._closed = True
+        if self._maintenance is not None:
+            self._maintenance.cancel()
+        workers = [*self._idle, *self._busy]
+        self._idle.clear()
+        self._busy.clear()
+        await asyncio.gather(*(w.close() for w in workers))
+        logger.info("Claude worker pool stopped")
+
+
+_pool: ClaudeWorkerPool | None = None
+
+
+def get_worker_pool() -> ClaudeWorkerPool | None:
+    """Get the process-wide worker pool, if one was started."""
+    return _pool
+
+
+def set_worker_pool(pool: ClaudeWorkerPool | None) -> None:
+    """Install (or clear) the process-wide worker pool."""
+    global _pool
+    _pool = pool